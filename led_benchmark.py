@@ -0,0 +1,295 @@
+"""
+Бенчмарки LED Controller на симулированном транспорте
+
+Измеряет:
+- стоимость кодирования команд каждым протоколом из led_protocols;
+- сколько команд в секунду выдерживает LEDController.send_command;
+- задержку от "слайдера" (поток GUI) до записи через мост в asyncio;
+- масштабирование групповых команд от 1 до сотен устройств;
+- сколько кадров доходит до ленты с медленным контроллером при адаптивном темпе.
+
+Результаты пишутся в JSON, чтобы сравнивать версии и ловить регрессии:
+
+    python led_benchmark.py --output bench.json
+    python led_benchmark.py --compare bench.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+from typing import Dict, List
+
+from led_bridge import AsyncBridge
+from led_cache import DeviceCache
+from led_controller import LEDController
+from led_pool import DevicePool
+from led_protocols import PROTOCOLS
+from led_transport import SimulatedDevice, SimulatedTransport
+
+
+def _result(value: float, unit: str, higher_is_better: bool) -> dict:
+    return {"value": round(value, 3), "unit": unit, "higher_is_better": higher_is_better}
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _temp_cache() -> DeviceCache:
+    return DeviceCache(os.path.join(tempfile.mkdtemp(prefix="led_bench_"), "devices.json"))
+
+
+async def _connected_controller(device: SimulatedDevice) -> LEDController:
+    controller = LEDController(cache=_temp_cache(), transport=SimulatedTransport([device]))
+    with contextlib.redirect_stdout(io.StringIO()):
+        await controller.connect(device.address, device.name)
+    # Измеряем сам канал, а не темп протокола
+    controller.flow = None
+    controller.queue.set_rate(None)
+    return controller
+
+
+# --- Кодирование ---
+
+def _best_time(func, number: int) -> float:
+    """Лучшее время на один вызов из нескольких повторов (устойчиво к шуму)"""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def bench_encoding(quick: bool) -> Dict[str, dict]:
+    """Стоимость кодирования одной команды цвета, нс"""
+    number = 10000 if quick else 100000
+    batch = [(i % 256, (i * 7) % 256, (i * 13) % 256) for i in range(1000)]
+    results = {}
+
+    for name, protocol in PROTOCOLS.items():
+        key = name.lower().replace(" ", "_").replace("/", "_")
+        seconds = _best_time(lambda: protocol.color_command(12, 34, 56), number)
+        results[f"encode.{key}.color_command"] = _result(seconds * 1e9, "ns", False)
+
+        buf = bytearray(64)
+        seconds = _best_time(lambda: protocol.encode_color_into(buf, 0, 12, 34, 56), number)
+        results[f"encode.{key}.encode_into"] = _result(seconds * 1e9, "ns", False)
+
+        out = protocol.encode_colors(batch)
+        seconds = _best_time(lambda: protocol.encode_colors_into(out, batch), max(1, number // 10000))
+        results[f"encode.{key}.batch"] = _result(seconds / len(batch) * 1e9, "ns", False)
+
+    return results
+
+
+# --- Пропускная способность send_command ---
+
+async def bench_send_throughput(quick: bool) -> Dict[str, dict]:
+    """Команд в секунду через send_command и через очередь"""
+    count = 2000 if quick else 20000
+    device = SimulatedDevice("BE:00:00:00:00:01", write_latency=0.0)
+    controller = await _connected_controller(device)
+    data = controller.protocol.color_command(1, 2, 3)
+
+    direct = queued = 0.0
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(count):
+            await controller.send_command(data)
+        direct = max(direct, count / (time.perf_counter() - started))
+
+        started = time.perf_counter()
+        for i in range(count):
+            await controller.send_color(i % 256, 0, 0)
+        queued = max(queued, count / (time.perf_counter() - started))
+
+    await controller.disconnect()
+    return {
+        "send.send_command": _result(direct, "cmd/s", True),
+        "send.queued_send_color": _result(queued, "cmd/s", True),
+    }
+
+
+# --- Задержка слайдер -> запись ---
+
+def bench_slider_latency(quick: bool) -> Dict[str, dict]:
+    """
+    Задержка от вызова в потоке GUI до записи на устройство
+
+    Поток "слайдера" отправляет цвета так же, как LEDControllerApp:
+    через AsyncBridge с ключом "color"; результаты разбираются pump() вместо root.after.
+    """
+    ticks = 200 if quick else 1000
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    device = SimulatedDevice("BE:00:00:00:00:02", write_latency=0.002)
+    controller = asyncio.run_coroutine_threadsafe(_connected_controller(device), loop).result()
+    bridge = AsyncBridge(loop)
+
+    latencies = []
+    for i in range(ticks):
+        sent_at = time.monotonic()
+        op = bridge.submit(lambda value=i % 256: controller.send_color(value, 0, 0), key="color")
+        while not op.done:
+            time.sleep(0.0001)
+            bridge.pump()
+        # Время записи на устройстве берется по часам loop.time() (monotonic)
+        latencies.append(device.frames[-1][0] - sent_at)
+        time.sleep(0.001)
+
+    asyncio.run_coroutine_threadsafe(controller.disconnect(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+    return {
+        "slider.latency_p50": _result(_percentile(latencies, 0.50) * 1000, "ms", False),
+        "slider.latency_p95": _result(_percentile(latencies, 0.95) * 1000, "ms", False),
+        "slider.latency_p99": _result(_percentile(latencies, 0.99) * 1000, "ms", False),
+    }
+
+
+# --- Масштабирование групповых команд ---
+
+async def bench_fan_out(quick: bool) -> Dict[str, dict]:
+    """Время групповой команды цвета в зависимости от числа устройств"""
+    sizes = [1, 10, 50, 100] if quick else [1, 10, 50, 100, 250, 500]
+    rounds = 5 if quick else 20
+    results = {}
+
+    for size in sizes:
+        devices = [SimulatedDevice(f"BE:00:00:00:{i // 256:02X}:{i % 256:02X}",
+                                   connect_latency=0.0, write_latency=0.005)
+                   for i in range(size)]
+        pool = DevicePool(max_concurrent_connects=64, cache=_temp_cache(),
+                          transport=SimulatedTransport(devices))
+        with contextlib.redirect_stdout(io.StringIO()):
+            await pool.connect_many([device.address for device in devices])
+        for controller in pool.controllers.values():
+            controller.flow = None
+            controller.queue.set_rate(None)
+
+        timings = []
+        for i in range(rounds):
+            started = time.perf_counter()
+            await pool.set_color(None, i, 0, 0)
+            timings.append(time.perf_counter() - started)
+
+        await pool.disconnect_all()
+        results[f"fanout.{size}_devices"] = _result(statistics.median(timings) * 1000, "ms", False)
+
+    return results
+
+
+# --- Адаптивный темп ---
+
+async def bench_flow_control(quick: bool) -> Dict[str, dict]:
+    """Доставленные кадры/с и переполнения буфера ленты, которая разбирает 25 кадров/с"""
+    duration = 3.0 if quick else 10.0
+    device = SimulatedDevice("BE:00:00:00:00:03", write_latency=0.004, buffer_size=4, process_rate=25.0)
+    controller = LEDController(cache=_temp_cache(), transport=SimulatedTransport([device]))
+    with contextlib.redirect_stdout(io.StringIO()):
+        await controller.connect(device.address, device.name)
+
+    # Источник кадров быстрее ленты: 100 кадров/с, как эффект без ограничения
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    i = 0
+    while loop.time() - started < duration:
+        controller.post_color(i % 256, 0, 0)
+        i += 1
+        await asyncio.sleep(0.01)
+
+    await controller.disconnect()
+    return {
+        "flow.delivered_fps": _result(len(device.frames) / duration, "fps", True),
+        "flow.overflows": _result(device.overflows, "frames", False),
+    }
+
+
+# --- Запуск и сравнение ---
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(quick: bool = False) -> dict:
+    """Запуск всех бенчмарков; возвращает отчет для JSON"""
+    results = {}
+    results.update(bench_encoding(quick))
+    results.update(asyncio.run(bench_send_throughput(quick)))
+    results.update(bench_slider_latency(quick))
+    results.update(asyncio.run(bench_fan_out(quick)))
+    results.update(asyncio.run(bench_flow_control(quick)))
+    return {
+        "meta": {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """Список регрессий: метрики, ухудшившиеся больше чем на threshold (доля)"""
+    regressions = []
+    for name, result in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old or not old["value"]:
+            continue
+        change = (result["value"] - old["value"]) / old["value"]
+        if result["higher_is_better"]:
+            change = -change
+        if change > threshold:
+            regressions.append(f"{name}: {old['value']} -> {result['value']} {result['unit']} "
+                               f"(хуже на {change:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки LED Controller")
+    parser.add_argument("--output", help="Файл для результатов в JSON (по умолчанию stdout)")
+    parser.add_argument("--compare", help="JSON с прошлыми результатами для поиска регрессий")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Допустимое ухудшение при сравнении (доля, по умолчанию 0.15)")
+    parser.add_argument("--quick", action="store_true", help="Короткий прогон")
+    args = parser.parse_args()
+
+    report = run(args.quick)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        for line in regressions:
+            print(f"РЕГРЕССИЯ {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Мост между потоком GUI (Tk) и asyncio event loop'ом
+
+Все обращения интерфейса к контроллеру идут через один AsyncBridge вместо
+вспомогательных потоков, блокирующихся на run_coroutine_threadsafe().result():
+
+- операция запускается в loop'е через call_soon_threadsafe, поток GUI не ждет;
+- результат или исключение возвращаются в поток GUI: done-callback задачи
+  кладет их в очередь, которую GUI разбирает через root.after, пока есть
+  незавершенная работа (без работы опроса нет);
+- в loop'е одновременно не больше max_running операций, остальные ждут
+  на стороне GUI, и ожидающая операция с тем же ключом заменяется новой;
+- операция с ключом не стартует, пока выполняется предыдущая с тем же
+  ключом: частые вызовы (слайдер) схлопываются, следующей идет последняя;
+- exclusive-операция с ключом отменяет предыдущую с тем же ключом и стартует
+  после ее завершения (новое сканирование отменяет старое);
+- исключения не теряются: уходят в on_error операции или моста;
+- время от submit() до запуска в loop'е пишется в metrics.handoff.
+
+    bridge = AsyncBridge(loop, root, on_error=show_error)
+    bridge.submit(lambda: controller.scan_devices(), key="scan", exclusive=True,
+                  on_result=update_device_list)
+    bridge.submit(lambda: controller.send_color(r, g, b), key="color")
+"""
+
+import asyncio
+import itertools
+import queue
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class BridgeBusy(Exception):
+    """Слишком много ожидающих операций"""
+
+
+class Operation:
+    """Операция моста: можно отменить и узнать, завершена ли она"""
+
+    __slots__ = ("bridge", "factory", "key", "slot", "exclusive", "on_result", "on_error",
+                 "task", "cancelled", "done", "submitted")
+
+    def __init__(self, bridge: "AsyncBridge", factory: Callable[[], Awaitable], key: Optional[Hashable],
+                 slot: Hashable, exclusive: bool, on_result: Optional[Callable[[Any], None]],
+                 on_error: Optional[Callable[[BaseException], None]]):
+        self.bridge = bridge
+        self.factory = factory
+        self.key = key
+        self.slot = slot
+        self.exclusive = exclusive
+        self.on_result = on_result
+        self.on_error = on_error
+        self.task: Optional[asyncio.Future] = None  # задается в потоке loop'а
+        self.cancelled = False
+        self.done = False
+        self.submitted = time.perf_counter()  # момент submit() в потоке GUI
+
+    def cancel(self):
+        """Отменить операцию (вызывать из потока GUI); колбэки не вызываются"""
+        self.bridge.cancel(self)
+
+
+class AsyncBridge:
+    """
+    Мост GUI <-> asyncio
+
+    Методы, кроме post(), вызываются только из потока GUI.
+
+    Args:
+        loop: Event loop, работающий в своем потоке
+        root: Объект с after(ms, func) (окно Tk); None - разбирать результаты
+            вручную вызовом pump()
+        max_running: Сколько операций одновременно выполняется в loop'е
+        max_backlog: Сколько операций может ждать запуска
+        poll_ms: Период разбора результатов, мс
+        on_error: Обработчик исключений для операций без своего on_error
+        metrics: MetricsRegistry для гистограммы handoff; None - не измерять
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, root=None, max_running: int = 32,
+                 max_backlog: int = 256, poll_ms: int = 16,
+                 on_error: Optional[Callable[[BaseException], None]] = None,
+                 metrics=None):
+        self.loop = loop
+        self.root = root
+        self.max_running = max_running
+        self.max_backlog = max_backlog
+        self.poll_ms = poll_ms
+        self.on_error = on_error or self._print_error
+        self.metrics = metrics
+
+        self._backlog: "OrderedDict[Hashable, Operation]" = OrderedDict()
+        self._running = set()
+        self._by_key: Dict[Hashable, Operation] = {}  # последняя запущенная операция по ключу
+        self._completed = queue.SimpleQueue()  # пишет поток loop'а, читает поток GUI
+        self._ids = itertools.count()
+        self._pump_scheduled = False
+
+    @staticmethod
+    def _print_error(error: BaseException):
+        print(f"Ошибка операции: {error!r}")
+
+    @property
+    def pending(self) -> int:
+        """Незавершенные операции: выполняющиеся и ожидающие"""
+        return len(self._running) + len(self._backlog)
+
+    def submit(self, factory: Callable[[], Awaitable], key: Optional[Hashable] = None,
+               exclusive: bool = False, on_result: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None) -> Operation:
+        """
+        Запустить корутину в loop'е
+
+        Args:
+            factory: Функция без аргументов, возвращающая корутину (вызывается в потоке loop'а)
+            key: Ключ вытеснения: ожидающая операция с тем же ключом отбрасывается, новая
+                стартует после завершения выполняющейся
+            exclusive: Отменить выполняющуюся операцию с тем же ключом и дождаться ее
+            on_result: Вызывается в потоке GUI с результатом
+            on_error: Вызывается в потоке GUI с исключением (по умолчанию - on_error моста)
+
+        Returns:
+            Operation
+        """
+        slot = key if key is not None else ("_", next(self._ids))
+        op = Operation(self, factory, key, slot, exclusive, on_result, on_error)
+
+        if key is not None:
+            stale = self._backlog.pop(key, None)
+            if stale is not None:
+                stale.cancelled = stale.done = True
+            running = self._by_key.get(key)
+            if exclusive and running is not None:
+                self.cancel(running)
+
+        if len(self._backlog) >= self.max_backlog:
+            op.done = True
+            self._call(op.on_error or self.on_error,
+                       BridgeBusy(f"ожидают запуска {len(self._backlog)} операций"))
+            return op
+
+        self._backlog[slot] = op
+        self._start_ready()
+        self._schedule_pump()
+        return op
+
+    def post(self, func: Callable, *args):
+        """Выполнить func(*args) в потоке GUI при ближайшем разборе; можно вызывать из любого потока"""
+        self._completed.put((None, func, args))
+
+    def cancel(self, op: Operation):
+        """Отменить операцию"""
+        if op.done or op.cancelled:
+            return
+        op.cancelled = True
+        if self._backlog.get(op.slot) is op:
+            del self._backlog[op.slot]
+            op.done = True
+            return
+        # Задача создается в потоке loop'а: отмена ставится в очередь после запуска
+        self.loop.call_soon_threadsafe(self._cancel_task, op)
+
+    def close(self):
+        """Отменить всю незавершенную работу"""
+        for op in list(self._backlog.values()) + list(self._running):
+            self.cancel(op)
+
+    # --- Поток GUI ---
+
+    def _start_ready(self):
+        for slot, op in list(self._backlog.items()):
+            if len(self._running) >= self.max_running:
+                break
+            # Пока идет операция с тем же ключом, ждет только последняя (exclusive уже отменила ту)
+            if op.key is not None and op.key in self._by_key:
+                continue
+            del self._backlog[slot]
+            self._running.add(op)
+            if op.key is not None:
+                self._by_key[op.key] = op
+            self.loop.call_soon_threadsafe(self._run, op)
+
+    def _schedule_pump(self):
+        if self.root is not None and not self._pump_scheduled:
+            self._pump_scheduled = True
+            self.root.after(self.poll_ms, self.pump)
+
+    def pump(self):
+        """Разобрать завершенные операции и запустить ожидающие"""
+        self._pump_scheduled = False
+        while True:
+            try:
+                op, result, error = self._completed.get_nowait()
+            except queue.Empty:
+                break
+            if op is None:
+                # post(): result - функция, error - ее аргументы
+                self._call(result, *error)
+                continue
+
+            self._running.discard(op)
+            if self._by_key.get(op.key) is op:
+                del self._by_key[op.key]
+            op.done = True
+            if op.cancelled or isinstance(error, asyncio.CancelledError):
+                continue
+            if error is not None:
+                self._call(op.on_error or self.on_error, error)
+            elif op.on_result is not None:
+                self._call(op.on_result, result)
+
+        self._start_ready()
+        if self._running or self._backlog:
+            self._schedule_pump()
+
+    def _call(self, func: Callable, *args):
+        # Ошибка в колбэке не должна останавливать разбор
+        try:
+            func(*args)
+        except Exception as e:
+            if func is self.on_error:
+                self._print_error(e)
+            else:
+                self.on_error(e)
+
+    # --- Поток loop'а ---
+
+    def _run(self, op: Operation):
+        if self.metrics is not None:
+            # Ожидание в очереди моста, call_soon_threadsafe и опоздание loop'а до этого вызова
+            self.metrics.handoff.record(time.perf_counter() - op.submitted)
+        if op.cancelled:
+            self._completed.put((op, None, asyncio.CancelledError()))
+            return
+        try:
+            op.task = asyncio.ensure_future(op.factory())
+        except Exception as e:
+            self._completed.put((op, None, e))
+            return
+        op.task.add_done_callback(lambda task: self._task_done(op, task))
+
+    def _task_done(self, op: Operation, task: asyncio.Future):
+        if task.cancelled():
+            self._completed.put((op, None, asyncio.CancelledError()))
+        elif task.exception() is not None:
+            self._completed.put((op, None, task.exception()))
+        else:
+            self._completed.put((op, task.result(), None))
+
+    @staticmethod
+    def _cancel_task(op: Operation):
+        if op.task is not None:
+            op.task.cancel()
@@ -0,0 +1,72 @@
+"""
+Кэш сведений об устройствах на диске
+Хранит рабочую характеристику для записи и раскладку сервисов, чтобы при
+повторном подключении не перебирать сервисы и характеристики заново
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, Optional
+
+
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".led_controller", "devices.json")
+
+
+class DeviceCache:
+    """JSON-кэш устройств с ключом по адресу"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or CACHE_PATH
+        self._entries: Optional[Dict[str, dict]] = None
+
+    def _load(self) -> Dict[str, dict]:
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Не удалось сохранить кэш устройств: {e}")
+
+    def get(self, address: str) -> Optional[dict]:
+        """Запись об устройстве или None"""
+        return self._load().get(address.upper())
+
+    def update(self, address: str, **fields) -> dict:
+        """Обновить запись об устройстве и сохранить кэш"""
+        entries = self._load()
+        entry = entries.setdefault(address.upper(), {})
+        entry.update(fields)
+        self._save()
+        return entry
+
+    def forget(self, address: str):
+        """Удалить запись об устройстве"""
+        if self._load().pop(address.upper(), None) is not None:
+            self._save()
+
+    def addresses(self) -> list:
+        """Адреса всех запомненных устройств"""
+        return list(self._load().keys())
+
+    @staticmethod
+    def layout_signature(characteristics: Iterable[str]) -> str:
+        """
+        Отпечаток раскладки сервисов
+
+        Args:
+            characteristics: Строки вида "service_uuid/char_uuid/свойства"
+        """
+        digest = hashlib.sha1("\n".join(sorted(characteristics)).encode("utf-8"))
+        return digest.hexdigest()[:16]
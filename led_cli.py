@@ -0,0 +1,218 @@
+"""
+LED Controller - однократные команды из командной строки
+
+Импортирует только то, что нужно команде: без tkinter/customtkinter,
+bleak загружается лишь при подключении. Адрес, протокол и характеристика
+берутся из кэша устройств, поэтому команда выполняется без сканирования.
+
+    python led_cli.py color FF0000
+    python led_cli.py color 255,128,0 --brightness 40 -d BE:FF:20:00:11:22
+    python led_cli.py color 2700K
+    python led_cli.py brightness 60
+    python led_cli.py off
+    python led_cli.py devices
+    python led_cli.py color 00FF00 --dry-run
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+from typing import Optional, Tuple
+
+import led_colors
+from led_cache import DeviceCache
+
+
+def parse_color(value: str) -> Tuple[int, int, int]:
+    """Цвет из "RRGGBB", "#RRGGBB", "R,G,B" или температуры "2700K" """
+    try:
+        return led_colors.parse_color(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_brightness(value: str) -> int:
+    brightness = int(value)
+    if not 0 <= brightness <= 100:
+        raise argparse.ArgumentTypeError("яркость должна быть от 0 до 100")
+    return brightness
+
+
+def resolve_device(cache: DeviceCache, device: Optional[str]) -> Tuple[str, dict]:
+    """
+    Адрес и запись кэша по аргументу --device
+
+    Принимает адрес или имя из кэша; без аргумента - единственное устройство в кэше.
+    """
+    addresses = cache.addresses()
+    if device is None:
+        if len(addresses) != 1:
+            raise SystemExit("Укажите устройство: -d АДРЕС "
+                             f"(в кэше устройств: {len(addresses)}, список - команда devices)")
+        device = addresses[0]
+
+    entry = cache.get(device)
+    if entry is not None:
+        return device.upper(), entry
+
+    matches = [address for address in addresses
+               if (cache.get(address) or {}).get("name", "").lower() == device.lower()]
+    if len(matches) == 1:
+        return matches[0], cache.get(matches[0])
+    if len(matches) > 1:
+        raise SystemExit(f"Имя {device} неоднозначно: {', '.join(matches)}")
+    # Неизвестное устройство: подключение с поиском характеристик
+    return device.upper(), {}
+
+
+def cached_protocol(address: str, entry: dict, name: Optional[str]):
+    """Протокол: явно указанный, из кэша или по имени и адресу устройства"""
+    from led_protocols import PROTOCOLS, detect_protocol
+
+    name = name or entry.get("protocol")
+    if name:
+        if name not in PROTOCOLS:
+            raise SystemExit(f"Неизвестный протокол: {name} (есть: {', '.join(PROTOCOLS)})")
+        return PROTOCOLS[name]
+    return detect_protocol(entry.get("name") or "", address, default=PROTOCOLS["ELK-BLEDOM"])
+
+
+def build_frames(protocol, args, color: Optional[Tuple[int, int, int]] = None) -> list:
+    """
+    Кадры команды в порядке отправки (для --dry-run)
+
+    color - последний цвет ленты из кэша: команда brightness на протоколе с
+    совмещенной яркостью масштабирует его, как LEDController.set_brightness.
+    ValueError, если такой команде не к чему применяться.
+    """
+    from led_protocols import fused_brightness_error
+
+    if args.command == "on":
+        return [protocol.power_on_command()]
+    if args.command == "off":
+        return [protocol.power_off_command()]
+    if args.command == "brightness":
+        if not protocol.profile.fused_brightness:
+            return [protocol.brightness_command(args.brightness)]
+        if not color:
+            raise ValueError(fused_brightness_error(protocol.name))
+        r, g, b = color
+    else:
+        r, g, b = args.color
+        if args.brightness is None:
+            return [protocol.color_command(r, g, b)]
+        if not protocol.profile.fused_brightness:
+            return [protocol.brightness_command(args.brightness), protocol.color_command(r, g, b)]
+    # Lookup-таблица та же, что у LEDController: совпадает с тем, что отправит GUI
+    lut = led_colors.brightness_lut()[args.brightness]
+    return [protocol.color_command(lut[r], lut[g], lut[b])]
+
+
+async def execute(address: str, entry: dict, args) -> bool:
+    """Подключение, отправка команды и отключение"""
+    from led_controller import LEDController
+
+    controller = LEDController()
+    output = sys.stdout if args.verbose else io.StringIO()
+    with contextlib.redirect_stdout(output):
+        connected = await controller.connect(address, entry.get("name", ""), args.protocol)
+    if not connected:
+        print(f"Не удалось подключиться к {address}" + ("" if args.verbose else " (подробности: -v)"))
+        return False
+
+    try:
+        if args.command == "on":
+            return await controller.power_on()
+        if args.command == "off":
+            return await controller.power_off()
+        if args.command == "brightness":
+            return await controller.set_brightness(args.brightness)
+
+        ok = True
+        if args.brightness is not None:
+            if controller.fused:
+                # Уровень только запоминается: кадр уйдет один, вместе с цветом
+                controller.state.brightness = args.brightness
+            else:
+                ok = await controller.set_brightness(args.brightness)
+        return await controller.send_color(*args.color) and ok
+    except ValueError as e:
+        print(e)
+        return False
+    finally:
+        await controller.disconnect()
+
+
+def list_devices(cache: DeviceCache):
+    addresses = cache.addresses()
+    if not addresses:
+        print("Кэш устройств пуст: подключитесь к ленте из приложения или укажите -d АДРЕС")
+    for address in addresses:
+        entry = cache.get(address) or {}
+        print(f"{address}  {entry.get('name') or '-'}  протокол: {entry.get('protocol') or 'авто'}  "
+              f"характеристика: {entry.get('write_char') or 'не найдена'}")
+
+
+def _add_common_options(parser: argparse.ArgumentParser, default=None):
+    parser.add_argument("-d", "--device", default=default, help="Адрес или имя устройства из кэша")
+    parser.add_argument("-p", "--protocol", default=default,
+                        help="Протокол (по умолчанию - из кэша или по имени)")
+    parser.add_argument("--dry-run", action="store_true", default=default or False,
+                        help="Показать кадры без подключения")
+    parser.add_argument("-v", "--verbose", action="store_true", default=default or False,
+                        help="Подробный вывод подключения")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="LED Controller - команды без GUI")
+    _add_common_options(parser)
+    # Те же опции допускаются и после команды; SUPPRESS не затирает заданные до нее
+    common = argparse.ArgumentParser(add_help=False)
+    _add_common_options(common, argparse.SUPPRESS)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    color = commands.add_parser("color", parents=[common], help="Установить цвет")
+    color.add_argument("color", type=parse_color, help="RRGGBB, R,G,B или температура белого, например 2700K")
+    color.add_argument("--brightness", type=parse_brightness, help="Яркость 0-100")
+
+    brightness = commands.add_parser("brightness", parents=[common], help="Установить яркость")
+    brightness.add_argument("brightness", type=parse_brightness, help="0-100")
+
+    commands.add_parser("on", parents=[common], help="Включить")
+    commands.add_parser("off", parents=[common], help="Выключить")
+    commands.add_parser("devices", help="Устройства в кэше")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    cache = DeviceCache()
+
+    if args.command == "devices":
+        list_devices(cache)
+        return 0
+
+    from led_protocols import load_user_protocols
+    load_user_protocols()
+
+    address, entry = resolve_device(cache, args.device)
+    if args.dry_run:
+        protocol = cached_protocol(address, entry, args.protocol)
+        print(f"{address} ({protocol.name}), характеристика: {entry.get('write_char') or 'будет найдена'}")
+        try:
+            frames = build_frames(protocol, args, entry.get("color"))
+        except ValueError as e:
+            print(e)
+            return 1
+        for frame in frames:
+            print(bytes(frame).hex(" "))
+        return 0
+
+    # asyncio импортируется только для настоящей отправки: --dry-run обходится без него
+    import asyncio
+    return 0 if asyncio.run(execute(address, entry, args)) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,472 @@
+"""
+Цветовые пространства и цветовая температура
+
+Лента принимает (R, G, B) 0..255; здесь - переводы из HSV/HSL, белого по
+цветовой температуре (K) и перцептивных пространств OKLab и CIELAB. В них
+переход между цветами идет равномерно по восприятию, без темной или
+"грязной" середины, как при смешивании в RGB.
+
+У каждого перевода есть скалярная версия (кортежи, без NumPy - для
+контроллера и командной строки) и пакетная *_array на NumPy (для
+led_frames). Все, что сводится к таблице, сведено к ней: температура ->
+RGB, гамма, яркость, sRGB <-> линейная интенсивность. Таблицы строятся при
+первом обращении, дальше перевод - чтение по индексу.
+
+Соглашения: H, S, V и L в HSV/HSL - доли 0..1 (как в colorsys и
+led_frames); L в OKLab - 0..1, в CIELAB - 0..100 (белая точка D65).
+"""
+
+import colorsys
+import functools
+import math
+from typing import Callable, Dict, Sequence, Tuple
+
+Color = Tuple[int, int, int]
+Triple = Tuple[float, float, float]
+
+
+def _numpy():
+    # NumPy нужен только пакетным функциям: контроллер и командная строка работают без него
+    import numpy
+    return numpy
+
+
+def _clamp8(value: float) -> int:
+    return 0 if value <= 0 else 255 if value >= 255 else int(value + 0.5)
+
+
+# --- Разбор и запись ---
+
+def parse_color(text: str) -> Color:
+    """Цвет из "#RRGGBB", "RRGGBB", "R,G,B" или температуры "2700K" """
+    value = text.strip()
+    try:
+        if value[-1:] in ("K", "k"):
+            return kelvin_to_rgb(float(value[:-1]))
+        if "," in value:
+            color = tuple(int(part) for part in value.split(","))
+        else:
+            value = value.lstrip("#")
+            if len(value) != 6:
+                raise ValueError
+            color = tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        raise ValueError(f"некорректный цвет: {text}") from None
+    if len(color) != 3 or not all(0 <= v <= 255 for v in color):
+        raise ValueError(f"некорректный цвет: {text}")
+    return color
+
+
+def to_hex(color: Sequence[int]) -> str:
+    """"#RRGGBB" """
+    return "#{:02X}{:02X}{:02X}".format(*color)
+
+
+# Быстрые пресеты GUI: название и цвет в формате parse_color
+PRESETS: Tuple[Tuple[str, str], ...] = (
+    ("Красный", "#FF0000"),
+    ("Зеленый", "#00FF00"),
+    ("Синий", "#0000FF"),
+    ("Желтый", "#FFFF00"),
+    ("Фиолетовый", "#FF00FF"),
+    ("Голубой", "#00FFFF"),
+    ("Белый", "#FFFFFF"),
+    ("Оранжевый", "#FF8800"),
+    ("Теплый белый", "2700K"),
+    ("Мягкий белый", "3500K"),
+    ("Нейтральный белый", "4500K"),
+    ("Дневной свет", "6500K"),
+)
+
+
+# --- HSV и HSL ---
+
+def hsv_to_rgb(h: float, s: float = 1.0, v: float = 1.0) -> Color:
+    """HSV -> RGB; оттенок по кругу, доли 0..1"""
+    r, g, b = colorsys.hsv_to_rgb(h % 1.0, s, v)
+    return _clamp8(r * 255), _clamp8(g * 255), _clamp8(b * 255)
+
+
+def rgb_to_hsv(color: Sequence[int]) -> Triple:
+    """RGB -> (H, S, V), доли 0..1"""
+    return colorsys.rgb_to_hsv(color[0] / 255, color[1] / 255, color[2] / 255)
+
+
+def hsl_to_rgb(h: float, s: float = 1.0, l: float = 0.5) -> Color:
+    """HSL -> RGB; оттенок по кругу, доли 0..1"""
+    r, g, b = colorsys.hls_to_rgb(h % 1.0, l, s)
+    return _clamp8(r * 255), _clamp8(g * 255), _clamp8(b * 255)
+
+
+def rgb_to_hsl(color: Sequence[int]) -> Triple:
+    """RGB -> (H, S, L), доли 0..1"""
+    h, l, s = colorsys.rgb_to_hls(color[0] / 255, color[1] / 255, color[2] / 255)
+    return h, s, l
+
+
+# --- Цветовая температура ---
+
+KELVIN_MIN = 1000
+KELVIN_MAX = 40000
+KELVIN_STEP = 10
+
+
+def _kelvin_formula(kelvin: float) -> Triple:
+    # Аппроксимация излучения черного тела (Tanner Helland), точность - доли процента
+    t = kelvin / 100
+    if t <= 66:
+        r = 255.0
+        g = 99.4708025861 * math.log(t) - 161.1195681661
+    else:
+        r = 329.698727446 * (t - 60) ** -0.1332047592
+        g = 288.1221695283 * (t - 60) ** -0.0755148492
+    if t >= 66:
+        b = 255.0
+    elif t <= 19:
+        b = 0.0
+    else:
+        b = 138.5177312231 * math.log(t - 10) - 305.0447927307
+    return r, g, b
+
+
+@functools.lru_cache(maxsize=None)
+def kelvin_table() -> Tuple[Color, ...]:
+    """RGB для температур от KELVIN_MIN до KELVIN_MAX с шагом KELVIN_STEP"""
+    return tuple(tuple(_clamp8(c) for c in _kelvin_formula(kelvin))
+                 for kelvin in range(KELVIN_MIN, KELVIN_MAX + 1, KELVIN_STEP))
+
+
+def kelvin_to_rgb(kelvin: float) -> Color:
+    """Белый цвет заданной температуры; вне 1000-40000 K - ближайшая граница"""
+    kelvin = min(max(kelvin, KELVIN_MIN), KELVIN_MAX)
+    return kelvin_table()[int((kelvin - KELVIN_MIN) / KELVIN_STEP + 0.5)]
+
+
+# --- Гамма и яркость ---
+
+@functools.lru_cache(maxsize=None)
+def gamma_table(gamma: float = 2.2) -> bytes:
+    """Гамма-коррекция канала: table[значение 0-255]"""
+    return bytes(round(255 * (v / 255) ** gamma) for v in range(256))
+
+
+@functools.lru_cache(maxsize=None)
+def brightness_lut(gamma: float = 2.2) -> tuple:
+    """
+    Таблица масштабирования канала по яркости: lut[яркость 0-100][значение 0-255]
+
+    Яркость воспринимается нелинейно, поэтому множитель берется как (яркость/100)^gamma.
+    """
+    return tuple(bytes(round(v * (level / 100) ** gamma) for v in range(256))
+                 for level in range(101))
+
+
+# --- sRGB <-> линейная интенсивность ---
+
+# Обратная таблица: линейная интенсивность 0..1 -> индекс; 16384 ступени хватает,
+# чтобы перевод туда и обратно возвращал исходный байт и в темных тонах
+_ENCODE_STEPS = 16383
+
+
+def _decode(c: float) -> float:
+    return c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+
+
+def _encode(c: float) -> float:
+    return 12.92 * c if c <= 0.0031308 else 1.055 * c ** (1 / 2.4) - 0.055
+
+
+@functools.lru_cache(maxsize=None)
+def _decode_table() -> Tuple[float, ...]:
+    return tuple(_decode(v / 255) for v in range(256))
+
+
+@functools.lru_cache(maxsize=None)
+def _encode_table() -> bytes:
+    return bytes(_clamp8(255 * _encode(i / _ENCODE_STEPS)) for i in range(_ENCODE_STEPS + 1))
+
+
+def srgb_to_linear(color: Sequence[int]) -> Triple:
+    """RGB 0..255 -> линейная интенсивность 0..1"""
+    table = _decode_table()
+    return table[color[0]], table[color[1]], table[color[2]]
+
+
+def linear_to_srgb(rgb: Sequence[float]) -> Color:
+    """Линейная интенсивность 0..1 -> RGB 0..255 (вне диапазона - обрезается)"""
+    table = _encode_table()
+    return tuple(table[0 if c <= 0 else _ENCODE_STEPS if c >= 1 else int(c * _ENCODE_STEPS + 0.5)]
+                 for c in rgb)
+
+
+# --- OKLab и CIELAB ---
+
+# OKLab (Björn Ottosson): линейный RGB -> LMS, кубический корень, -> Lab
+_RGB_TO_LMS = ((0.4122214708, 0.5363325363, 0.0514459929),
+               (0.2119034982, 0.6806995451, 0.1073969566),
+               (0.0883024619, 0.2817188376, 0.6299787005))
+_LMS_TO_OKLAB = ((0.2104542553, 0.7936177850, -0.0040720468),
+                 (1.9779984951, -2.4285922050, 0.4505937099),
+                 (0.0259040371, 0.7827717662, -0.8086757660))
+_OKLAB_TO_LMS = ((1.0, 0.3963377774, 0.2158037573),
+                 (1.0, -0.1055613458, -0.0638541728),
+                 (1.0, -0.0894841775, -1.2914855480))
+_LMS_TO_RGB = ((4.0767416621, -3.3077115913, 0.2309699292),
+               (-1.2684380046, 2.6097574011, -0.3413193965),
+               (-0.0041960863, -0.7034186147, 1.7076147010))
+
+# CIELAB: линейный RGB -> XYZ (D65) и обратно
+_RGB_TO_XYZ = ((0.4124564, 0.3575761, 0.1804375),
+               (0.2126729, 0.7151522, 0.0721750),
+               (0.0193339, 0.1191920, 0.9503041))
+_XYZ_TO_RGB = ((3.2404542, -1.5371385, -0.4985314),
+               (-0.9692660, 1.8760108, 0.0415560),
+               (0.0556434, -0.2040259, 1.0572252))
+_WHITE = (0.95047, 1.0, 1.08883)
+_DELTA = 6 / 29
+
+
+def _apply(matrix, v: Sequence[float]) -> Triple:
+    return (matrix[0][0] * v[0] + matrix[0][1] * v[1] + matrix[0][2] * v[2],
+            matrix[1][0] * v[0] + matrix[1][1] * v[1] + matrix[1][2] * v[2],
+            matrix[2][0] * v[0] + matrix[2][1] * v[1] + matrix[2][2] * v[2])
+
+
+def _cbrt(x: float) -> float:
+    return x ** (1 / 3) if x >= 0 else -((-x) ** (1 / 3))
+
+
+def rgb_to_oklab(color: Sequence[int]) -> Triple:
+    """RGB 0..255 -> OKLab (L, a, b)"""
+    l, m, s = _apply(_RGB_TO_LMS, srgb_to_linear(color))
+    return _apply(_LMS_TO_OKLAB, (_cbrt(l), _cbrt(m), _cbrt(s)))
+
+
+def oklab_to_rgb(lab: Sequence[float]) -> Color:
+    """OKLab -> RGB 0..255 (цвета вне sRGB обрезаются)"""
+    l, m, s = _apply(_OKLAB_TO_LMS, lab)
+    return linear_to_srgb(_apply(_LMS_TO_RGB, (l * l * l, m * m * m, s * s * s)))
+
+
+def _lab_f(t: float) -> float:
+    return _cbrt(t) if t > _DELTA ** 3 else t / (3 * _DELTA * _DELTA) + 4 / 29
+
+
+def _lab_f_inverse(t: float) -> float:
+    return t * t * t if t > _DELTA else 3 * _DELTA * _DELTA * (t - 4 / 29)
+
+
+def rgb_to_lab(color: Sequence[int]) -> Triple:
+    """RGB 0..255 -> CIELAB (L 0..100, a, b)"""
+    x, y, z = _apply(_RGB_TO_XYZ, srgb_to_linear(color))
+    fx, fy, fz = _lab_f(x / _WHITE[0]), _lab_f(y / _WHITE[1]), _lab_f(z / _WHITE[2])
+    return 116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz)
+
+
+def lab_to_rgb(lab: Sequence[float]) -> Color:
+    """CIELAB -> RGB 0..255 (цвета вне sRGB обрезаются)"""
+    fy = (lab[0] + 16) / 116
+    xyz = (_WHITE[0] * _lab_f_inverse(fy + lab[1] / 500),
+           _WHITE[1] * _lab_f_inverse(fy),
+           _WHITE[2] * _lab_f_inverse(fy - lab[2] / 200))
+    return linear_to_srgb(_apply(_XYZ_TO_RGB, xyz))
+
+
+# --- Интерполяция ---
+
+# Пространства смешивания: имя -> (из RGB, в RGB); None - смешивать RGB напрямую
+SPACES: Dict[str, Tuple[Callable, Callable]] = {
+    "rgb": (None, None),
+    "oklab": (rgb_to_oklab, oklab_to_rgb),
+    "lab": (rgb_to_lab, lab_to_rgb),
+}
+
+
+def interpolator(a: Sequence[int], b: Sequence[int], space: str = "oklab") -> Callable[[float], Color]:
+    """
+    Функция k -> цвет между a (k=0) и b (k=1)
+
+    Концы переводятся в пространство space один раз, поэтому на кадр
+    остается одно обратное преобразование.
+    """
+    try:
+        forward, backward = SPACES[space]
+    except KeyError:
+        raise ValueError(f"Неизвестное цветовое пространство: {space}; есть: {', '.join(SPACES)}") from None
+    if forward is None:
+        return lambda k: (_clamp8(a[0] + (b[0] - a[0]) * k),
+                          _clamp8(a[1] + (b[1] - a[1]) * k),
+                          _clamp8(a[2] + (b[2] - a[2]) * k))
+    start, end = forward(a), forward(b)
+    delta = (end[0] - start[0], end[1] - start[1], end[2] - start[2])
+    return lambda k: backward((start[0] + delta[0] * k, start[1] + delta[1] * k, start[2] + delta[2] * k))
+
+
+def mix(a: Sequence[int], b: Sequence[int], k: float, space: str = "oklab") -> Color:
+    """Цвет между a и b (k от 0 до 1) в пространстве space"""
+    return interpolator(a, b, space)(k)
+
+
+# --- Пакетные версии (NumPy) ---
+
+@functools.lru_cache(maxsize=None)
+def gamma_array(gamma: float = 2.2):
+    """gamma_table как массив uint8 (для выборки table[frames])"""
+    np = _numpy()
+    return np.frombuffer(gamma_table(gamma), dtype=np.uint8)
+
+
+@functools.lru_cache(maxsize=None)
+def _kelvin_array():
+    np = _numpy()
+    return np.array(kelvin_table(), dtype=np.uint8)
+
+
+def kelvin_to_rgb_array(kelvins):
+    """Температуры (любая форма) -> массив (..., 3) uint8"""
+    np = _numpy()
+    kelvins = np.clip(np.asarray(kelvins, dtype=np.float32), KELVIN_MIN, KELVIN_MAX)
+    return _kelvin_array()[((kelvins - KELVIN_MIN) / KELVIN_STEP + 0.5).astype(np.intp)]
+
+
+def hsv_to_rgb_array(h, s, v):
+    """
+    Векторный перевод HSV -> RGB
+
+    Все аргументы в диапазоне 0..1 и приводимы к общей форме;
+    результат той же формы с последней осью RGB (значения 0..255, float).
+    """
+    np = _numpy()
+    h, s, v = np.broadcast_arrays(np.asarray(h, dtype=np.float32) % 1.0,
+                                  np.asarray(s, dtype=np.float32),
+                                  np.asarray(v, dtype=np.float32))
+    i = np.floor(h * 6).astype(np.int8) % 6
+    f = h * 6 - np.floor(h * 6)
+    p = v * (1 - s)
+    q = v * (1 - s * f)
+    t = v * (1 - s * (1 - f))
+
+    r = np.choose(i, [v, q, p, p, t, v])
+    g = np.choose(i, [t, v, v, q, p, p])
+    b = np.choose(i, [p, p, t, v, v, q])
+    return np.stack([r, g, b], axis=-1) * 255
+
+
+def rgb_to_hsv_array(rgb):
+    """Массив (..., 3) RGB 0..255 -> (..., 3) H, S, V (доли 0..1, float32)"""
+    np = _numpy()
+    rgb = np.asarray(rgb, dtype=np.float32) / 255
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    v = rgb.max(axis=-1)
+    chroma = v - rgb.min(axis=-1)
+    safe = np.where(chroma > 0, chroma, 1)
+    h = np.where(v == r, (g - b) / safe, np.where(v == g, 2 + (b - r) / safe, 4 + (r - g) / safe))
+    h = np.where(chroma > 0, (h / 6) % 1.0, 0)
+    s = np.where(v > 0, chroma / np.where(v > 0, v, 1), 0)
+    return np.stack([h, s, v], axis=-1).astype(np.float32)
+
+
+def hsl_to_rgb_array(h, s, l):
+    """Векторный перевод HSL -> RGB (значения 0..255, float), аргументы как у hsv_to_rgb_array"""
+    np = _numpy()
+    s, l = np.asarray(s, dtype=np.float32), np.asarray(l, dtype=np.float32)
+    v = l + s * np.minimum(l, 1 - l)
+    return hsv_to_rgb_array(h, np.where(v > 0, 2 * (1 - l / np.where(v > 0, v, 1)), 0), v)
+
+
+@functools.lru_cache(maxsize=None)
+def _decode_array():
+    np = _numpy()
+    return np.array(_decode_table(), dtype=np.float32)
+
+
+@functools.lru_cache(maxsize=None)
+def _encode_array():
+    np = _numpy()
+    return np.frombuffer(_encode_table(), dtype=np.uint8)
+
+
+def srgb_to_linear_array(rgb):
+    """RGB 0..255 -> линейная интенсивность 0..1 (float32); целые значения - выборкой из таблицы"""
+    np = _numpy()
+    rgb = np.asarray(rgb)
+    if rgb.dtype == np.uint8:
+        return _decode_array()[rgb]
+    c = np.clip(rgb.astype(np.float32) / 255, 0, 1)
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4).astype(np.float32)
+
+
+def linear_to_srgb_array(linear):
+    """Линейная интенсивность 0..1 -> RGB 0..255 uint8 выборкой из таблицы"""
+    np = _numpy()
+    index = np.rint(np.clip(linear, 0, 1) * _ENCODE_STEPS).astype(np.intp)
+    return _encode_array()[index]
+
+
+def _apply_array(matrix, values):
+    np = _numpy()
+    return values @ np.asarray(matrix, dtype=np.float32).T
+
+
+def rgb_to_oklab_array(rgb):
+    """Массив (..., 3) RGB -> OKLab (float32)"""
+    np = _numpy()
+    return _apply_array(_LMS_TO_OKLAB, np.cbrt(_apply_array(_RGB_TO_LMS, srgb_to_linear_array(rgb))))
+
+
+def oklab_to_rgb_array(lab):
+    """Массив (..., 3) OKLab -> RGB uint8"""
+    lms = _apply_array(_OKLAB_TO_LMS, lab)
+    return linear_to_srgb_array(_apply_array(_LMS_TO_RGB, lms * lms * lms))
+
+
+def rgb_to_lab_array(rgb):
+    """Массив (..., 3) RGB -> CIELAB (float32)"""
+    np = _numpy()
+    xyz = _apply_array(_RGB_TO_XYZ, srgb_to_linear_array(rgb)) / np.asarray(_WHITE, dtype=np.float32)
+    f = np.where(xyz > _DELTA ** 3, np.cbrt(xyz), xyz / (3 * _DELTA * _DELTA) + 4 / 29)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])],
+                    axis=-1).astype(np.float32)
+
+
+def lab_to_rgb_array(lab):
+    """Массив (..., 3) CIELAB -> RGB uint8"""
+    np = _numpy()
+    lab = np.asarray(lab, dtype=np.float32)
+    fy = (lab[..., 0] + 16) / 116
+    f = np.stack([fy + lab[..., 1] / 500, fy, fy - lab[..., 2] / 200], axis=-1)
+    xyz = np.where(f > _DELTA, f * f * f, 3 * _DELTA * _DELTA * (f - 4 / 29)) * np.asarray(_WHITE, dtype=np.float32)
+    return linear_to_srgb_array(_apply_array(_XYZ_TO_RGB, xyz))
+
+
+# Пакетные пространства смешивания: имя -> (из RGB, в RGB uint8)
+ARRAY_SPACES: Dict[str, Tuple[Callable, Callable]] = {
+    "oklab": (rgb_to_oklab_array, oklab_to_rgb_array),
+    "lab": (rgb_to_lab_array, lab_to_rgb_array),
+}
+
+
+def mix_array(a, b, k, space: str = "oklab"):
+    """
+    Цвета между a и b для массива долей k
+
+    Args:
+        a, b: Цвета (..., 3) RGB, приводимые к общей форме
+        k: Доли 0..1 с формой, приводимой к (...) без оси RGB
+        space: "rgb", "oklab" или "lab"
+
+    Returns:
+        Массив (..., 3) uint8
+    """
+    np = _numpy()
+    k = np.asarray(k, dtype=np.float32)[..., None]
+    if space == "rgb":
+        a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+        return np.clip(np.rint(a + (b - a) * k), 0, 255).astype(np.uint8)
+    try:
+        forward, backward = ARRAY_SPACES[space]
+    except KeyError:
+        raise ValueError(f"Неизвестное цветовое пространство: {space}; есть: rgb, {', '.join(ARRAY_SPACES)}") from None
+    start = forward(np.asarray(a, dtype=np.uint8))
+    end = forward(np.asarray(b, dtype=np.uint8))
+    return backward(start + (end - start) * k)
@@ -1,51 +1,246 @@
 """
-LED Controller - Современный интерфейс на CustomTkinter
+LED Controller - управление LED лентой по Bluetooth
+
+Модуль без GUI: класс LEDController используют приложение (led_gui.py),
+командная строка (led_cli.py) и фоновый сервис (led_daemon.py).
 """
 
 import asyncio
-import customtkinter as ctk
-from tkinter import colorchooser, messagebox
-from bleak import BleakScanner, BleakClient
-import threading
-from typing import Optional
+import multiprocessing
+import random
+import re
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from led_cache import DeviceCache
+from led_colors import brightness_lut, hsv_to_rgb, kelvin_to_rgb
+from led_metrics import METRICS, DeviceMetrics, MetricsRegistry
+from led_protocols import (PROTOCOL_MATCHER, PROTOCOLS, LEDProtocol, detect_protocol, fused_brightness_error,
+                           get_protocol)
+from led_queue import CommandQueue, FlowController
+from led_transport import BleakTransport
+
 
-# Настройка темы
-ctk.set_appearance_mode("dark")
-ctk.set_default_color_theme("blue")
+class DiscoveredDevice(NamedTuple):
+    """Найденное при сканировании устройство"""
+    name: str
+    address: str
+    rssi: int
+    service_uuids: Tuple[str, ...] = ()
+    manufacturer_data: Optional[Dict[int, bytes]] = None
+    protocol: Optional[str] = None  # определен по рекламному пакету (имя в PROTOCOLS)
+
+
+class DeviceState:
+    """Теневое состояние ленты: что пользователь просил показать"""
+    
+    __slots__ = ("color", "brightness", "power")
+    
+    def __init__(self):
+        self.color: Optional[tuple] = None
+        self.brightness: Optional[int] = None
+        self.power: Optional[bool] = None
 
 
 class LEDController:
     """Класс для управления LED лентой через Bluetooth"""
     
-    def __init__(self):
-        self.client: Optional[BleakClient] = None
+    # Сколько неудачных записей подряд в выбранную характеристику до повторного поиска
+    REPROBE_AFTER_FAILURES = 3
+    # Протокол для устройств, которые не удалось распознать по имени
+    DEFAULT_PROTOCOL = "ELK-BLEDOM"
+    # Паузы между попытками переподключения: первая и максимальная, секунды
+    RECONNECT_INITIAL_DELAY = 0.5
+    RECONNECT_MAX_DELAY = 30.0
+    
+    def __init__(self, cache: Optional[DeviceCache] = None, transport=None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 auto_reconnect: bool = True,
+                 keep_warm: Optional[float] = None,
+                 adaptive_rate: bool = True):
+        # Транспорт: BleakTransport (по умолчанию) или SimulatedTransport из led_transport
+        self.transport = transport if transport is not None else BleakTransport()
+        self.client = None
         self.device_address: Optional[str] = None
         self.write_characteristics = []
         self.device_name: str = ""
+        # Характеристика, в которую запись проходит (закрепляется на сессию)
+        self.write_char: Optional[str] = None
+        self._write_failures = 0
+        self.cache = cache if cache is not None else DeviceCache()
+        # Подбор темпа по подтвержденным записям (для протоколов, пишущих без подтверждения)
+        self.adaptive_rate = adaptive_rate
+        self.flow: Optional[FlowController] = None
+        # Очередь команд: при быстрых изменениях на ленту уходит только последнее значение
+        self.queue = CommandQueue(self.send_command)
+        self.protocol: LEDProtocol = PROTOCOLS[self.DEFAULT_PROTOCOL]
+        self.set_protocol(self.protocol)
+        # Метрики устройства появляются в реестре после подключения
+        self.metrics_registry = metrics if metrics is not None else METRICS
+        self.metrics = DeviceMetrics("")
+        # Теневое состояние и последние поставленные в очередь значения по видам команд:
+        # повторная отправка того, что лента уже показывает, пропускается
+        self.state = DeviceState()
+        self._shown: Dict[str, object] = {}
+        # Совмещать яркость с цветом: None - по профилю протокола
+        self.fuse_brightness: Optional[bool] = None
+        # Переподключаться при обрыве связи; команды на это время держатся в очереди
+        self.auto_reconnect = auto_reconnect
+        # Период пинга простаивающего соединения в секундах (None - не пинговать)
+        self.keep_warm = keep_warm
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing = False
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._keep_warm_task: Optional[asyncio.Task] = None
+        self._last_activity = 0.0
+        self._last_frame: Optional[bytearray] = None
+        self._read_char: Optional[str] = None
+        # Вызываются после каждой успешной записи: listener(controller, data) (запись шоу и т.п.)
+        self.write_listeners: List[Callable[["LEDController", bytearray], None]] = []
+        
+    # Изменение RSSI, при котором список устройств пересылается заново
+    RSSI_UPDATE_THRESHOLD = 5
+    
+    async def scan_devices(self,
+                           timeout: float = 10.0,
+                           on_update: Optional[Callable[[List[DiscoveredDevice]], None]] = None,
+                           name_pattern: Optional[str] = None,
+                           stop_on_known: bool = False) -> List[DiscoveredDevice]:
+        """
+        Потоковое сканирование Bluetooth устройств
+        
+        Args:
+            timeout: Максимальная длительность сканирования в секундах
+            on_update: Вызывается с текущим списком (по убыванию RSSI) при появлении устройств
+            name_pattern: Регулярное выражение - сканирование завершается при совпадении имени
+            stop_on_known: Завершить сканирование, как только найдено устройство из кэша
+        
+        Returns:
+            Список устройств без повторов, отсортированный по убыванию RSSI
+        """
+        found: Dict[str, DiscoveredDevice] = {}
+        finished = asyncio.Event()
+        matcher = re.compile(name_pattern, re.IGNORECASE) if name_pattern else None
+        known = set(self.cache.addresses()) if stop_on_known else set()
+        
+        def on_detection(device, advertisement_data):
+            name = device.name or advertisement_data.local_name
+            if not name:
+                return
+            
+            rssi = advertisement_data.rssi
+            service_uuids = tuple(advertisement_data.service_uuids or ())
+            manufacturer_data = dict(advertisement_data.manufacturer_data or {})
+            previous = found.get(device.address)
+            if previous is not None:
+                # Ответ на сканирование приходит отдельно и может нести то, чего не было в рекламе:
+                # признаки копятся, а не заменяются последним пакетом
+                service_uuids = previous.service_uuids + tuple(u for u in service_uuids
+                                                               if u not in previous.service_uuids)
+                known_data = previous.manufacturer_data or {}
+                manufacturer_data = {**known_data, **manufacturer_data}
+                same = (name == previous.name and service_uuids == previous.service_uuids
+                        and manufacturer_data.keys() == known_data.keys())
+                # Порог RSSI - только для уведомлений об уже известном устройстве
+                if same and abs(previous.rssi - rssi) < self.RSSI_UPDATE_THRESHOLD:
+                    return
+            
+            protocol = PROTOCOL_MATCHER.classify(device.address, name, service_uuids, manufacturer_data)
+            found[device.address] = DiscoveredDevice(name, device.address, rssi, service_uuids,
+                                                     manufacturer_data, protocol)
+            if on_update:
+                on_update(self._sort_devices(found))
+            
+            if device.address.upper() in known or (matcher and matcher.search(name)):
+                finished.set()
         
-    async def scan_devices(self):
-        """Сканирование доступных Bluetooth устройств"""
-        devices = await BleakScanner.discover(timeout=10.0)
-        return [(d.name or "Unknown", d.address) for d in devices if d.name]
+        scanner = self.transport.create_scanner(on_detection)
+        await scanner.start()
+        try:
+            await asyncio.wait_for(finished.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            await scanner.stop()
+        
+        return self._sort_devices(found)
+    
+    @staticmethod
+    def _sort_devices(found: Dict[str, DiscoveredDevice]) -> List[DiscoveredDevice]:
+        return sorted(found.values(), key=lambda d: d.rssi, reverse=True)
+    
+    def set_protocol(self, protocol: LEDProtocol):
+        """Выбор протокола и темпа отправки под возможности прошивки"""
+        self.protocol = protocol
+        self.queue.set_rate(protocol.profile.max_write_rate)
+        profile = protocol.profile
+        # Темп из профиля - начальная точка, дальше он подстраивается под конкретную ленту
+        self.flow = (FlowController(profile.max_write_rate)
+                     if self.adaptive_rate and profile.max_write_rate and not profile.write_with_response
+                     else None)
+        # Кадры другого протокола - прошлые значения не считаются показанными
+        self._shown = {}
     
-    async def connect(self, address: str, device_name: str = ""):
-        """Подключение к устройству"""
+    async def connect(self, address: str, device_name: str = "", protocol: Optional[str] = None):
+        """
+        Подключение к устройству
+        
+        Args:
+            address: Адрес устройства
+            device_name: Имя устройства (по нему определяется протокол)
+            protocol: Имя протокола из led_protocols; None - автоопределение
+        """
+        self._cancel_background_tasks()
         try:
-            self.client = BleakClient(address)
+            self._loop = asyncio.get_running_loop()
+            self.client = self.transport.create_client(address, self._on_disconnected)
             await self.client.connect()
             self.device_address = address
             self.device_name = device_name
+            self.metrics = self.metrics_registry.device(address)
+            self.metrics.attach_queue(self.queue)
+            self.metrics.record_event("connect")
+            # Что показывает лента после подключения - неизвестно
+            self.state = DeviceState()
+            self._shown.clear()
             
             self.write_characteristics = []
+            self.write_char = None
+            self._write_failures = 0
             print(f"\n=== Информация об устройстве ===")
             print(f"Имя: {device_name}")
             print(f"Адрес: {address}")
             
-            for service in self.client.services:
-                for char in service.characteristics:
-                    if "write" in char.properties or "write-without-response" in char.properties:
-                        self.write_characteristics.append(char.uuid)
+            cached = self.cache.get(address)
+            if protocol:
+                # Выбранный вручную протокол запоминаем для следующих подключений
+                self.set_protocol(get_protocol(protocol))
+                self.cache.update(address, protocol=protocol)
+            elif cached and cached.get("protocol") in PROTOCOLS:
+                self.set_protocol(PROTOCOLS[cached["protocol"]])
+            elif PROTOCOL_MATCHER.cached(address) in PROTOCOLS:
+                # Определен при сканировании по рекламному пакету
+                self.set_protocol(PROTOCOLS[PROTOCOL_MATCHER.cached(address)])
+            else:
+                self.set_protocol(detect_protocol(device_name, address, default=PROTOCOLS[self.DEFAULT_PROTOCOL]))
+            print(f"Протокол: {self.protocol.name}")
+            
+            if cached and cached.get("write_char"):
+                # Характеристика известна с прошлого раза - сервисы не перебираем
+                self.write_characteristics = cached.get("write_characteristics") or [cached["write_char"]]
+                self.write_char = cached["write_char"]
+                print(f"Характеристика из кэша: {self.write_char}")
+            else:
+                self.discover_characteristics()
             
+            self._closing = False
+            self._last_activity = time.monotonic()
+            self._last_frame = None
+            self._read_char = None
+            self.queue.resume()
+            if self.keep_warm:
+                self._keep_warm_task = self._loop.create_task(self._keep_warm_loop())
             return True
         except Exception as e:
             print(f"Ошибка подключения: {e}")
@@ -53,555 +248,328 @@ class LEDController:
     
     async def disconnect(self):
         """Отключение от устройства"""
-        if self.client and self.client.is_connected:
+        self._closing = True
+        self._cancel_background_tasks()
+        self.queue.clear()
+        self.queue.resume()
+        if self.device_address and self.state.color is not None:
+            # Последний цвет нужен совмещенной яркости в следующем сеансе (CLI brightness N)
+            self.cache.update(self.device_address, color=list(self.state.color))
+        if self.client is not None:
+            connected = self.client.is_connected
+            # Клиент прерванного подключения (таймаут, отмена) тоже отключается
             await self.client.disconnect()
+            if connected:
+                self.metrics.record_event("disconnect")
+    
+    @property
+    def reconnecting(self) -> bool:
+        """Связь потеряна и идет переподключение (команды копятся в очереди)"""
+        return self._reconnect_task is not None and not self._reconnect_task.done()
+    
+    def _cancel_background_tasks(self):
+        for task in (self._reconnect_task, self._keep_warm_task):
+            if task is not None:
+                task.cancel()
+        self._reconnect_task = self._keep_warm_task = None
+    
+    def _on_disconnected(self, client):
+        """Колбэк транспорта об обрыве связи (может прийти из другого потока)"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._handle_link_lost, client)
+    
+    def _handle_link_lost(self, client):
+        # Колбэк от старого клиента или от отключения по запросу - не обрыв
+        if client is not self.client or self._closing:
+            return
+        self.metrics.record_event("link_lost")
+        print(f"Связь с {self.device_address} потеряна")
+        if not self.auto_reconnect:
+            return
+        # На время обрыва команды копятся в очереди и схлопываются до последних значений
+        self.queue.pause()
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = self._loop.create_task(self._reconnect_loop())
+    
+    async def _reconnect_loop(self):
+        """Переподключение с экспоненциально растущей паузой и случайным разбросом"""
+        attempt = 0
+        while not self._closing:
+            delay = min(self.RECONNECT_MAX_DELAY, self.RECONNECT_INITIAL_DELAY * 2 ** min(attempt, 16))
+            # Разброс, чтобы ленты после общего сбоя не переподключались одновременно
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+            attempt += 1
+            
+            client = self.transport.create_client(self.device_address, self._on_disconnected)
+            try:
+                await client.connect()
+            except Exception as e:
+                print(f"Переподключение к {self.device_address}, попытка {attempt}: {e}")
+                continue
+            
+            self.client = client
+            self.metrics.record_event("reconnect")
+            print(f"Связь с {self.device_address} восстановлена (попытка {attempt})")
+            if not self.write_characteristics:
+                self.discover_characteristics()
+            self._read_char = None
+            self._replay_state()
+            self.queue.resume()
+            return
+    
+    def _replay_state(self):
+        """Вернуть ленте последнее запрошенное состояние после переподключения"""
+        # Что лента показывает после обрыва - неизвестно
+        self._shown.clear()
+        state = self.state
+        if state.power is not None:
+            command = self.protocol.power_on_command if state.power else self.protocol.power_off_command
+            self._submit_state("power", state.power, command, True)
+        if state.brightness is not None and not self.fused:
+            brightness = state.brightness
+            self._submit_state("brightness", brightness,
+                               lambda: self.protocol.brightness_command(brightness), True)
+        if state.color is not None:
+            self._post_fused_color(True)
+    
+    async def _keep_warm_loop(self):
+        """Пинг соединения, если по нему дольше keep_warm секунд ничего не передавалось"""
+        while not self._closing:
+            idle = time.monotonic() - self._last_activity
+            if idle < self.keep_warm:
+                await asyncio.sleep(self.keep_warm - idle)
+                continue
+            if self.client and self.client.is_connected and not self.queue.paused:
+                await self._ping()
+            self._last_activity = time.monotonic()
+    
+    async def _ping(self):
+        """Легкий обмен с лентой: чтение характеристики или повтор последнего кадра"""
+        try:
+            if self._read_char is None:
+                self._read_char = next((char.uuid for service in self.client.services
+                                        for char in service.characteristics
+                                        if "read" in char.properties), "")
+            if self._read_char:
+                await self.client.read_gatt_char(self._read_char)
+            elif self._last_frame is not None:
+                # Повтор уже показанного кадра ничего не меняет на ленте
+                await self.queue.submit("keep_warm", self._last_frame)
+        except Exception as e:
+            # Настоящий обрыв придет через колбэк отключения
+            print(f"Пинг {self.device_address} не прошел: {e}")
+    
+    def discover_characteristics(self):
+        """Поиск характеристик для записи по сервисам устройства"""
+        self.write_characteristics = []
+        layout = []
+        
+        for service in self.client.services:
+            for char in service.characteristics:
+                layout.append(f"{service.uuid}/{char.uuid}/{','.join(sorted(char.properties))}")
+                if "write" in char.properties or "write-without-response" in char.properties:
+                    self.write_characteristics.append(char.uuid)
+        
+        signature = DeviceCache.layout_signature(layout)
+        cached = self.cache.get(self.device_address) or {}
+        fields = {"name": self.device_name,
+                  "layout": signature,
+                  "write_characteristics": self.write_characteristics}
+        if cached.get("layout") != signature or cached.get("write_char") not in self.write_characteristics:
+            # Раскладка сервисов изменилась - найденная ранее характеристика недействительна
+            fields["write_char"] = None
+        self.cache.update(self.device_address, **fields)
     
     async def send_command(self, data: bytearray):
         """Отправка команды"""
         if not self.client or not self.client.is_connected:
             return False
         
-        for char_uuid in self.write_characteristics:
+        self._last_activity = time.monotonic()
+        if self.write_char:
+            probe = self.flow is not None and self.flow.should_probe()
+            started = time.perf_counter()
             try:
-                await self.client.write_gatt_char(char_uuid, data, response=False)
+                await self._write(self.write_char, data, acknowledged=probe)
+            except Exception as e:
+                if probe:
+                    self.queue.set_rate(self.flow.on_probe(None))
+                self.metrics.failures += 1
+                self._write_failures += 1
+                if self._write_failures < self.REPROBE_AFTER_FAILURES:
+                    return False
+                print(f"Запись в {self.write_char} не проходит ({e}), ищем характеристику заново")
+                self.write_char = None
+                self.discover_characteristics()
+            else:
+                elapsed = time.perf_counter() - started
+                self.metrics.write_latency.record(elapsed)
+                self.metrics.writes += 1
+                self._write_failures = 0
+                if probe:
+                    self.queue.set_rate(self.flow.on_probe(elapsed))
+                # Слушатели - после записи и вне ее try: их ошибка не делает записанный кадр неудачным
+                self._written(data)
                 return True
-            except:
-                pass
-        return False
+        
+        return await self._probe_write(data)
     
-    async def send_color(self, r: int, g: int, b: int):
-        """Отправка цвета на ленту"""
-        data = bytearray([0x7E, 0x07, 0x05, 0x03, r, g, b, 0x10, 0xEF])
-        return await self.send_command(data)
-    
-    async def set_brightness(self, brightness: int):
-        """Установка яркости (0-100)"""
-        brightness_val = int(brightness * 0.64)
-        if brightness_val > 64:
-            brightness_val = 64
-        data = bytearray([0x7E, 0x04, 0x01, brightness_val, 0xFF, 0xFF, 0xFF, 0x00, 0xEF])
-        return await self.send_command(data)
-    
-    async def power_on(self):
-        """Включение ленты"""
-        data = bytearray([0x7E, 0x04, 0x04, 0x01, 0xFF, 0xFF, 0xFF, 0x00, 0xEF])
-        return await self.send_command(data)
+    def _written(self, data: bytearray):
+        self._last_frame = data
+        for listener in list(self.write_listeners):
+            try:
+                listener(self, data)
+            except Exception as e:
+                print(f"Ошибка обработчика записи {listener!r}: {e}")
     
-    async def power_off(self):
-        """Выключение ленты"""
-        data = bytearray([0x7E, 0x04, 0x04, 0x00, 0xFF, 0xFF, 0xFF, 0x00, 0xEF])
-        return await self.send_command(data)
-
-
-class LEDControllerApp:
-    """Современный GUI на CustomTkinter"""
+    async def _probe_write(self, data: bytearray):
+        """Перебор характеристик до первой успешной записи и закрепление найденной"""
+        for attempt, char_uuid in enumerate(self.write_characteristics):
+            if attempt:
+                self.metrics.retries += 1
+            started = time.perf_counter()
+            try:
+                await self._write(char_uuid, data)
+            except Exception:
+                self.metrics.failures += 1
+                continue
+            
+            self.metrics.write_latency.record(time.perf_counter() - started)
+            self.metrics.writes += 1
+            self.write_char = char_uuid
+            self._write_failures = 0
+            self._written(data)
+            self.cache.update(self.device_address,
+                              name=self.device_name,
+                              write_char=char_uuid,
+                              write_characteristics=self.write_characteristics)
+            return True
+        return False
     
-    def __init__(self, root):
-        self.root = root
-        self.root.title("LED Controller")
-        self.root.geometry("700x900")
-        
-        self.controller = LEDController()
-        self.loop = asyncio.new_event_loop()
-        self.current_color = (255, 255, 255)
-        self.selected_device_idx = None
-        
-        self.create_ui()
+    async def _write(self, char_uuid: str, data: bytearray, acknowledged: bool = False):
+        """
+        Запись с учетом профиля протокола: режим подтверждения и размер пакета
+        
+        Args:
+            acknowledged: Записать с подтверждением, даже если протокол пишет без него
+        """
+        profile = self.protocol.profile
+        response = profile.write_with_response or acknowledged
+        if len(data) <= profile.max_payload:
+            await self.client.write_gatt_char(char_uuid, data, response=response)
+            return
         
-        # Запуск asyncio
-        self.thread = threading.Thread(target=self.run_asyncio_loop, daemon=True)
-        self.thread.start()
+        for offset in range(0, len(data), profile.max_payload):
+            await self.client.write_gatt_char(char_uuid, data[offset:offset + profile.max_payload],
+                                              response=response)
     
-    def run_asyncio_loop(self):
-        """Запуск asyncio event loop"""
-        asyncio.set_event_loop(self.loop)
-        self.loop.run_forever()
+    async def enqueue_command(self, kind: str, data: bytearray):
+        """Отправка команды через очередь (ожидающая команда того же вида заменяется)"""
+        return await self.queue.submit(kind, data)
     
-    def create_ui(self):
-        """Создание интерфейса"""
-        
-        # Заголовок
-        header = ctk.CTkFrame(self.root, height=80, corner_radius=0)
-        header.pack(fill="x", padx=0, pady=0)
-        header.pack_propagate(False)
-        
-        ctk.CTkLabel(header, 
-                    text="💡 LED Controller",
-                    font=ctk.CTkFont(size=28, weight="bold")).pack(pady=25)
-        
-        # Основной контейнер со скроллом
-        container = ctk.CTkScrollableFrame(self.root, fg_color="transparent")
-        container.pack(fill="both", expand=True, padx=20, pady=20)
-        
-        # Панель подключения
-        self.create_connection_panel(container)
-        
-        # Панель управления цветом
-        self.create_color_panel(container)
-        
-        # Панель управления
-        self.create_control_panel(container)
+    def get_queue_stats(self):
+        """Счетчики очереди команд: отправлено, схлопнуто, отброшено и т.д."""
+        stats = self.queue.stats()
+        if self.flow is not None:
+            stats["flow"] = self.flow.stats()
+        return stats
     
-    def create_connection_panel(self, parent):
-        """Панель подключения к устройству"""
-        frame = ctk.CTkFrame(parent)
-        frame.pack(fill="x", pady=(0, 15))
-        
-        # Заголовок
-        ctk.CTkLabel(frame, 
-                    text="🔗 Подключение",
-                    font=ctk.CTkFont(size=16, weight="bold")).pack(anchor="w", padx=15, pady=(15, 10))
-        
-        # Список устройств (контейнер для radiobuttons)
-        self.device_list_frame = ctk.CTkScrollableFrame(frame, 
-                                                        height=100,
-                                                        fg_color="#2b2b2b")
-        self.device_list_frame.pack(fill="x", padx=15, pady=(0, 10))
-        
-        # Заглушка когда нет устройств
-        self.no_devices_label = ctk.CTkLabel(self.device_list_frame,
-                                            text="Нажмите 'Сканировать' для поиска устройств...",
-                                            font=ctk.CTkFont(size=11),
-                                            text_color="gray")
-        self.no_devices_label.pack(pady=20)
-        
-        self.device_radio_var = ctk.IntVar(value=-1)
-        
-        # Кнопки
-        btn_frame = ctk.CTkFrame(frame, fg_color="transparent")
-        btn_frame.pack(fill="x", padx=15, pady=(0, 10))
-        
-        self.scan_btn = ctk.CTkButton(btn_frame, 
-                                     text="🔍 Сканировать",
-                                     command=self.scan_devices,
-                                     height=35,
-                                     font=ctk.CTkFont(size=13))
-        self.scan_btn.pack(side="left", padx=(0, 10))
-        
-        self.connect_btn = ctk.CTkButton(btn_frame, 
-                                        text="⚡ Подключить",
-                                        command=self.connect_device,
-                                        height=35,
-                                        font=ctk.CTkFont(size=13))
-        self.connect_btn.pack(side="left", padx=(0, 10))
-        
-        self.disconnect_btn = ctk.CTkButton(btn_frame, 
-                                           text="❌ Отключить",
-                                           command=self.disconnect_device,
-                                           height=35,
-                                           fg_color="#dc3545",
-                                           hover_color="#c82333",
-                                           font=ctk.CTkFont(size=13),
-                                           state="disabled")
-        self.disconnect_btn.pack(side="left")
-        
-        # Статус
-        self.status_label = ctk.CTkLabel(frame, 
-                                        text="● Не подключено",
-                                        font=ctk.CTkFont(size=12),
-                                        text_color="#dc3545")
-        self.status_label.pack(anchor="w", padx=15, pady=(0, 15))
-        
-        self.devices = []
+    @property
+    def fused(self) -> bool:
+        """Применяется ли яркость масштабированием цвета"""
+        if self.fuse_brightness is not None:
+            return self.fuse_brightness
+        return self.protocol.profile.fused_brightness
     
-    def create_color_panel(self, parent):
-        """Панель выбора цвета"""
-        frame = ctk.CTkFrame(parent)
-        frame.pack(fill="both", expand=True, pady=(0, 15))
-        
-        # Заголовок
-        ctk.CTkLabel(frame, 
-                    text="🎨 Выбор цвета",
-                    font=ctk.CTkFont(size=16, weight="bold")).pack(anchor="w", padx=15, pady=(15, 10))
-        
-        # Контейнер для превью и слайдеров
-        color_container = ctk.CTkFrame(frame, fg_color="transparent")
-        color_container.pack(fill="both", expand=True, padx=15)
-        
-        # Левая часть - превью
-        left_frame = ctk.CTkFrame(color_container, fg_color="transparent")
-        left_frame.pack(side="left", fill="y", padx=(0, 15))
-        
-        ctk.CTkLabel(left_frame, 
-                    text="Превью",
-                    font=ctk.CTkFont(size=12)).pack(pady=(0, 10))
-        
-        self.color_preview = ctk.CTkFrame(left_frame, 
-                                         width=180, 
-                                         height=180,
-                                         fg_color="#FFFFFF",
-                                         corner_radius=10)
-        self.color_preview.pack()
-        self.color_preview.pack_propagate(False)
-        
-        self.hex_label = ctk.CTkLabel(left_frame, 
-                                     text="#FFFFFF",
-                                     font=ctk.CTkFont(size=16, weight="bold"))
-        self.hex_label.pack(pady=(10, 0))
-        
-        # Правая часть - слайдеры RGB
-        right_frame = ctk.CTkFrame(color_container, fg_color="transparent")
-        right_frame.pack(side="left", fill="both", expand=True)
-        
-        self.rgb_sliders = {}
-        colors = [('R', '#ff4444'), ('G', '#44ff44'), ('B', '#4444ff')]
-        
-        for i, (label, color) in enumerate(colors):
-            slider_frame = ctk.CTkFrame(right_frame, fg_color="transparent")
-            slider_frame.pack(fill="x", pady=10)
-            
-            # Заголовок слайдера
-            header_frame = ctk.CTkFrame(slider_frame, fg_color="transparent")
-            header_frame.pack(fill="x", pady=(0, 5))
-            
-            ctk.CTkLabel(header_frame, 
-                        text=label,
-                        font=ctk.CTkFont(size=14, weight="bold"),
-                        text_color=color).pack(side="left")
-            
-            value_label = ctk.CTkLabel(header_frame, 
-                                      text="255",
-                                      font=ctk.CTkFont(size=13),
-                                      width=40)
-            value_label.pack(side="right")
-            
-            # Слайдер
-            slider = ctk.CTkSlider(slider_frame,
-                                  from_=0,
-                                  to=255,
-                                  number_of_steps=255,
-                                  command=lambda v, lbl=value_label, idx=i: self.on_rgb_change(v, lbl, idx),
-                                  state="disabled")
-            slider.set(255)
-            slider.pack(fill="x")
-            
-            self.rgb_sliders[label] = (slider, value_label)
-        
-        # Кнопка выбора цвета
-        color_btn_frame = ctk.CTkFrame(frame, fg_color="transparent")
-        color_btn_frame.pack(fill="x", padx=15, pady=(10, 0))
-        
-        self.color_picker_btn = ctk.CTkButton(color_btn_frame,
-                                             text="🎨 Выбрать из палитры",
-                                             command=self.choose_color,
-                                             height=35,
-                                             state="disabled")
-        self.color_picker_btn.pack(side="left", padx=(0, 10))
-        
-        # Быстрые пресеты
-        ctk.CTkLabel(frame, 
-                    text="Быстрый выбор",
-                    font=ctk.CTkFont(size=12)).pack(anchor="w", padx=15, pady=(15, 5))
-        
-        preset_frame = ctk.CTkFrame(frame, fg_color="transparent")
-        preset_frame.pack(fill="x", padx=15, pady=(0, 15))
-        
-        presets = [
-            ("Красный", "#FF0000"),
-            ("Зеленый", "#00FF00"),
-            ("Синий", "#0000FF"),
-            ("Желтый", "#FFFF00"),
-            ("Фиолетовый", "#FF00FF"),
-            ("Голубой", "#00FFFF"),
-            ("Белый", "#FFFFFF"),
-            ("Оранжевый", "#FF8800")
-        ]
-        
-        self.preset_buttons = []
-        for i, (name, color) in enumerate(presets):
-            btn = ctk.CTkButton(preset_frame,
-                              text="",
-                              width=60,
-                              height=30,
-                              fg_color=color,
-                              hover_color=color,
-                              command=lambda c=color: self.set_preset_color(c),
-                              state="disabled")
-            btn.grid(row=0, column=i, padx=3)
-            self.preset_buttons.append(btn)
-    
-    def create_control_panel(self, parent):
-        """Панель управления яркостью и питанием"""
-        frame = ctk.CTkFrame(parent)
-        frame.pack(fill="x")
-        
-        # Заголовок
-        ctk.CTkLabel(frame, 
-                    text="⚙️ Управление",
-                    font=ctk.CTkFont(size=16, weight="bold")).pack(anchor="w", padx=15, pady=(15, 10))
-        
-        # Яркость
-        brightness_frame = ctk.CTkFrame(frame, fg_color="transparent")
-        brightness_frame.pack(fill="x", padx=15, pady=(0, 15))
-        
-        header_frame = ctk.CTkFrame(brightness_frame, fg_color="transparent")
-        header_frame.pack(fill="x", pady=(0, 5))
-        
-        ctk.CTkLabel(header_frame, 
-                    text="💡 Яркость",
-                    font=ctk.CTkFont(size=14)).pack(side="left")
-        
-        self.brightness_value = ctk.CTkLabel(header_frame, 
-                                            text="100%",
-                                            font=ctk.CTkFont(size=13))
-        self.brightness_value.pack(side="right")
-        
-        self.brightness_slider = ctk.CTkSlider(brightness_frame,
-                                              from_=0,
-                                              to=100,
-                                              number_of_steps=100,
-                                              command=self.on_brightness_change,
-                                              state="disabled")
-        self.brightness_slider.set(100)
-        self.brightness_slider.pack(fill="x")
-        
-        # Кнопки питания
-        power_frame = ctk.CTkFrame(frame, fg_color="transparent")
-        power_frame.pack(fill="x", padx=15, pady=(0, 15))
-        
-        self.power_on_btn = ctk.CTkButton(power_frame,
-                                         text="⚡ Включить",
-                                         command=self.power_on,
-                                         height=40,
-                                         fg_color="#28a745",
-                                         hover_color="#218838",
-                                         font=ctk.CTkFont(size=14, weight="bold"),
-                                         state="disabled")
-        self.power_on_btn.pack(side="left", fill="x", expand=True, padx=(0, 10))
-        
-        self.power_off_btn = ctk.CTkButton(power_frame,
-                                          text="🔌 Выключить",
-                                          command=self.power_off,
-                                          height=40,
-                                          fg_color="#dc3545",
-                                          hover_color="#c82333",
-                                          font=ctk.CTkFont(size=14, weight="bold"),
-                                          state="disabled")
-        self.power_off_btn.pack(side="left", fill="x", expand=True)
-    
-    def on_rgb_change(self, value, label, index):
-        """Изменение RGB слайдера"""
-        value = int(value)
-        label.configure(text=str(value))
-        
-        # Обновляем текущий цвет
-        colors = list(self.current_color)
-        colors[index] = value
-        self.current_color = tuple(colors)
-        
-        # Обновляем превью
-        self.update_color_preview()
-        
-        # Отправляем на ленту
-        asyncio.run_coroutine_threadsafe(
-            self.controller.send_color(*self.current_color), self.loop
-        )
-    
-    def on_brightness_change(self, value):
-        """Изменение яркости"""
-        value = int(value)
-        self.brightness_value.configure(text=f"{value}%")
-        
-        asyncio.run_coroutine_threadsafe(
-            self.controller.set_brightness(value), self.loop
-        )
-    
-    def update_color_preview(self):
-        """Обновление превью цвета"""
-        hex_color = '#{:02x}{:02x}{:02x}'.format(*self.current_color)
-        self.color_preview.configure(fg_color=hex_color)
-        self.hex_label.configure(text=hex_color.upper())
-    
-    def choose_color(self):
-        """Выбор цвета через палитру"""
-        color = colorchooser.askcolor(title="Выберите цвет")
-        if color[0]:
-            r, g, b = map(int, color[0])
-            self.set_color(r, g, b)
-    
-    def set_preset_color(self, hex_color):
-        """Установка пресета"""
-        r = int(hex_color[1:3], 16)
-        g = int(hex_color[3:5], 16)
-        b = int(hex_color[5:7], 16)
-        self.set_color(r, g, b)
-    
-    def set_color(self, r, g, b):
-        """Установка цвета"""
-        self.current_color = (r, g, b)
-        
-        # Обновляем слайдеры
-        self.rgb_sliders['R'][0].set(r)
-        self.rgb_sliders['G'][0].set(g)
-        self.rgb_sliders['B'][0].set(b)
-        
-        self.rgb_sliders['R'][1].configure(text=str(r))
-        self.rgb_sliders['G'][1].configure(text=str(g))
-        self.rgb_sliders['B'][1].configure(text=str(b))
-        
-        # Обновляем превью
-        self.update_color_preview()
-        
-        # Отправляем на ленту
-        asyncio.run_coroutine_threadsafe(
-            self.controller.send_color(r, g, b), self.loop
-        )
-    
-    def scan_devices(self):
-        """Сканирование устройств"""
-        # Очищаем список
-        for widget in self.device_list_frame.winfo_children():
-            widget.destroy()
-        
-        # Показываем статус сканирования
-        scanning_label = ctk.CTkLabel(self.device_list_frame,
-                                     text="⏳ Сканирование устройств...",
-                                     font=ctk.CTkFont(size=11))
-        scanning_label.pack(pady=20)
-        
-        self.scan_btn.configure(state="disabled")
-        self.selected_device_idx = None
-        
-        def scan():
-            devices = asyncio.run_coroutine_threadsafe(
-                self.controller.scan_devices(), self.loop
-            ).result()
-            self.root.after(0, self.update_device_list, devices)
-        
-        threading.Thread(target=scan, daemon=True).start()
+    def _submit_state(self, kind: str, value, data_factory, force: bool) -> asyncio.Future:
+        """Поставить команду в очередь, если она меняет то, что показывает лента"""
+        if not force and kind in self._shown and self._shown[kind] == value:
+            self.metrics.suppressed += 1
+            done = asyncio.get_running_loop().create_future()
+            done.set_result(True)
+            return done
+        
+        self._shown[kind] = value
+        future = self.queue.submit(kind, data_factory())
+        
+        def on_done(f):
+            # Запись не прошла - значение не считается показанным
+            if (f.cancelled() or not f.result()) and self._shown.get(kind) == value:
+                del self._shown[kind]
+        
+        future.add_done_callback(on_done)
+        return future
     
-    def update_device_list(self, devices):
-        """Обновление списка устройств"""
-        self.devices = devices
-        
-        # Очищаем список
-        for widget in self.device_list_frame.winfo_children():
-            widget.destroy()
-        
-        if not devices:
-            no_dev_label = ctk.CTkLabel(self.device_list_frame,
-                                       text="❌ Устройства не найдены",
-                                       font=ctk.CTkFont(size=11),
-                                       text_color="#dc3545")
-            no_dev_label.pack(pady=20)
-        else:
-            # Создаем список кнопок устройств
-            self.device_radio_var.set(-1)
-            self.device_buttons = []
-            
-            for i, (name, address) in enumerate(devices):
-                # Создаем кнопку для каждого устройства
-                btn = ctk.CTkButton(self.device_list_frame,
-                                   text=f"📱 {name}\n    {address}",
-                                   font=ctk.CTkFont(size=11),
-                                   height=60,
-                                   anchor="w",
-                                   fg_color="#2b2b2b",
-                                   hover_color="#3a3a3a",
-                                   border_width=2,
-                                   border_color="#3a3a3a",
-                                   command=lambda idx=i: self.select_device(idx))
-                btn.pack(fill="x", padx=5, pady=3)
-                self.device_buttons.append(btn)
-        
-        self.scan_btn.configure(state="normal")
+    def _post_fused_color(self, force: bool = False) -> asyncio.Future:
+        """Цвет с учетом яркости одним кадром"""
+        r, g, b = self.state.color
+        if self.fused and self.state.brightness is not None:
+            lut = brightness_lut()[max(0, min(100, self.state.brightness))]
+            r, g, b = lut[r], lut[g], lut[b]
+        return self._submit_state("color", (r, g, b),
+                                  lambda: self.protocol.color_command(r, g, b), force)
     
-    def select_device(self, idx):
-        """Выбор устройства из списка"""
-        self.selected_device_idx = idx
-        
-        # Обновляем визуальное состояние кнопок
-        for i, btn in enumerate(self.device_buttons):
-            if i == idx:
-                # Выбранное устройство - подсвечиваем
-                btn.configure(fg_color="#1f6feb", 
-                            border_color="#1f6feb",
-                            text_color="white")
-            else:
-                # Остальные - обычный стиль
-                btn.configure(fg_color="#2b2b2b", 
-                            border_color="#3a3a3a",
-                            text_color="white")
-    
-    def connect_device(self):
-        """Подключение к устройству"""
-        if not self.devices:
-            messagebox.showwarning("Внимание", "Сначала просканируйте устройства")
-            return
-        
-        if self.selected_device_idx is None:
-            messagebox.showwarning("Внимание", "Выберите устройство из списка")
-            return
-        
-        device_name, address = self.devices[self.selected_device_idx]
-        
-        self.status_label.configure(text="● Подключение...", text_color="#ffc107")
-        self.connect_btn.configure(state="disabled")
-        
-        def connect():
-            success = asyncio.run_coroutine_threadsafe(
-                self.controller.connect(address, device_name), self.loop
-            ).result()
-            self.root.after(0, self.on_connection_result, success)
-        
-        threading.Thread(target=connect, daemon=True).start()
+    async def send_color(self, r: int, g: int, b: int, force: bool = False):
+        """Отправка цвета на ленту"""
+        return await self.post_color(r, g, b, force)
     
-    def on_connection_result(self, success):
-        """Результат подключения"""
-        if success:
-            self.status_label.configure(text="● Подключено ✓", text_color="#28a745")
-            self.disconnect_btn.configure(state="normal")
-            
-            # Включаем все элементы управления
-            for slider, _ in self.rgb_sliders.values():
-                slider.configure(state="normal")
-            
-            self.brightness_slider.configure(state="normal")
-            self.color_picker_btn.configure(state="normal")
-            self.power_on_btn.configure(state="normal")
-            self.power_off_btn.configure(state="normal")
-            
-            for btn in self.preset_buttons:
-                btn.configure(state="normal")
-        else:
-            self.status_label.configure(text="● Ошибка подключения", text_color="#dc3545")
-            self.connect_btn.configure(state="normal")
-            messagebox.showerror("Ошибка", "Не удалось подключиться к устройству")
-    
-    def disconnect_device(self):
-        """Отключение от устройства"""
-        asyncio.run_coroutine_threadsafe(self.controller.disconnect(), self.loop)
-        
-        self.status_label.configure(text="● Не подключено", text_color="#dc3545")
-        self.connect_btn.configure(state="normal")
-        self.disconnect_btn.configure(state="disabled")
-        
-        # Отключаем все элементы управления
-        for slider, _ in self.rgb_sliders.values():
-            slider.configure(state="disabled")
-        
-        self.brightness_slider.configure(state="disabled")
-        self.color_picker_btn.configure(state="disabled")
-        self.power_on_btn.configure(state="disabled")
-        self.power_off_btn.configure(state="disabled")
-        
-        for btn in self.preset_buttons:
-            btn.configure(state="disabled")
+    def post_color(self, r: int, g: int, b: int, force: bool = False) -> asyncio.Future:
+        """Поставить цвет в очередь без ожидания результата (из потока event loop'а)"""
+        self.state.color = (r, g, b)
+        return self._post_fused_color(force)
     
-    def power_on(self):
+    async def send_hsv(self, hue: float, saturation: float = 1.0, value: float = 1.0, force: bool = False):
+        """Отправка цвета в HSV (оттенок, насыщенность и значение - доли 0..1)"""
+        return await self.post_color(*hsv_to_rgb(hue, saturation, value), force)
+    
+    async def send_temperature(self, kelvin: float, force: bool = False):
+        """Отправка белого заданной цветовой температуры (1000-40000 K)"""
+        return await self.post_color(*kelvin_to_rgb(kelvin), force)
+    
+    async def set_brightness(self, brightness: int, force: bool = False,
+                             fallback_color: Optional[tuple] = None):
+        """
+        Установка яркости (0-100)
+        
+        При совмещенной яркости масштабируется последний известный цвет: заданный
+        в этом сеансе, fallback_color (цвет, который показывает интерфейс) или
+        сохраненный в кэше при прошлом отключении. Если цвет неизвестен - ValueError.
+        """
+        if self.fused and self.state.color is None:
+            color = fallback_color or (self.cache.get(self.device_address) or {}).get("color")
+            if not color:
+                raise ValueError(fused_brightness_error(self.protocol.name))
+            self.state.color = tuple(color)
+        self.state.brightness = brightness
+        if self.fused:
+            return await self._post_fused_color(force)
+        return await self._submit_state("brightness", brightness,
+                                        lambda: self.protocol.brightness_command(brightness), force)
+    
+    async def power_on(self, force: bool = False):
         """Включение ленты"""
-        asyncio.run_coroutine_threadsafe(self.controller.power_on(), self.loop)
+        self.state.power = True
+        return await self._submit_state("power", True, self.protocol.power_on_command, force)
     
-    def power_off(self):
+    async def power_off(self, force: bool = False):
         """Выключение ленты"""
-        asyncio.run_coroutine_threadsafe(self.controller.power_off(), self.loop)
+        self.state.power = False
+        return await self._submit_state("power", False, self.protocol.power_off_command, force)
 
 
 def main():
-    root = ctk.CTk()
-    app = LEDControllerApp(root)
-    root.mainloop()
+    # Без окна: фоновый сервис с локальным API (остальные аргументы - см. led_daemon.py --help)
+    if "--headless" in sys.argv[1:]:
+        import led_daemon
+        led_daemon.main([arg for arg in sys.argv[1:] if arg != "--headless"])
+        return
+
+    # GUI загружается только здесь: CLI и сервис не платят за импорт tkinter
+    import led_gui
+    led_gui.main()
 
 
 if __name__ == "__main__":
+    # Процессы анализа led_sources в собранном EXE запускаются через этот же файл
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,427 @@
+"""
+Фоновый сервис LED Controller без графического интерфейса
+
+Держит постоянные подключения к лентам (DevicePool) и принимает пакеты
+команд от нескольких клиентов одновременно:
+- HTTP/JSON на localhost: POST /commands, GET /state, GET /metrics
+  (POST - с Content-Type: application/json; вне loopback - только с --token)
+- Unix socket (где поддерживается): одна JSON строка на пакет, ответ - одна строка
+
+Пример пакета:
+
+    {"commands": [
+        {"cmd": "set_color", "devices": ["BE:FF:20:00:11:22"], "color": "#FF8800"},
+        {"cmd": "set_brightness", "devices": "kitchen", "brightness": 60},
+        {"cmd": "effect", "name": "rainbow", "params": {"period": 4}},
+        {"cmd": "source", "path": "song.wav", "devices": "kitchen"}
+    ]}
+
+Пути команды source - относительно --media-dir; без него команда выключена.
+
+Поле "at" (время по time.time()) или "sync": true у set_color, set_brightness,
+power и effect включают синхронное применение на всех лентах (led_scenes).
+
+Запуск:
+
+    python led_daemon.py --port 8765 --connect BE:FF:20:00:11:22
+    python led_controller.py --headless
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+import led_colors
+from led_controller import LEDController
+from led_effects import EFFECTS, EffectEngine
+from led_http import HTTPRequest, HTTPResponse, is_loopback, json_response, serve_http, text_response
+from led_metrics import METRICS
+from led_pool import DevicePool
+from led_protocols import load_user_protocols
+from led_scenes import SceneScheduler
+
+
+class CommandError(Exception):
+    """Некорректная команда"""
+
+
+def parse_color(value) -> tuple:
+    """
+    Цвет из [R, G, B], строки "#RRGGBB" или "2700K", {"kelvin": 2700},
+    {"hsv": [H, S, V]} или {"hsl": [H, S, L]} (доли 0..1)
+    """
+    try:
+        if isinstance(value, str):
+            return led_colors.parse_color(value)
+        if isinstance(value, dict) and len(value) == 1:
+            (space, components), = value.items()
+            if space == "kelvin":
+                return led_colors.kelvin_to_rgb(float(components))
+            if space in ("hsv", "hsl") and len(components) == 3:
+                convert = led_colors.hsv_to_rgb if space == "hsv" else led_colors.hsl_to_rgb
+                return convert(*(float(c) for c in components))
+    except (TypeError, ValueError) as e:
+        raise CommandError(str(e) if isinstance(e, ValueError) else f"некорректный цвет: {value}")
+    if isinstance(value, (list, tuple)) and len(value) == 3:
+        color = tuple(int(v) for v in value)
+        if all(0 <= v <= 255 for v in color):
+            return color
+    raise CommandError(f"некорректный цвет: {value}")
+
+
+def _effect_params(params: dict) -> dict:
+    # JSON не знает кортежей: цвета и списки цветов приводим к виду, который ждут эффекты
+    converted = {}
+    for key, value in params.items():
+        if isinstance(value, (list, str, dict)) and key in ("color", "start", "end", "off"):
+            value = parse_color(value)
+        elif key == "colors":
+            value = [parse_color(color) for color in value]
+        converted[key] = value
+    return converted
+
+
+def _result_dict(results) -> dict:
+    return {address: {"success": r.success, "latency_ms": round(r.latency * 1000, 3), "error": r.error}
+            for address, r in results.items()}
+
+
+def _scene_dict(results) -> dict:
+    return {address: {"success": r.success, "lead_ms": round(r.lead * 1000, 3), "error": r.error}
+            for address, r in results.items()}
+
+
+def _scheduled(command: dict) -> bool:
+    return "at" in command or bool(command.get("sync"))
+
+
+class LEDDaemon:
+    """Исполнитель команд поверх пула подключений"""
+
+    def __init__(self, pool: Optional[DevicePool] = None, fps: float = 30.0, scan_timeout: float = 5.0,
+                 media_dir: Optional[str] = None):
+        self.pool = pool if pool is not None else DevicePool()
+        self.effects = EffectEngine(fps=fps)
+        self.scenes = SceneScheduler(self.pool)
+        self.scan_timeout = scan_timeout
+        # Команда source читает файлы только из этого каталога; None - команда выключена
+        self.media_dir = media_dir
+        self.sources = None  # SourcePool создается при первой команде source
+
+    # --- Выполнение команд ---
+
+    async def execute_batch(self, commands: List[dict]) -> List[dict]:
+        """Выполнение пакета команд по порядку; ошибка одной не прерывает остальные"""
+        return [await self.execute(command) for command in commands]
+
+    async def execute(self, command: dict) -> dict:
+        """Выполнение одной команды"""
+        try:
+            if not isinstance(command, dict):
+                raise CommandError("команда должна быть объектом")
+            name = command.get("cmd")
+            handler = getattr(self, f"_cmd_{name}", None) if isinstance(name, str) else None
+            if handler is None:
+                raise CommandError(f"неизвестная команда: {name}")
+            return {"ok": True, **(await handler(command))}
+        except (CommandError, KeyError, TypeError, ValueError) as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            # Сбой связи или устройства (BleakError, OSError, таймаут) - ошибка этой команды, не пакета
+            error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            print(f"Ошибка команды {command.get('cmd')}: {error}")
+            return {"ok": False, "error": error}
+
+    async def _targets(self, command: dict) -> List[str]:
+        """Адреса цели команды; неподключенные устройства подключаются"""
+        addresses = self.pool.resolve(command.get("devices"))
+        connected = set(self.pool.connected())
+        # Переподключающиеся ленты получат команды из очереди после восстановления связи
+        missing = [address for address in addresses if address not in connected
+                   and not (address in self.pool.controllers and self.pool.controllers[address].reconnecting)]
+        if missing:
+            await self.pool.connect_many(missing)
+        return addresses
+
+    async def _cmd_scan(self, command: dict) -> dict:
+        # Поиск не зависит от подключения, поэтому достаточно временного контроллера
+        scanner = LEDController(cache=self.pool.cache, transport=self.pool.transport)
+        devices = await scanner.scan_devices(timeout=float(command.get("timeout", self.scan_timeout)),
+                                             name_pattern=command.get("name_pattern"))
+        return {"devices": [{"name": d.name, "address": d.address, "rssi": d.rssi,
+                             "protocol": d.protocol} for d in devices]}
+
+    async def _cmd_connect(self, command: dict) -> dict:
+        results = await self.pool.connect_many(self.pool.resolve(command.get("devices")))
+        return {"results": _result_dict(results)}
+
+    async def _cmd_disconnect(self, command: dict) -> dict:
+        addresses = self.pool.resolve(command.get("devices"))
+        for address in addresses:
+            controller = self.pool.controllers.get(address)
+            if controller is not None:
+                self.effects.stop(controller)
+            await self.pool.disconnect(address)
+        return {"devices": addresses}
+
+    async def _cmd_group(self, command: dict) -> dict:
+        self.pool.add_group(command["name"], command["devices"])
+        return {"groups": self.pool.groups}
+
+    async def _cmd_set_color(self, command: dict) -> dict:
+        color = parse_color(command["color"])
+        addresses = await self._targets(command)
+        self._stop_effects(addresses)
+        if _scheduled(command):
+            return {"results": _scene_dict(await self.scenes.set_color(addresses, *color, at=command.get("at")))}
+        return {"results": _result_dict(await self.pool.set_color(addresses, *color))}
+
+    async def _cmd_set_brightness(self, command: dict) -> dict:
+        brightness = int(command["brightness"])
+        if not 0 <= brightness <= 100:
+            raise CommandError("яркость должна быть от 0 до 100")
+        addresses = await self._targets(command)
+        if _scheduled(command):
+            return {"results": _scene_dict(await self.scenes.set_brightness(addresses, brightness,
+                                                                            at=command.get("at")))}
+        return {"results": _result_dict(await self.pool.set_brightness(addresses, brightness))}
+
+    async def _cmd_power(self, command: dict) -> dict:
+        addresses = await self._targets(command)
+        on = bool(command.get("on", True))
+        if not on:
+            self._stop_effects(addresses)
+        if _scheduled(command):
+            return {"results": _scene_dict(await self.scenes.power(addresses, on, at=command.get("at")))}
+        return {"results": _result_dict(await self.pool.power(addresses, on))}
+
+    async def _cmd_effect(self, command: dict) -> dict:
+        factory = EFFECTS.get(command.get("name"))
+        if factory is None:
+            raise CommandError(f"неизвестный эффект: {command.get('name')}; есть: {', '.join(EFFECTS)}")
+        params = _effect_params(command.get("params", {}))
+        addresses = await self._targets(command)
+        if _scheduled(command):
+            connected = [address for address in addresses if address in self.pool.connected()]
+            leads = self.scenes.start_effect(self.effects, connected, factory, command.get("at"), **params)
+            return {"devices": list(leads)}
+        started = []
+        for address in addresses:
+            controller = self.pool.controllers.get(address)
+            if controller is not None and address in self.pool.connected():
+                # У каждой ленты свой генератор кадров
+                self.effects.start(controller, factory(**params))
+                started.append(address)
+        return {"devices": started}
+
+    def _media_path(self, path: str) -> str:
+        """Путь к файлу источника внутри media_dir; выход за каталог запрещен"""
+        if self.media_dir is None:
+            raise CommandError("команда source выключена: задайте каталог медиа (--media-dir)")
+        root = os.path.realpath(self.media_dir)
+        full = os.path.realpath(os.path.join(root, path))
+        if os.path.commonpath([root, full]) != root:
+            raise CommandError(f"путь вне каталога медиа: {path}")
+        return full
+
+    async def _cmd_source(self, command: dict) -> dict:
+        # Цвета из файла: анализ в пуле процессов, кадры играет EffectEngine
+        from led_sources import SourcePool
+
+        path = self._media_path(command["path"])
+        addresses = await self._targets(command)
+        connected = [address for address in addresses if address in self.pool.connected()]
+        if not connected:
+            raise CommandError("нет подключенных устройств")
+        if self.sources is None:
+            self.sources = SourcePool()
+        source = self.sources.open(path, kind=command.get("kind"),
+                                   fps=float(command.get("fps", self.effects.fps)),
+                                   colors=int(command.get("colors", 1)),
+                                   repeat=bool(command.get("repeat", False)),
+                                   **command.get("params", {}))
+        if not await source.ready():
+            source.close()
+            raise CommandError(f"нет кадров из {command['path']}: {source.error or 'анализ не успел начаться'}")
+
+        # Ленты по кругу получают доминирующие цвета кадра; источник закроется с последним эффектом
+        for index, address in enumerate(connected):
+            self.effects.start(self.pool.controllers[address], source.effect(channel=index))
+        return {"devices": connected, "source": source.stats()}
+
+    async def _cmd_stop_effect(self, command: dict) -> dict:
+        addresses = self.pool.resolve(command.get("devices"))
+        self._stop_effects(addresses)
+        return {"devices": addresses}
+
+    async def _cmd_state(self, command: dict) -> dict:
+        return {"devices": self.state(self.pool.resolve(command.get("devices"))),
+                "groups": self.pool.groups,
+                "effects": self.effects.stats()}
+
+    async def _cmd_metrics(self, command: dict) -> dict:
+        return {"metrics": METRICS.snapshot()}
+
+    async def stop(self):
+        """Остановка: эффекты, процессы анализа источников и подключения"""
+        self.effects.stop()
+        if self.sources is not None:
+            self.sources.close()
+            self.sources = None
+        await self.pool.disconnect_all()
+
+    def _stop_effects(self, addresses: List[str]):
+        for address in addresses:
+            controller = self.pool.controllers.get(address)
+            if controller is not None:
+                self.effects.stop(controller)
+
+    def state(self, addresses: List[str]) -> Dict[str, dict]:
+        """Состояние устройств"""
+        connected = set(self.pool.connected())
+        result = {}
+        for address in addresses:
+            controller = self.pool.controllers.get(address)
+            if controller is None:
+                result[address] = {"connected": False}
+                continue
+            result[address] = {
+                "connected": address in connected,
+                "reconnecting": controller.reconnecting,
+                "name": controller.device_name,
+                "protocol": controller.protocol.name,
+                "color": controller.state.color,
+                "brightness": controller.state.brightness,
+                "power": controller.state.power,
+                "effect": self.effects.is_running(controller),
+                "queue": controller.get_queue_stats(),
+            }
+        return result
+
+    # --- Серверы ---
+
+    @staticmethod
+    def _batch_from(payload) -> List[dict]:
+        if isinstance(payload, list):
+            return payload
+        if isinstance(payload, dict) and "commands" in payload:
+            return payload["commands"]
+        return [payload]
+
+    async def handle_http(self, request: HTTPRequest) -> HTTPResponse:
+        """Обработчик HTTP запросов"""
+        if request.method == "POST" and request.path == "/commands":
+            try:
+                payload = json.loads(request.body.decode("utf-8") or "null")
+            except ValueError as e:
+                return json_response({"ok": False, "error": f"некорректный JSON: {e}"}, "400 Bad Request")
+            return json_response({"results": await self.execute_batch(self._batch_from(payload))})
+
+        if request.method == "GET":
+            if request.path == "/state":
+                return json_response(await self._cmd_state({}))
+            metrics = METRICS.http_response(request.path)
+            if metrics is not None:
+                return metrics
+
+        return text_response("not found", "404 Not Found")
+
+    async def handle_socket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Клиент Unix socket: по JSON строке на пакет, ответ - JSON строка"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = {"results": await self.execute_batch(self._batch_from(json.loads(line)))}
+                except ValueError as e:
+                    response = {"ok": False, "error": f"некорректный JSON: {e}"}
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: Optional[int] = 8765,
+                    socket_path: Optional[str] = None, token: Optional[str] = None) -> list:
+        """Запуск серверов; возвращает список asyncio.Server"""
+        servers = []
+        if port is not None:
+            servers.append(await serve_http(self.handle_http, host, port, token))
+            print(f"HTTP API: http://{host}:{port}/commands")
+        if socket_path:
+            if not hasattr(asyncio, "start_unix_server"):
+                raise RuntimeError("Unix socket не поддерживается на этой платформе")
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            servers.append(await asyncio.start_unix_server(self.handle_socket, socket_path))
+            print(f"Unix socket: {socket_path}")
+        return servers
+
+
+async def run_daemon(args):
+    """Запуск сервиса и ожидание до остановки"""
+    transport = cache = None
+    if args.simulate:
+        from led_cache import DeviceCache
+        from led_transport import SimulatedDevice, SimulatedTransport
+        transport = SimulatedTransport([SimulatedDevice(f"BE:FF:00:00:00:{i:02X}", name=f"ELK-BLEDOM-{i}")
+                                        for i in range(args.simulate)])
+        # Симулированные устройства не должны попадать в настоящий кэш
+        cache = DeviceCache(os.path.join(tempfile.mkdtemp(prefix="led_daemon_"), "devices.json"))
+
+    pool = DevicePool(cache=cache, transport=transport, keep_warm=args.keep_warm)
+    daemon = LEDDaemon(pool, fps=args.fps, media_dir=args.media_dir)
+    servers = await daemon.serve(args.host, args.port, args.socket, args.token)
+    asyncio.get_running_loop().create_task(METRICS.monitor_loop_lag())
+
+    if args.connect:
+        results = await daemon.pool.connect_many(args.connect)
+        for address, result in results.items():
+            print(f"{address}: {'подключено' if result.success else result.error}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for server in servers:
+            server.close()
+        await daemon.stop()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="LED Controller - фоновый сервис без GUI")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес HTTP API (по умолчанию 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Порт HTTP API (по умолчанию 8765)")
+    parser.add_argument("--token", default=os.environ.get("LED_DAEMON_TOKEN"),
+                        help="Токен HTTP API (заголовок Authorization: Bearer); обязателен, если --host "
+                             "не loopback. По умолчанию - переменная LED_DAEMON_TOKEN")
+    parser.add_argument("--socket", help="Путь к Unix socket (дополнительно к HTTP)")
+    parser.add_argument("--connect", nargs="*", default=[], help="Адреса для подключения при старте")
+    parser.add_argument("--keep-warm", type=float, default=30.0, metavar="SEC",
+                        help="Пинговать простаивающие соединения раз в SEC секунд (0 - выключить)")
+    parser.add_argument("--fps", type=float, default=30.0, help="Частота кадров эффектов")
+    parser.add_argument("--media-dir", help="Каталог с файлами для команды source (без него команда выключена)")
+    parser.add_argument("--simulate", type=int, default=0, metavar="N",
+                        help="Работать с N симулированными лентами вместо Bluetooth")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.token and not is_loopback(args.host):
+        parser.error(f"--host {args.host} доступен из сети: задайте --token или LED_DAEMON_TOKEN")
+    load_user_protocols()
+    try:
+        asyncio.run(run_daemon(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
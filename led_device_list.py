@@ -0,0 +1,246 @@
+"""
+Список найденных устройств для GUI
+
+Рядом с сотнями рекламирующих BLE-устройств пересоздание кнопки на каждую
+строку при каждом результате сканирования подвешивает окно. Здесь:
+
+- DeviceListModel хранит устройства по адресу и обновляется инкрементально
+  (добавить/обновить/убрать), фильтрует по имени, протоколу и RSSI;
+- DeviceListView рисует только видимые строки: пул виджетов создается один
+  раз и при прокрутке или обновлении переназначается на другие устройства,
+  а строка перенастраивается, только если ее содержимое изменилось.
+
+Стоимость отрисовки не зависит от числа устройств вокруг.
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional
+
+import customtkinter as ctk
+
+from led_controller import DiscoveredDevice, LEDController
+from led_protocols import PROTOCOLS, detect_protocol
+
+_UNSET = object()
+
+
+class DeviceListModel:
+    """
+    Устройства по адресу с фильтрами
+
+    Порядок - по убыванию RSSI; отфильтрованный список пересчитывается
+    только после изменений.
+    """
+
+    def __init__(self):
+        self.devices: Dict[str, DiscoveredDevice] = {}
+        self.name_filter = ""
+        self.protocol_filter: Optional[str] = None
+        self.min_rssi: Optional[int] = None
+        self._protocols: Dict[str, str] = {}
+        self._visible: Optional[List[DiscoveredDevice]] = None
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    def clear(self):
+        self.devices.clear()
+        self._protocols.clear()
+        self._visible = None
+
+    def update(self, devices: Iterable[DiscoveredDevice], remove_missing: bool = False) -> bool:
+        """
+        Добавить новые и обновить изменившиеся устройства
+
+        Args:
+            devices: Устройства из результата сканирования
+            remove_missing: Убрать устройства, которых нет в devices
+
+        Returns:
+            Изменился ли список
+        """
+        changed = False
+        seen = set()
+        for device in devices:
+            seen.add(device.address)
+            previous = self.devices.get(device.address)
+            if previous != device:
+                if previous is not None and previous.name != device.name:
+                    self._protocols.pop(device.address, None)
+                self.devices[device.address] = device
+                changed = True
+        if remove_missing:
+            for address in [address for address in self.devices if address not in seen]:
+                del self.devices[address]
+                self._protocols.pop(address, None)
+                changed = True
+        if changed:
+            self._visible = None
+        return changed
+
+    def protocol_of(self, device: DiscoveredDevice) -> str:
+        """Протокол, определенный по рекламному пакету (имя в реестре)"""
+        if device.protocol:
+            return device.protocol
+        name = self._protocols.get(device.address)
+        if name is None:
+            # Тот же выбор, что при подключении: нераспознанные - протокол по умолчанию контроллера
+            name = PROTOCOLS.key_of(detect_protocol(device.name, device.address,
+                                                    default=PROTOCOLS[LEDController.DEFAULT_PROTOCOL]))
+            self._protocols[device.address] = name
+        return name
+
+    def set_filter(self, name=_UNSET, protocol=_UNSET, min_rssi=_UNSET):
+        """
+        Задать фильтры; не переданные аргументы не меняются
+
+        Args:
+            name: Подстрока имени или адреса (без учета регистра)
+            protocol: Имя протокола в реестре; None - любой
+            min_rssi: Минимальный RSSI, dBm; None - без ограничения
+        """
+        if name is not _UNSET:
+            self.name_filter = (name or "").strip().lower()
+        if protocol is not _UNSET:
+            self.protocol_filter = protocol
+        if min_rssi is not _UNSET:
+            self.min_rssi = min_rssi
+        self._visible = None
+
+    def visible(self) -> List[DiscoveredDevice]:
+        """Устройства, прошедшие фильтры, по убыванию RSSI"""
+        if self._visible is None:
+            devices = self.devices.values()
+            if self.name_filter:
+                devices = [d for d in devices
+                           if self.name_filter in d.name.lower() or self.name_filter in d.address.lower()]
+            if self.min_rssi is not None:
+                devices = [d for d in devices if d.rssi >= self.min_rssi]
+            if self.protocol_filter is not None:
+                devices = [d for d in devices if self.protocol_of(d) == self.protocol_filter]
+            self._visible = sorted(devices, key=lambda d: d.rssi, reverse=True)
+        return self._visible
+
+
+class DeviceListView:
+    """
+    Виртуализированный список устройств на CustomTkinter
+
+    Args:
+        parent: Родительский виджет (self.frame размещает вызывающий)
+        rows: Сколько строк видно одновременно
+        on_select: Вызывается с адресом выбранного устройства
+    """
+
+    ROW_HEIGHT = 50
+
+    def __init__(self, parent, rows: int = 5, on_select: Optional[Callable[[str], None]] = None):
+        self.model = DeviceListModel()
+        self.on_select = on_select
+        self.selected: Optional[str] = None
+        self.first = 0
+        self.message = ""
+
+        self.frame = ctk.CTkFrame(parent, height=rows * self.ROW_HEIGHT + 10, fg_color="#2b2b2b")
+        self.frame.pack_propagate(False)
+        self.scrollbar = ctk.CTkScrollbar(self.frame, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y", pady=5)
+        self.body = ctk.CTkFrame(self.frame, fg_color="transparent")
+        self.body.pack(side="left", fill="both", expand=True, padx=5, pady=5)
+
+        self.placeholder = ctk.CTkLabel(self.body, text="", font=ctk.CTkFont(size=11), text_color="gray")
+        self.rows = []
+        for i in range(rows):
+            btn = ctk.CTkButton(self.body,
+                                text="",
+                                font=ctk.CTkFont(size=11),
+                                height=self.ROW_HEIGHT - 6,
+                                anchor="w",
+                                fg_color="#2b2b2b",
+                                hover_color="#3a3a3a",
+                                border_width=2,
+                                border_color="#3a3a3a",
+                                command=lambda row=i: self._on_click(row))
+            self.rows.append(btn)
+        # Что сейчас показывает каждая строка: (адрес, текст, выбрана) или None - скрыта
+        self._shown: List[Optional[tuple]] = [None] * rows
+
+        for widget in [self.body] + self.rows:
+            widget.bind("<MouseWheel>", self._on_wheel)
+            widget.bind("<Button-4>", self._on_wheel)
+            widget.bind("<Button-5>", self._on_wheel)
+
+    def selected_device(self) -> Optional[DiscoveredDevice]:
+        """Выбранное устройство; скрытое фильтрами не считается выбранным - его не видно"""
+        device = self.model.devices.get(self.selected)
+        if device is None or device not in self.model.visible():
+            return None
+        return device
+
+    def select(self, address: Optional[str]):
+        self.selected = address
+        self.render()
+
+    def render(self):
+        """Перенастроить видимые строки под текущие данные"""
+        devices = self.model.visible()
+        total = len(devices)
+        count = len(self.rows)
+        self.first = max(0, min(self.first, total - count))
+
+        for i, row in enumerate(self.rows):
+            index = self.first + i
+            if index >= total:
+                if self._shown[i] is not None:
+                    row.place_forget()
+                    self._shown[i] = None
+                continue
+
+            device = devices[index]
+            text = (f"📱 {device.name}\n    {device.address}  ({device.rssi} dBm)  "
+                    f"{self.model.protocol_of(device)}")
+            shown = (device.address, text, device.address == self.selected)
+            if shown == self._shown[i]:
+                continue
+            if self._shown[i] is None:
+                row.place(x=0, y=i * self.ROW_HEIGHT, relwidth=1.0)
+            if shown[2]:
+                row.configure(text=text, fg_color="#1f6feb", border_color="#1f6feb")
+            else:
+                row.configure(text=text, fg_color="#2b2b2b", border_color="#3a3a3a")
+            self._shown[i] = shown
+
+        if total:
+            self.placeholder.place_forget()
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + count) / total))
+        else:
+            message = self.message if not self.model.devices else "Нет устройств, подходящих под фильтр"
+            self.placeholder.configure(text=message)
+            self.placeholder.place(relx=0.5, rely=0.5, anchor="center")
+            self.scrollbar.set(0.0, 1.0)
+
+    def _scroll_to(self, first: int):
+        if first != self.first:
+            self.first = first
+            self.render()
+
+    def _on_scrollbar(self, *args):
+        total = len(self.model.visible())
+        if args and args[0] == "moveto":
+            self._scroll_to(int(round(float(args[1]) * total)))
+        elif args and args[0] == "scroll":
+            step = int(args[1]) * (len(self.rows) if args[2] == "pages" else 1)
+            self._scroll_to(self.first + step)
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self._scroll_to(self.first - 1)
+        elif event.num == 5 or event.delta < 0:
+            self._scroll_to(self.first + 1)
+
+    def _on_click(self, row: int):
+        shown = self._shown[row]
+        if shown is None:
+            return
+        self.select(shown[0])
+        if self.on_select:
+            self.on_select(shown[0])
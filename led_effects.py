@@ -0,0 +1,241 @@
+"""
+Эффекты и анимации для LED лент
+Эффект - генератор кадров: через send() он получает время в секундах от
+начала эффекта и отдает цвет (R, G, B). Новый эффект - несколько строк:
+
+    @effect
+    def blink(color, period=1.0):
+        t = yield
+        while True:
+            t = yield color if (t % period) < period / 2 else (0, 0, 0)
+"""
+
+import asyncio
+import functools
+import math
+from typing import Callable, Dict, Generator, Optional, Sequence, Union
+
+from led_colors import Color, hsv_to_rgb, interpolator
+
+Effect = Generator[Color, float, None]
+
+BLACK: Color = (0, 0, 0)
+
+
+def effect(func: Callable[..., Effect]) -> Callable[..., Effect]:
+    """Декоратор эффекта: запускает генератор до первого yield"""
+    @functools.wraps(func)
+    def start(*args, **kwargs) -> Effect:
+        generator = func(*args, **kwargs)
+        next(generator)
+        return generator
+    return start
+
+
+def scale(color: Color, level: float) -> Color:
+    """Умножение цвета на уровень от 0 до 1"""
+    return (round(color[0] * level), round(color[1] * level), round(color[2] * level))
+
+
+# --- Эффекты ---
+
+@effect
+def fade(start: Color, end: Color, duration: float = 1.0, space: str = "oklab") -> Effect:
+    """Плавный переход от start к end за duration секунд (space - пространство смешивания, см. led_colors)"""
+    between = interpolator(start, end, space)
+    t = yield
+    while t < duration:
+        t = yield between(t / duration)
+    yield end
+
+
+@effect
+def breathing(color: Color, period: float = 4.0, min_level: float = 0.05) -> Effect:
+    """Плавное "дыхание" яркости с периодом period секунд"""
+    t = yield
+    while True:
+        level = 0.5 - 0.5 * math.cos(2 * math.pi * t / period)
+        t = yield scale(color, min_level + (1 - min_level) * level)
+
+
+@effect
+def rainbow(period: float = 6.0, saturation: float = 1.0, value: float = 1.0) -> Effect:
+    """Полный круг по оттенкам за period секунд"""
+    t = yield
+    while True:
+        t = yield hsv_to_rgb(t / period, saturation, value)
+
+
+@effect
+def strobe(color: Color, frequency: float = 10.0, duty: float = 0.5, off: Color = BLACK) -> Effect:
+    """Стробоскоп: frequency вспышек в секунду, duty - доля времени со светом"""
+    t = yield
+    while True:
+        t = yield color if (t * frequency) % 1.0 < duty else off
+
+
+@effect
+def color_cycle(colors: Sequence[Color], hold: float = 1.0, transition: float = 0.5,
+                space: str = "oklab") -> Effect:
+    """По кругу: каждый цвет держится hold секунд, затем плавно переходит в следующий"""
+    if not colors:
+        raise ValueError("color_cycle: нужен хотя бы один цвет")
+    step = hold + transition
+    if step <= 0:
+        raise ValueError("color_cycle: hold + transition должно быть больше нуля")
+    # Переходы между соседними цветами: концы переводятся в пространство смешивания один раз
+    transitions = [interpolator(color, colors[(i + 1) % len(colors)], space) for i, color in enumerate(colors)]
+    t = yield
+    while True:
+        index, phase = divmod(t, step)
+        index = int(index) % len(colors)
+        if phase < hold:
+            t = yield colors[index]
+        else:
+            t = yield transitions[index]((phase - hold) / transition)
+
+
+# Эффекты по имени (для GUI и внешних команд)
+EFFECTS: Dict[str, Callable[..., Effect]] = {
+    "fade": fade,
+    "breathing": breathing,
+    "rainbow": rainbow,
+    "strobe": strobe,
+    "color_cycle": color_cycle,
+}
+
+
+class _RunningEffect:
+    """Эффект, запущенный на одном контроллере"""
+
+    __slots__ = ("generator", "started_at", "lead", "on_finish")
+
+    def __init__(self, generator: Effect, started_at: float, lead: Union[float, Callable[[], float]],
+                 on_finish: Optional[Callable[[], None]]):
+        self.generator = generator
+        self.started_at = started_at
+        self.lead = lead
+        self.on_finish = on_finish
+
+
+class EffectEngine:
+    """
+    Планировщик кадров с фиксированной частотой
+
+    Один таймер на все ленты: кадры привязаны к сетке дедлайнов
+    start + n / fps, поэтому время не "уплывает". Если цикл опоздал больше
+    чем на кадр, просроченные дедлайны пропускаются, а не догоняются пачкой.
+    Если лента еще не приняла предыдущий кадр (в очереди есть ожидающая
+    команда), новый кадр для нее пропускается.
+    """
+
+    def __init__(self, fps: float = 30.0):
+        self.fps = fps
+        self.period = 1.0 / fps
+        self._running: Dict[object, _RunningEffect] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        # Статистика
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.deadlines_missed = 0
+        self.max_jitter = 0.0
+        self._jitter_total = 0.0
+        self._ticks = 0
+
+    def start(self, controller, generator: Effect, on_finish: Optional[Callable[[], None]] = None,
+              started_at: Optional[float] = None, lead: Union[float, Callable[[], float]] = 0.0):
+        """
+        Запустить эффект на контроллере (заменяет текущий)
+
+        Должен вызываться из потока event loop'а.
+
+        Args:
+            started_at: Момент начала эффекта по loop.time() (None - сейчас); до него кадры не идут
+            lead: На сколько секунд вперед считать кадр - задержка канала до ленты, чтобы
+                ленты с разной задержкой показывали один и тот же момент эффекта одновременно;
+                функция без аргументов - оценка пересчитывается на каждом кадре
+        """
+        loop = asyncio.get_running_loop()
+        if started_at is None:
+            started_at = loop.time()
+        self._running[controller] = _RunningEffect(generator, started_at, lead, on_finish)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    def stop(self, controller=None):
+        """Остановить эффект на контроллере или все эффекты"""
+        if controller is None:
+            stopped = list(self._running.values())
+            self._running.clear()
+        else:
+            running = self._running.pop(controller, None)
+            stopped = [running] if running else []
+        for running in stopped:
+            running.generator.close()
+
+    def is_running(self, controller) -> bool:
+        """Идет ли эффект на контроллере"""
+        return controller in self._running
+
+    def stats(self) -> Dict[str, float]:
+        """Статистика планировщика; джиттер в секундах"""
+        return {
+            "fps": self.fps,
+            "effects": len(self._running),
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped,
+            "deadlines_missed": self.deadlines_missed,
+            "max_jitter": self.max_jitter,
+            "mean_jitter": self._jitter_total / self._ticks if self._ticks else 0.0,
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        origin = loop.time()
+        tick = 0
+
+        while self._running:
+            tick += 1
+            deadline = origin + tick * self.period
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            lateness = loop.time() - deadline
+            self._ticks += 1
+            self._jitter_total += lateness
+            if lateness > self.max_jitter:
+                self.max_jitter = lateness
+            if lateness >= self.period:
+                missed = int(lateness / self.period)
+                tick += missed
+                deadline += missed * self.period
+                self.deadlines_missed += missed
+
+            for controller, running in list(self._running.items()):
+                if controller.queue.depth:
+                    # Лента не успевает - не копим кадры
+                    self.frames_skipped += 1
+                    continue
+
+                lead = running.lead() if callable(running.lead) else running.lead
+                t = deadline - running.started_at + lead
+                if t < 0:
+                    # Эффект запланирован на будущее
+                    continue
+
+                try:
+                    color = running.generator.send(t)
+                except StopIteration:
+                    self._finish(controller, running)
+                    continue
+
+                controller.post_color(*color)
+                self.frames_sent += 1
+
+    def _finish(self, controller, running: _RunningEffect):
+        if self._running.get(controller) is running:
+            del self._running[controller]
+        if running.on_finish:
+            running.on_finish()
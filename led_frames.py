@@ -0,0 +1,191 @@
+"""
+Пакетная генерация кадров на NumPy
+Вычисляет сразу блок будущих кадров для N устройств: градиенты (в том
+числе в OKLab/CIELAB), круг по оттенкам HSV, кривые сглаживания и
+гамма-коррекцию. Результат - массив формы (кадры, устройства, 3) типа
+uint8, который кодируется в команды протокола целиком, без циклов по
+кадрам в Python.
+"""
+
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+# Таблица гаммы и HSV -> RGB живут в led_colors; имена оставлены для совместимости
+from led_colors import gamma_array as gamma_table, hsv_to_rgb_array as hsv_to_rgb, mix_array
+from led_protocols import LEDProtocol
+
+
+# --- Кривые сглаживания (вход и выход в диапазоне 0..1) ---
+
+def _linear(t: np.ndarray) -> np.ndarray:
+    return t
+
+
+def _ease_in(t: np.ndarray) -> np.ndarray:
+    return t * t * t
+
+
+def _ease_out(t: np.ndarray) -> np.ndarray:
+    return 1 - (1 - t) ** 3
+
+
+def _ease_in_out(t: np.ndarray) -> np.ndarray:
+    return np.where(t < 0.5, 4 * t * t * t, 1 - (-2 * t + 2) ** 3 / 2)
+
+
+def _sine(t: np.ndarray) -> np.ndarray:
+    return 0.5 - 0.5 * np.cos(np.pi * t)
+
+
+EASINGS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "linear": _linear,
+    "ease_in": _ease_in,
+    "ease_out": _ease_out,
+    "ease_in_out": _ease_in_out,
+    "sine": _sine,
+}
+
+
+def ease(t: np.ndarray, easing: str = "linear") -> np.ndarray:
+    """Применить кривую сглаживания к массиву t (значения 0..1)"""
+    try:
+        return EASINGS[easing](np.clip(t, 0.0, 1.0))
+    except KeyError:
+        raise ValueError(f"Неизвестная кривая сглаживания: {easing}") from None
+
+
+# --- Гамма-коррекция ---
+
+def apply_gamma(frames: np.ndarray, gamma: float = 2.2) -> np.ndarray:
+    """Гамма-коррекция блока кадров одной выборкой из таблицы"""
+    return gamma_table(gamma)[frames]
+
+
+# --- Генераторы блоков кадров ---
+
+def _to_uint8(values: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(values), 0, 255).astype(np.uint8)
+
+
+def _timeline(n_frames: int, fps: float, start_time: float) -> np.ndarray:
+    return start_time + np.arange(n_frames) / fps
+
+
+def gradient_block(starts: Sequence, ends: Sequence, n_frames: int, easing: str = "linear",
+                   space: str = "rgb") -> np.ndarray:
+    """
+    Переход от начальных к конечным цветам за n_frames кадров
+
+    Args:
+        starts: Начальные цвета устройств, форма (N, 3)
+        ends: Конечные цвета, форма (N, 3)
+        n_frames: Число кадров (последний кадр равен конечному цвету)
+        easing: Имя кривой сглаживания из EASINGS
+        space: Пространство смешивания: "rgb", "oklab" или "lab" (см. led_colors)
+
+    Returns:
+        Массив (n_frames, N, 3) uint8
+    """
+    # Единственный кадр - сразу конечный цвет (linspace дал бы начальный)
+    t = np.linspace(0.0, 1.0, n_frames, dtype=np.float32) if n_frames > 1 else np.ones(n_frames, np.float32)
+    if space != "rgb":
+        starts = np.asarray(starts, dtype=np.uint8).reshape(-1, 3)
+        ends = np.asarray(ends, dtype=np.uint8).reshape(-1, 3)
+        return mix_array(starts[None], ends[None], ease(t, easing)[:, None], space)
+    starts = np.asarray(starts, dtype=np.float32).reshape(-1, 3)
+    ends = np.asarray(ends, dtype=np.float32).reshape(-1, 3)
+    k = ease(t, easing)[:, None, None]
+    return _to_uint8(starts[None] + (ends - starts)[None] * k)
+
+
+def hsv_cycle_block(n_devices: int,
+                    n_frames: int,
+                    fps: float = 30.0,
+                    period: float = 6.0,
+                    phase_spread: float = 0.0,
+                    saturation: float = 1.0,
+                    value: float = 1.0,
+                    start_time: float = 0.0) -> np.ndarray:
+    """
+    Круг по оттенкам для N устройств
+
+    Args:
+        phase_spread: Сдвиг оттенка между соседними устройствами (доля круга);
+            например 1 / n_devices дает "бегущую" радугу по комнате
+
+    Returns:
+        Массив (n_frames, n_devices, 3) uint8
+    """
+    t = _timeline(n_frames, fps, start_time)[:, None]
+    hue = t / period + np.arange(n_devices)[None, :] * phase_spread
+    return _to_uint8(hsv_to_rgb(hue, saturation, value))
+
+
+def breathing_block(colors: Sequence,
+                    n_frames: int,
+                    fps: float = 30.0,
+                    period: float = 4.0,
+                    min_level: float = 0.05,
+                    start_time: float = 0.0) -> np.ndarray:
+    """
+    "Дыхание" яркости для N устройств с их собственными цветами
+
+    Returns:
+        Массив (n_frames, N, 3) uint8
+    """
+    colors = np.asarray(colors, dtype=np.float32).reshape(-1, 3)
+    t = _timeline(n_frames, fps, start_time)
+    level = min_level + (1 - min_level) * (0.5 - 0.5 * np.cos(2 * np.pi * t / period))
+    return _to_uint8(colors[None] * level[:, None, None].astype(np.float32))
+
+
+# --- Кодирование в команды протокола ---
+
+def encode_block(protocol: LEDProtocol, colors: np.ndarray) -> np.ndarray:
+    """
+    Кодирование последовательности цветов в кадры протокола
+
+    Args:
+        protocol: Протокол из led_protocols
+        colors: Массив (..., 3) uint8, например (кадры, устройства, 3)
+
+    Returns:
+        Массив (..., размер_кадра) uint8; каждая строка - готовая команда
+    """
+    colors = np.asarray(colors, dtype=np.uint8)
+    frame = protocol.color_frame
+    if frame is None or not frame.vectorizable:
+        # Протокол без шаблона или с полями, которые не пишутся по байту, - кодируем по одному кадру
+        flat = colors.reshape(-1, 3)
+        data = protocol.encode_colors([tuple(c) for c in flat.tolist()])
+        return np.frombuffer(bytes(data), dtype=np.uint8).reshape(*colors.shape[:-1], -1)
+
+    out = np.empty(colors.shape[:-1] + (frame.size,), dtype=np.uint8)
+    out[...] = np.frombuffer(frame.template, dtype=np.uint8)
+    for channel, slot in enumerate(frame.slots):
+        for position in slot:
+            out[..., position] = colors[..., channel]
+    if frame.checksum_at is not None:
+        checksum = out[..., :frame.checksum_at].sum(axis=-1, dtype=np.uint32)
+        out[..., frame.checksum_at] = (checksum & 0xFF).astype(np.uint8)
+    return out
+
+
+def precompute_show(protocol: LEDProtocol,
+                    frames: np.ndarray,
+                    gamma: Optional[float] = None) -> np.ndarray:
+    """
+    Подготовка целого шоу: гамма-коррекция и кодирование одним проходом
+
+    Args:
+        frames: Массив (кадры, устройства, 3) uint8
+        gamma: Показатель гамма-коррекции или None
+
+    Returns:
+        Массив (кадры, устройства, размер_кадра) uint8;
+        out[i, d].tobytes() или memoryview(out[i, d]) - команда для записи
+    """
+    if gamma is not None:
+        frames = apply_gamma(frames, gamma)
+    return encode_block(protocol, frames)
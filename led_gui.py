@@ -0,0 +1,612 @@
+"""
+LED Controller - Современный интерфейс на CustomTkinter
+"""
+
+import asyncio
+import threading
+
+import customtkinter as ctk
+from tkinter import colorchooser, messagebox
+
+from led_bridge import AsyncBridge
+from led_colors import PRESETS, parse_color, to_hex
+from led_controller import LEDController
+from led_device_list import DeviceListView
+from led_effects import EFFECTS, EffectEngine
+from led_metrics import METRICS
+from led_protocols import list_protocols, load_user_protocols
+
+
+class LEDControllerApp:
+    """Современный GUI на CustomTkinter"""
+    
+    AUTO_PROTOCOL = "Авто"
+    NO_EFFECT = "Без эффекта"
+    EFFECT_LABELS = {
+        "Дыхание": "breathing",
+        "Радуга": "rainbow",
+        "Стробоскоп": "strobe",
+        "Смена цветов": "color_cycle",
+    }
+    PRESET_CYCLE = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+    ANY_PROTOCOL = "Любой протокол"
+    RSSI_FILTERS = {"Любой сигнал": None, "> -90 dBm": -90, "> -80 dBm": -80,
+                    "> -70 dBm": -70, "> -60 dBm": -60}
+    FRAME_MS = 16  # Перерисовка не чаще одного раза за кадр экрана (~60 Гц)
+    
+    def __init__(self, root):
+        self.root = root
+        self.root.title("LED Controller")
+        self.root.geometry("700x900")
+        
+        self.controller = LEDController()
+        self.effects = EffectEngine(fps=30)
+        self.loop = asyncio.new_event_loop()
+        self.current_color = (255, 255, 255)
+        self.bridge = AsyncBridge(self.loop, self.root, on_error=self.show_error, metrics=METRICS)
+        self._scan_id = 0
+        self._dirty = {}
+        self._render_scheduled = False
+        
+        self.create_ui()
+        
+        # Запуск asyncio
+        self.thread = threading.Thread(target=self.run_asyncio_loop, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(METRICS.monitor_loop_lag(), self.loop)
+        # Лаг потока Tk отдельно от лага loop'а и задержки BLE
+        METRICS.monitor_tk_lag(self.root)
+    
+    def run_asyncio_loop(self):
+        """Запуск asyncio event loop"""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+    
+    def invalidate(self, key, render):
+        """
+        Отложить обновление виджетов до ближайшего кадра
+        
+        Повторные вызовы с тем же ключом до перерисовки заменяют предыдущий,
+        поэтому частые события (перетаскивание слайдера, результаты сканирования)
+        перерисовывают окно не чаще FRAME_MS.
+        """
+        self._dirty[key] = render
+        if not self._render_scheduled:
+            self._render_scheduled = True
+            self.root.after(self.FRAME_MS, self._render)
+    
+    def show_error(self, error):
+        """Ошибка операции в loop'е"""
+        print(f"Ошибка: {error!r}")
+        self.status_label.configure(text=f"● Ошибка: {error}", text_color="#dc3545")
+    
+    def _render(self):
+        self._render_scheduled = False
+        dirty, self._dirty = self._dirty, {}
+        for render in dirty.values():
+            render()
+    
+    def create_ui(self):
+        """Создание интерфейса"""
+        
+        # Заголовок
+        header = ctk.CTkFrame(self.root, height=80, corner_radius=0)
+        header.pack(fill="x", padx=0, pady=0)
+        header.pack_propagate(False)
+        
+        ctk.CTkLabel(header, 
+                    text="💡 LED Controller",
+                    font=ctk.CTkFont(size=28, weight="bold")).pack(pady=25)
+        
+        # Основной контейнер со скроллом
+        container = ctk.CTkScrollableFrame(self.root, fg_color="transparent")
+        container.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        # Панель подключения
+        self.create_connection_panel(container)
+        
+        # Панель управления цветом
+        self.create_color_panel(container)
+        
+        # Панель управления
+        self.create_control_panel(container)
+    
+    def create_connection_panel(self, parent):
+        """Панель подключения к устройству"""
+        frame = ctk.CTkFrame(parent)
+        frame.pack(fill="x", pady=(0, 15))
+        
+        # Заголовок
+        ctk.CTkLabel(frame, 
+                    text="🔗 Подключение",
+                    font=ctk.CTkFont(size=16, weight="bold")).pack(anchor="w", padx=15, pady=(15, 10))
+        
+        # Фильтры списка
+        filter_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        filter_frame.pack(fill="x", padx=15, pady=(0, 5))
+        
+        self.name_filter = ctk.CTkEntry(filter_frame,
+                                        placeholder_text="Имя или адрес",
+                                        height=28,
+                                        font=ctk.CTkFont(size=12))
+        self.name_filter.pack(side="left", fill="x", expand=True, padx=(0, 10))
+        self.name_filter.bind("<KeyRelease>", lambda _: self.apply_device_filter())
+        
+        self.protocol_filter_var = ctk.StringVar(value=self.ANY_PROTOCOL)
+        ctk.CTkOptionMenu(filter_frame,
+                          values=[self.ANY_PROTOCOL] + list_protocols(),
+                          variable=self.protocol_filter_var,
+                          command=lambda _: self.apply_device_filter(),
+                          height=28,
+                          font=ctk.CTkFont(size=12)).pack(side="left", padx=(0, 10))
+        
+        self.rssi_filter_var = ctk.StringVar(value=next(iter(self.RSSI_FILTERS)))
+        ctk.CTkOptionMenu(filter_frame,
+                          values=list(self.RSSI_FILTERS),
+                          variable=self.rssi_filter_var,
+                          command=lambda _: self.apply_device_filter(),
+                          width=120,
+                          height=28,
+                          font=ctk.CTkFont(size=12)).pack(side="left")
+        
+        # Список устройств: рисуются только видимые строки
+        self.device_list = DeviceListView(frame, rows=4)
+        self.device_list.message = "Нажмите 'Сканировать' для поиска устройств..."
+        self.device_list.frame.pack(fill="x", padx=15, pady=(0, 10))
+        self.device_list.render()
+        
+        # Кнопки
+        btn_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        btn_frame.pack(fill="x", padx=15, pady=(0, 10))
+        
+        self.scan_btn = ctk.CTkButton(btn_frame, 
+                                     text="🔍 Сканировать",
+                                     command=self.scan_devices,
+                                     height=35,
+                                     font=ctk.CTkFont(size=13))
+        self.scan_btn.pack(side="left", padx=(0, 10))
+        
+        self.connect_btn = ctk.CTkButton(btn_frame, 
+                                        text="⚡ Подключить",
+                                        command=self.connect_device,
+                                        height=35,
+                                        font=ctk.CTkFont(size=13))
+        self.connect_btn.pack(side="left", padx=(0, 10))
+        
+        self.disconnect_btn = ctk.CTkButton(btn_frame, 
+                                           text="❌ Отключить",
+                                           command=self.disconnect_device,
+                                           height=35,
+                                           fg_color="#dc3545",
+                                           hover_color="#c82333",
+                                           font=ctk.CTkFont(size=13),
+                                           state="disabled")
+        self.disconnect_btn.pack(side="left")
+        
+        # Выбор протокола
+        protocol_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        protocol_frame.pack(fill="x", padx=15, pady=(0, 10))
+        
+        ctk.CTkLabel(protocol_frame, 
+                    text="Протокол:",
+                    font=ctk.CTkFont(size=12)).pack(side="left", padx=(0, 10))
+        
+        self.protocol_var = ctk.StringVar(value=self.AUTO_PROTOCOL)
+        self.protocol_menu = ctk.CTkOptionMenu(protocol_frame,
+                                              values=[self.AUTO_PROTOCOL] + list_protocols(),
+                                              variable=self.protocol_var,
+                                              height=30,
+                                              font=ctk.CTkFont(size=12))
+        self.protocol_menu.pack(side="left")
+        
+        # Статус
+        self.status_label = ctk.CTkLabel(frame, 
+                                        text="● Не подключено",
+                                        font=ctk.CTkFont(size=12),
+                                        text_color="#dc3545")
+        self.status_label.pack(anchor="w", padx=15, pady=(0, 15))
+    
+    def create_color_panel(self, parent):
+        """Панель выбора цвета"""
+        frame = ctk.CTkFrame(parent)
+        frame.pack(fill="both", expand=True, pady=(0, 15))
+        
+        # Заголовок
+        ctk.CTkLabel(frame, 
+                    text="🎨 Выбор цвета",
+                    font=ctk.CTkFont(size=16, weight="bold")).pack(anchor="w", padx=15, pady=(15, 10))
+        
+        # Контейнер для превью и слайдеров
+        color_container = ctk.CTkFrame(frame, fg_color="transparent")
+        color_container.pack(fill="both", expand=True, padx=15)
+        
+        # Левая часть - превью
+        left_frame = ctk.CTkFrame(color_container, fg_color="transparent")
+        left_frame.pack(side="left", fill="y", padx=(0, 15))
+        
+        ctk.CTkLabel(left_frame, 
+                    text="Превью",
+                    font=ctk.CTkFont(size=12)).pack(pady=(0, 10))
+        
+        self.color_preview = ctk.CTkFrame(left_frame, 
+                                         width=180, 
+                                         height=180,
+                                         fg_color="#FFFFFF",
+                                         corner_radius=10)
+        self.color_preview.pack()
+        self.color_preview.pack_propagate(False)
+        
+        self.hex_label = ctk.CTkLabel(left_frame, 
+                                     text="#FFFFFF",
+                                     font=ctk.CTkFont(size=16, weight="bold"))
+        self.hex_label.pack(pady=(10, 0))
+        
+        # Правая часть - слайдеры RGB
+        right_frame = ctk.CTkFrame(color_container, fg_color="transparent")
+        right_frame.pack(side="left", fill="both", expand=True)
+        
+        self.rgb_sliders = {}
+        colors = [('R', '#ff4444'), ('G', '#44ff44'), ('B', '#4444ff')]
+        
+        for i, (label, color) in enumerate(colors):
+            slider_frame = ctk.CTkFrame(right_frame, fg_color="transparent")
+            slider_frame.pack(fill="x", pady=10)
+            
+            # Заголовок слайдера
+            header_frame = ctk.CTkFrame(slider_frame, fg_color="transparent")
+            header_frame.pack(fill="x", pady=(0, 5))
+            
+            ctk.CTkLabel(header_frame, 
+                        text=label,
+                        font=ctk.CTkFont(size=14, weight="bold"),
+                        text_color=color).pack(side="left")
+            
+            value_label = ctk.CTkLabel(header_frame, 
+                                      text="255",
+                                      font=ctk.CTkFont(size=13),
+                                      width=40)
+            value_label.pack(side="right")
+            
+            # Слайдер
+            slider = ctk.CTkSlider(slider_frame,
+                                  from_=0,
+                                  to=255,
+                                  number_of_steps=255,
+                                  command=lambda v, lbl=value_label, idx=i: self.on_rgb_change(v, lbl, idx),
+                                  state="disabled")
+            slider.set(255)
+            slider.pack(fill="x")
+            
+            self.rgb_sliders[label] = (slider, value_label)
+        
+        # Кнопка выбора цвета
+        color_btn_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        color_btn_frame.pack(fill="x", padx=15, pady=(10, 0))
+        
+        self.color_picker_btn = ctk.CTkButton(color_btn_frame,
+                                             text="🎨 Выбрать из палитры",
+                                             command=self.choose_color,
+                                             height=35,
+                                             state="disabled")
+        self.color_picker_btn.pack(side="left", padx=(0, 10))
+        
+        # Быстрые пресеты
+        ctk.CTkLabel(frame, 
+                    text="Быстрый выбор",
+                    font=ctk.CTkFont(size=12)).pack(anchor="w", padx=15, pady=(15, 5))
+        
+        preset_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        preset_frame.pack(fill="x", padx=15, pady=(0, 15))
+        
+        # Цвета и оттенки белого по температуре (led_colors.PRESETS), по 8 в ряд
+        self.preset_buttons = []
+        for i, (name, preset) in enumerate(PRESETS):
+            color = to_hex(parse_color(preset))
+            btn = ctk.CTkButton(preset_frame,
+                              text="",
+                              width=60,
+                              height=30,
+                              fg_color=color,
+                              hover_color=color,
+                              command=lambda p=preset: self.set_preset_color(p),
+                              state="disabled")
+            btn.grid(row=i // 8, column=i % 8, padx=3, pady=2)
+            self.preset_buttons.append(btn)
+    
+    def create_control_panel(self, parent):
+        """Панель управления яркостью и питанием"""
+        frame = ctk.CTkFrame(parent)
+        frame.pack(fill="x")
+        
+        # Заголовок
+        ctk.CTkLabel(frame, 
+                    text="⚙️ Управление",
+                    font=ctk.CTkFont(size=16, weight="bold")).pack(anchor="w", padx=15, pady=(15, 10))
+        
+        # Яркость
+        brightness_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        brightness_frame.pack(fill="x", padx=15, pady=(0, 15))
+        
+        header_frame = ctk.CTkFrame(brightness_frame, fg_color="transparent")
+        header_frame.pack(fill="x", pady=(0, 5))
+        
+        ctk.CTkLabel(header_frame, 
+                    text="💡 Яркость",
+                    font=ctk.CTkFont(size=14)).pack(side="left")
+        
+        self.brightness_value = ctk.CTkLabel(header_frame, 
+                                            text="100%",
+                                            font=ctk.CTkFont(size=13))
+        self.brightness_value.pack(side="right")
+        
+        self.brightness_slider = ctk.CTkSlider(brightness_frame,
+                                              from_=0,
+                                              to=100,
+                                              number_of_steps=100,
+                                              command=self.on_brightness_change,
+                                              state="disabled")
+        self.brightness_slider.set(100)
+        self.brightness_slider.pack(fill="x")
+        
+        # Кнопки питания
+        power_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        power_frame.pack(fill="x", padx=15, pady=(0, 15))
+        
+        self.power_on_btn = ctk.CTkButton(power_frame,
+                                         text="⚡ Включить",
+                                         command=self.power_on,
+                                         height=40,
+                                         fg_color="#28a745",
+                                         hover_color="#218838",
+                                         font=ctk.CTkFont(size=14, weight="bold"),
+                                         state="disabled")
+        self.power_on_btn.pack(side="left", fill="x", expand=True, padx=(0, 10))
+        
+        self.power_off_btn = ctk.CTkButton(power_frame,
+                                          text="🔌 Выключить",
+                                          command=self.power_off,
+                                          height=40,
+                                          fg_color="#dc3545",
+                                          hover_color="#c82333",
+                                          font=ctk.CTkFont(size=14, weight="bold"),
+                                          state="disabled")
+        self.power_off_btn.pack(side="left", fill="x", expand=True)
+        
+        # Эффекты
+        effect_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        effect_frame.pack(fill="x", padx=15, pady=(0, 15))
+        
+        ctk.CTkLabel(effect_frame, 
+                    text="✨ Эффект",
+                    font=ctk.CTkFont(size=14)).pack(side="left", padx=(0, 10))
+        
+        self.effect_var = ctk.StringVar(value=self.NO_EFFECT)
+        self.effect_menu = ctk.CTkOptionMenu(effect_frame,
+                                            values=[self.NO_EFFECT] + list(self.EFFECT_LABELS),
+                                            variable=self.effect_var,
+                                            command=self.on_effect_change,
+                                            height=30,
+                                            state="disabled")
+        self.effect_menu.pack(side="left", fill="x", expand=True)
+    
+    def on_effect_change(self, label):
+        """Запуск или остановка эффекта"""
+        name = self.EFFECT_LABELS.get(label)
+        if name is None:
+            self.loop.call_soon_threadsafe(self.effects.stop, self.controller)
+            return
+        
+        if name == "rainbow":
+            generator = EFFECTS[name]()
+        elif name == "color_cycle":
+            generator = EFFECTS[name](self.PRESET_CYCLE)
+        else:
+            generator = EFFECTS[name](self.current_color)
+        self.loop.call_soon_threadsafe(self.effects.start, self.controller, generator)
+    
+    def stop_effect(self):
+        """Остановка эффекта при ручном выборе цвета"""
+        if self.effect_var.get() != self.NO_EFFECT:
+            self.effect_var.set(self.NO_EFFECT)
+            self.loop.call_soon_threadsafe(self.effects.stop, self.controller)
+    
+    def on_rgb_change(self, value, label, index):
+        """Изменение RGB слайдера"""
+        value = int(value)
+        self.stop_effect()
+        
+        # Обновляем текущий цвет
+        colors = list(self.current_color)
+        colors[index] = value
+        self.current_color = tuple(colors)
+        
+        # Подпись и превью - в ближайшем кадре, команда - в loop без ожидания
+        self.invalidate(("rgb", index), lambda: label.configure(text=str(value)))
+        self.update_color_preview()
+        self.send_color(*self.current_color)
+    
+    def on_brightness_change(self, value):
+        """Изменение яркости"""
+        value = int(value)
+        self.invalidate("brightness", lambda: self.brightness_value.configure(text=f"{value}%"))
+        # Совмещенной яркости до первого цвета нужен цвет, который показывает окно
+        color = self.current_color
+        self.bridge.submit(lambda: self.controller.set_brightness(value, fallback_color=color),
+                           key="brightness")
+    
+    def send_color(self, r, g, b):
+        """Отправка цвета на ленту (последний цвет вытесняет неотправленный)"""
+        self.bridge.submit(lambda: self.controller.send_color(r, g, b), key="color")
+    
+    def update_color_preview(self):
+        """Обновление превью цвета (в ближайшем кадре)"""
+        self.invalidate("preview", self._render_color_preview)
+    
+    def _render_color_preview(self):
+        hex_color = to_hex(self.current_color)
+        self.color_preview.configure(fg_color=hex_color)
+        self.hex_label.configure(text=hex_color)
+    
+    def choose_color(self):
+        """Выбор цвета через палитру"""
+        color = colorchooser.askcolor(title="Выберите цвет")
+        if color[0]:
+            r, g, b = map(int, color[0])
+            self.set_color(r, g, b)
+    
+    def set_preset_color(self, preset):
+        """Установка пресета ("#RRGGBB" или температура "2700K")"""
+        self.set_color(*parse_color(preset))
+    
+    def set_color(self, r, g, b):
+        """Установка цвета"""
+        self.current_color = (r, g, b)
+        self.stop_effect()
+        
+        # Обновляем слайдеры
+        self.rgb_sliders['R'][0].set(r)
+        self.rgb_sliders['G'][0].set(g)
+        self.rgb_sliders['B'][0].set(b)
+        
+        for index, (label, value) in enumerate(zip("RGB", (r, g, b))):
+            value_label = self.rgb_sliders[label][1]
+            self.invalidate(("rgb", index), lambda lbl=value_label, v=value: lbl.configure(text=str(v)))
+        
+        # Обновляем превью
+        self.update_color_preview()
+        
+        # Отправляем на ленту
+        self.send_color(r, g, b)
+    
+    def scan_devices(self):
+        """Сканирование устройств"""
+        self.device_list.model.clear()
+        self.device_list.message = "⏳ Сканирование устройств..."
+        self.device_list.render()
+        
+        # Повторное нажатие отменяет текущее сканирование; его поздние результаты отбрасываются
+        self._scan_id += 1
+        scan_id = self._scan_id
+        
+        def show(devices, finished):
+            if scan_id == self._scan_id:
+                # Список перестраивается не чаще кадра
+                self.invalidate("devices", lambda: self.update_device_list(devices, finished))
+        
+        def on_update(devices):
+            # Устройства показываются по мере обнаружения (вызывается в потоке loop'а)
+            self.bridge.post(show, devices, False)
+        
+        self.bridge.submit(lambda: self.controller.scan_devices(on_update=on_update, stop_on_known=True),
+                           key="scan", exclusive=True,
+                           on_result=lambda devices: show(devices, True),
+                           on_error=lambda e: (show([], True), self.show_error(e)))
+    
+    def update_device_list(self, devices, finished=True):
+        """Обновление списка устройств: строки меняются по адресу, выбор сохраняется"""
+        self.device_list.model.update(devices, remove_missing=finished)
+        if finished:
+            self.device_list.message = "❌ Устройства не найдены"
+        self.device_list.render()
+    
+    def apply_device_filter(self):
+        """Фильтры по имени, протоколу и уровню сигнала"""
+        protocol = self.protocol_filter_var.get()
+        self.device_list.model.set_filter(name=self.name_filter.get(),
+                                          protocol=None if protocol == self.ANY_PROTOCOL else protocol,
+                                          min_rssi=self.RSSI_FILTERS[self.rssi_filter_var.get()])
+        self.invalidate("devices", self.device_list.render)
+    
+    def connect_device(self):
+        """Подключение к устройству"""
+        if not self.device_list.model:
+            messagebox.showwarning("Внимание", "Сначала просканируйте устройства")
+            return
+        
+        device = self.device_list.selected_device()
+        if device is None:
+            messagebox.showwarning("Внимание", "Выберите устройство из списка")
+            return
+        
+        device_name, address = device.name, device.address
+        protocol = self.protocol_var.get()
+        if protocol == self.AUTO_PROTOCOL:
+            protocol = None
+        
+        self.status_label.configure(text="● Подключение...", text_color="#ffc107")
+        self.connect_btn.configure(state="disabled")
+        
+        # Отключение, нажатое во время подключения, отменит его
+        self.bridge.submit(lambda: self.controller.connect(address, device_name, protocol),
+                           key="connection", exclusive=True,
+                           on_result=self.on_connection_result,
+                           on_error=lambda e: self.on_connection_result(False))
+    
+    def on_connection_result(self, success):
+        """Результат подключения"""
+        if success:
+            self.status_label.configure(text="● Подключено ✓", text_color="#28a745")
+            self.disconnect_btn.configure(state="normal")
+            
+            # Включаем все элементы управления
+            for slider, _ in self.rgb_sliders.values():
+                slider.configure(state="normal")
+            
+            self.brightness_slider.configure(state="normal")
+            self.color_picker_btn.configure(state="normal")
+            self.power_on_btn.configure(state="normal")
+            self.power_off_btn.configure(state="normal")
+            self.effect_menu.configure(state="normal")
+            
+            for btn in self.preset_buttons:
+                btn.configure(state="normal")
+        else:
+            self.status_label.configure(text="● Ошибка подключения", text_color="#dc3545")
+            self.connect_btn.configure(state="normal")
+            messagebox.showerror("Ошибка", "Не удалось подключиться к устройству")
+    
+    def disconnect_device(self):
+        """Отключение от устройства"""
+        self.stop_effect()
+        self.bridge.submit(self.controller.disconnect, key="connection", exclusive=True)
+        
+        self.status_label.configure(text="● Не подключено", text_color="#dc3545")
+        self.connect_btn.configure(state="normal")
+        self.disconnect_btn.configure(state="disabled")
+        
+        # Отключаем все элементы управления
+        for slider, _ in self.rgb_sliders.values():
+            slider.configure(state="disabled")
+        
+        self.brightness_slider.configure(state="disabled")
+        self.color_picker_btn.configure(state="disabled")
+        self.power_on_btn.configure(state="disabled")
+        self.power_off_btn.configure(state="disabled")
+        self.effect_menu.configure(state="disabled")
+        
+        for btn in self.preset_buttons:
+            btn.configure(state="disabled")
+    
+    def power_on(self):
+        """Включение ленты"""
+        self.bridge.submit(self.controller.power_on, key="power")
+    
+    def power_off(self):
+        """Выключение ленты"""
+        self.bridge.submit(self.controller.power_off, key="power")
+
+
+def main():
+    load_user_protocols()
+
+    # Настройка темы
+    ctk.set_appearance_mode("dark")
+    ctk.set_default_color_theme("blue")
+    
+    root = ctk.CTk()
+    app = LEDControllerApp(root)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Минимальный HTTP/1.1 сервер на asyncio для локальных API
+(метрики, управление из скриптов). Без внешних зависимостей: один запрос
+на соединение, тело читается по Content-Length.
+
+Защита от запросов со страниц в браузере: POST принимается только с
+Content-Type: application/json, запросы с чужим Origin отклоняются, а на
+loopback - и с чужим Host (DNS rebinding). На не-loopback адресе нужен токен
+(заголовок Authorization: Bearer <токен>).
+"""
+
+import asyncio
+import hmac
+import ipaddress
+import json
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+
+# Ограничение на размер тела запроса
+MAX_BODY = 1024 * 1024
+
+
+class HTTPRequest(NamedTuple):
+    """Разобранный HTTP запрос"""
+    method: str
+    path: str
+    headers: Dict[str, str]
+    body: bytes
+
+
+HTTPResponse = Tuple[str, str, bytes]  # статус, Content-Type, тело
+Handler = Callable[[HTTPRequest], Awaitable[HTTPResponse]]
+
+
+def text_response(text: str, status: str = "200 OK") -> HTTPResponse:
+    """Текстовый ответ"""
+    return status, "text/plain; charset=utf-8", text.encode("utf-8")
+
+
+def json_response(data, status: str = "200 OK") -> HTTPResponse:
+    """Ответ в JSON"""
+    return status, "application/json", json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+async def read_request(reader: asyncio.StreamReader) -> HTTPRequest:
+    """Чтение запроса из потока; ValueError при некорректном запросе"""
+    request_line = (await reader.readline()).decode("latin-1").split()
+    if len(request_line) < 2:
+        raise ValueError("некорректная строка запроса")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", "0") or 0)
+    if length > MAX_BODY:
+        raise ValueError("слишком большое тело запроса")
+    body = await reader.readexactly(length) if length else b""
+    return HTTPRequest(request_line[0].upper(), request_line[1], headers, body)
+
+
+def is_loopback(host: Optional[str]) -> bool:
+    """Адрес доступен только с этой машины"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address((host or "").strip("[]")).is_loopback
+    except ValueError:
+        return False
+
+
+def _hostname(value: str) -> str:
+    """Имя хоста из заголовка Host или адреса Origin (без схемы и порта)"""
+    value = value.partition("://")[2] or value
+    if value.startswith("["):
+        return value[1:].partition("]")[0]
+    return value.partition(":")[0].lower()
+
+
+def check_request(request: HTTPRequest, host: str, token: Optional[str] = None) -> Optional[HTTPResponse]:
+    """
+    Проверка запроса перед обработчиком
+
+    Returns:
+        Ответ с ошибкой или None, если запрос можно обрабатывать
+    """
+    # Браузер всегда шлет Host, а для запросов со страниц - и Origin ("null" для file:// и песочниц)
+    request_host = _hostname(request.headers.get("host", ""))
+    origin = request.headers.get("origin")
+    if origin is not None and _hostname(origin) != request_host:
+        return text_response("чужой Origin", "403 Forbidden")
+    if is_loopback(host) and not is_loopback(request_host):
+        return text_response("чужой Host", "403 Forbidden")
+    if token is not None:
+        scheme, _, value = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(value.strip().encode(), token.encode()):
+            return text_response("нужен токен", "401 Unauthorized")
+    if request.method == "POST":
+        content_type = request.headers.get("content-type", "").partition(";")[0].strip().lower()
+        if content_type != "application/json":
+            return text_response("ожидается Content-Type: application/json", "415 Unsupported Media Type")
+    return None
+
+
+async def serve_http(handler: Handler, host: str = "127.0.0.1", port: int = 8765,
+                     token: Optional[str] = None):
+    """
+    Запуск HTTP сервера
+
+    Args:
+        handler: async функция (HTTPRequest) -> (статус, Content-Type, тело)
+        token: токен для заголовка Authorization: Bearer; обязателен,
+            если host - не loopback адрес
+
+    Returns:
+        asyncio.Server (закрыть через server.close())
+    """
+    if not token and not is_loopback(host):
+        raise ValueError(f"HTTP API на {host or 'всех адресах'} доступен из сети: задайте токен")
+    token = token or None
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                request = await read_request(reader)
+            except (ValueError, asyncio.IncompleteReadError) as e:
+                status, content_type, body = text_response(str(e), "400 Bad Request")
+            else:
+                try:
+                    status, content_type, body = check_request(request, host, token) or await handler(request)
+                except Exception as e:
+                    status, content_type, body = json_response({"ok": False, "error": str(e)},
+                                                               "500 Internal Server Error")
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+            writer.write(body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
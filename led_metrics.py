@@ -0,0 +1,260 @@
+"""
+Метрики LED Controller
+Гистограммы задержек (p50/p95/p99) по устройствам, глубина очереди,
+схлопнутые/отброшенные команды, ошибки, повторы и переподключения.
+Задержка разделена по звеньям: поток Tk, передача из GUI в event loop,
+сам event loop, очередь устройства и запись BLE.
+Снимок доступен из кода, в виде текста/JSON по таймеру и по HTTP на localhost.
+
+Запись в гистограмму - один bisect и пара сложений, поэтому в горячем
+пути отправки накладные расходы пренебрежимо малы.
+"""
+
+import asyncio
+import json
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from led_http import HTTPRequest, HTTPResponse, json_response, serve_http, text_response
+
+
+def _bucket_bounds() -> List[float]:
+    # Логарифмические корзины от 0.1 мс до ~60 с, шаг 20%
+    bounds = []
+    bound = 0.0001
+    while bound < 60.0:
+        bounds.append(bound)
+        bound *= 1.2
+    return bounds
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с логарифмическими корзинами"""
+
+    BOUNDS = _bucket_bounds()
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        """Добавить измерение в секундах"""
+        self.counts[bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Оценка перцентиля q (0..1) в секундах с интерполяцией внутри корзины"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.BOUNDS[index - 1] if index > 0 else 0.0
+                upper = self.BOUNDS[index] if index < len(self.BOUNDS) else self.max
+                value = lower + (upper - lower) * (rank - seen) / count
+                return min(value, self.max)
+            seen += count
+        return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        """Сводка в миллисекундах"""
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50) * 1000, 3),
+            "p95_ms": round(self.percentile(0.95) * 1000, 3),
+            "p99_ms": round(self.percentile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class DeviceMetrics:
+    """Метрики одного устройства"""
+
+    def __init__(self, address: str):
+        self.address = address
+        # Длительность записи GATT
+        self.write_latency = LatencyHistogram()
+        # Время от постановки в очередь до начала записи (темп протокола, занятость канала)
+        self.queue_wait = LatencyHistogram()
+        self.writes = 0
+        self.failures = 0
+        self.retries = 0
+        self.reconnects = 0
+        # Команды, не отправленные, потому что лента уже показывает это значение
+        self.suppressed = 0
+        self.events: Deque[Tuple[float, str]] = deque(maxlen=50)
+        self.queue = None
+
+    def attach_queue(self, queue):
+        """Подключить очередь команд: из нее берутся глубина и счетчики"""
+        self.queue = queue
+        queue.wait_histogram = self.queue_wait
+
+    def record_event(self, event: str):
+        """Событие соединения: connect, disconnect, reconnect и т.п."""
+        self.events.append((time.time(), event))
+        if event == "reconnect":
+            self.reconnects += 1
+
+    def snapshot(self) -> dict:
+        """Снимок метрик устройства"""
+        data = {
+            "writes": self.writes,
+            "failures": self.failures,
+            "retries": self.retries,
+            "reconnects": self.reconnects,
+            "suppressed": self.suppressed,
+            "write_latency": self.write_latency.snapshot(),
+            "queue_wait": self.queue_wait.snapshot(),
+            "events": [{"time": round(t, 3), "event": event} for t, event in self.events],
+        }
+        if self.queue is not None:
+            data["queue"] = self.queue.stats()
+        return data
+
+
+class MetricsRegistry:
+    """Реестр метрик всех устройств, задержки event loop'а и потока GUI"""
+
+    def __init__(self):
+        self.devices: Dict[str, DeviceMetrics] = {}
+        # Насколько event loop опаздывает с выполнением задач (признак перегрузки)
+        self.loop_lag = LatencyHistogram()
+        # Насколько опаздывают таймеры Tk (поток GUI занят обработчиками или перерисовкой)
+        self.tk_lag = LatencyHistogram()
+        # От вызова в потоке GUI до запуска операции в event loop'е (AsyncBridge)
+        self.handoff = LatencyHistogram()
+        self._started = time.time()
+
+    def device(self, address: str) -> DeviceMetrics:
+        """Метрики устройства (создаются при первом обращении)"""
+        metrics = self.devices.get(address)
+        if metrics is None:
+            metrics = self.devices[address] = DeviceMetrics(address)
+        return metrics
+
+    def snapshot(self) -> dict:
+        """Снимок всех метрик"""
+        return {
+            "timestamp": round(time.time(), 3),
+            "uptime_s": round(time.time() - self._started, 3),
+            "loop_lag": self.loop_lag.snapshot(),
+            "tk_lag": self.tk_lag.snapshot(),
+            "handoff": self.handoff.snapshot(),
+            "devices": {address: metrics.snapshot() for address, metrics in self.devices.items()},
+        }
+
+    def to_json(self) -> str:
+        """Снимок в JSON"""
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_text(self) -> str:
+        """Снимок в читаемом виде"""
+        snapshot = self.snapshot()
+        lag = snapshot["loop_lag"]
+        lines = [f"event loop: лаг p50={lag['p50_ms']} мс p99={lag['p99_ms']} мс max={lag['max_ms']} мс"]
+        for key, title in (("tk_lag", "поток GUI: лаг"), ("handoff", "GUI -> loop: передача")):
+            histogram = snapshot[key]
+            if histogram["count"]:
+                lines.append(f"{title} p50={histogram['p50_ms']} мс p99={histogram['p99_ms']} мс "
+                             f"max={histogram['max_ms']} мс")
+        for address, device in snapshot["devices"].items():
+            write = device["write_latency"]
+            wait = device["queue_wait"]
+            lines.append(f"{address}: записей={device['writes']} ошибок={device['failures']} "
+                         f"повторов={device['retries']} переподключений={device['reconnects']} "
+                         f"пропущено без изменений={device['suppressed']}")
+            lines.append(f"  запись p50/p95/p99 = {write['p50_ms']}/{write['p95_ms']}/{write['p99_ms']} мс, "
+                         f"ожидание в очереди p50/p99 = {wait['p50_ms']}/{wait['p99_ms']} мс")
+            queue = device.get("queue")
+            if queue:
+                lines.append(f"  очередь: глубина={queue['depth']} схлопнуто={queue['coalesced']} "
+                             f"отброшено={queue['dropped']} темп={queue['rate'] or '-'}/с")
+        return "\n".join(lines)
+
+    # --- Фоновые задачи ---
+
+    async def monitor_loop_lag(self, interval: float = 0.1):
+        """Измерять опоздание event loop'а каждые interval секунд"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag.record(max(0.0, loop.time() - expected))
+
+    def monitor_tk_lag(self, root, interval: float = 0.1):
+        """
+        Измерять опоздание таймеров Tk каждые interval секунд (вызывать из потока GUI)
+
+        Args:
+            root: Окно Tk (нужен только after(ms, func))
+        """
+        delay = max(1, int(interval * 1000))
+
+        def probe(expected: float):
+            self.tk_lag.record(max(0.0, time.perf_counter() - expected))
+            schedule()
+
+        def schedule():
+            root.after(delay, probe, time.perf_counter() + delay / 1000)
+
+        schedule()
+
+    async def report_periodically(self, interval: float = 10.0, path: Optional[str] = None,
+                                  fmt: str = "text"):
+        """
+        Периодический снимок метрик
+
+        Args:
+            interval: Период в секундах
+            path: Файл для снимка (перезаписывается); None - вывод в консоль
+            fmt: "text" или "json"
+        """
+        while True:
+            await asyncio.sleep(interval)
+            text = self.to_json() if fmt == "json" else self.to_text()
+            if path is None:
+                print(text)
+                continue
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(text)
+            except OSError as e:
+                print(f"Не удалось записать метрики: {e}")
+
+    def http_response(self, path: str) -> Optional[HTTPResponse]:
+        """Ответ на GET /metrics (текст) и /metrics.json; None для других путей"""
+        if path == "/metrics.json":
+            return json_response(self.snapshot())
+        if path == "/metrics":
+            return text_response(self.to_text())
+        return None
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9464, token: Optional[str] = None):
+        """
+        HTTP-эндпоинт метрик: GET /metrics (текст) и GET /metrics.json
+
+        Не на loopback адресе нужен token (см. led_http.serve_http).
+
+        Returns:
+            asyncio.Server (закрыть через server.close())
+        """
+        async def handle(request: HTTPRequest) -> HTTPResponse:
+            return self.http_response(request.path) or text_response("not found", "404 Not Found")
+
+        return await serve_http(handle, host, port, token)
+
+
+# Реестр по умолчанию
+METRICS = MetricsRegistry()
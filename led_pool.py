@@ -0,0 +1,200 @@
+"""
+Пул подключений к нескольким LED лентам
+Держит открытыми соединения со многими устройствами и рассылает групповые
+команды параллельно: медленная или недоступная лента не задерживает остальные
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from led_cache import DeviceCache
+from led_controller import LEDController
+
+
+class DeviceResult(NamedTuple):
+    """Результат операции для одного устройства"""
+    address: str
+    success: bool
+    latency: float  # секунды
+    error: Optional[str] = None
+
+
+class DevicePool:
+    """
+    Менеджер множества подключений
+
+    Подключение и поиск сервисов выполняются не более чем для
+    max_concurrent_connects устройств одновременно. Групповые операции
+    рассылаются через asyncio.gather с таймаутом на каждое устройство.
+    """
+
+    def __init__(self,
+                 max_concurrent_connects: int = 4,
+                 connect_timeout: float = 20.0,
+                 command_timeout: float = 2.0,
+                 cache: Optional[DeviceCache] = None,
+                 transport=None,
+                 keep_warm: Optional[float] = None):
+        self.max_concurrent_connects = max_concurrent_connects
+        self.connect_timeout = connect_timeout
+        self.command_timeout = command_timeout
+        # Один кэш на весь пул, чтобы контроллеры не перезаписывали файл друг друга
+        self.cache = cache if cache is not None else DeviceCache()
+        self.transport = transport
+        # Период пинга простаивающих соединений (см. LEDController.keep_warm)
+        self.keep_warm = keep_warm
+        self.controllers: Dict[str, LEDController] = {}
+        self.groups: Dict[str, List[str]] = {}
+        self._connect_semaphore: Optional[asyncio.Semaphore] = None
+        # Идущие подключения: второй вызывающий ждет того же результата
+        self._connecting: Dict[str, asyncio.Future] = {}
+
+    # --- Подключения ---
+
+    async def connect(self, address: str, name: str = "") -> DeviceResult:
+        """
+        Подключение одного устройства (с ограничением параллельности)
+
+        Пока к адресу идет подключение, повторный вызов не начинает второе
+        (лишний BleakClient), а возвращает результат первого.
+        """
+        task = self._connecting.get(address)
+        if task is None:
+            task = self._connecting[address] = asyncio.ensure_future(self._connect(address, name))
+            task.add_done_callback(lambda _: self._connecting.pop(address, None))
+        # Отмена одного вызывающего не прерывает подключение для остальных
+        return await asyncio.shield(task)
+
+    async def _connect(self, address: str, name: str) -> DeviceResult:
+        if self._connect_semaphore is None:
+            self._connect_semaphore = asyncio.Semaphore(self.max_concurrent_connects)
+
+        controller = self.controllers.get(address)
+        if controller is None:
+            controller = LEDController(cache=self.cache, transport=self.transport, keep_warm=self.keep_warm)
+            self.controllers[address] = controller
+
+        started = time.perf_counter()
+        async with self._connect_semaphore:
+            try:
+                success = await asyncio.wait_for(controller.connect(address, name),
+                                                 self.connect_timeout)
+                error = None if success else "не удалось подключиться"
+            except asyncio.TimeoutError:
+                await self._abort_connect(address, controller)
+                success, error = False, "таймаут подключения"
+            except asyncio.CancelledError:
+                await self._abort_connect(address, controller)
+                raise
+        return DeviceResult(address, success, time.perf_counter() - started, error)
+
+    @staticmethod
+    async def _abort_connect(address: str, controller: LEDController):
+        # Прерванный connect() оставляет клиента с незавершенным подключением - освобождаем его
+        try:
+            await controller.disconnect()
+        except Exception as e:
+            print(f"Ошибка отключения {address} после прерванного подключения: {e}")
+
+    async def connect_many(self,
+                           devices: Iterable[Union[str, Tuple[str, str]]]) -> Dict[str, DeviceResult]:
+        """
+        Подключение нескольких устройств
+
+        Args:
+            devices: Адреса или пары (имя, адрес), например результат scan_devices
+        """
+        targets = []
+        for device in devices:
+            if isinstance(device, str):
+                targets.append(("", device))
+            else:
+                targets.append((device[0], device[1]))
+
+        results = await asyncio.gather(*(self.connect(address, name) for name, address in targets))
+        return {result.address: result for result in results}
+
+    async def disconnect(self, address: str):
+        """Отключение устройства и удаление его из пула"""
+        controller = self.controllers.pop(address, None)
+        if controller is not None:
+            await controller.disconnect()
+
+    async def disconnect_all(self):
+        """Отключение всех устройств"""
+        addresses = list(self.controllers)
+        await asyncio.gather(*(self.disconnect(address) for address in addresses),
+                             return_exceptions=True)
+
+    def connected(self) -> List[str]:
+        """Адреса подключенных устройств"""
+        return [address for address, controller in self.controllers.items()
+                if controller.client and controller.client.is_connected]
+
+    # --- Группы ---
+
+    def add_group(self, name: str, addresses: Iterable[str]):
+        """Создать или заменить группу устройств"""
+        self.groups[name] = list(addresses)
+
+    def remove_group(self, name: str):
+        """Удалить группу"""
+        self.groups.pop(name, None)
+
+    def resolve(self, target: Union[str, Iterable[str], None]) -> List[str]:
+        """
+        Список адресов по цели операции
+
+        Args:
+            target: Имя группы, адрес, список адресов или None (все устройства пула)
+        """
+        if target is None:
+            return list(self.controllers)
+        if isinstance(target, str):
+            return list(self.groups.get(target, [target]))
+        return list(target)
+
+    # --- Групповые операции ---
+
+    async def set_color(self, target, r: int, g: int, b: int) -> Dict[str, DeviceResult]:
+        """Установка цвета на группе"""
+        return await self.fan_out(target, lambda c: c.send_color(r, g, b))
+
+    async def set_brightness(self, target, brightness: int) -> Dict[str, DeviceResult]:
+        """Установка яркости (0-100) на группе"""
+        return await self.fan_out(target, lambda c: c.set_brightness(brightness))
+
+    async def power(self, target, on: bool) -> Dict[str, DeviceResult]:
+        """Включение/выключение группы"""
+        return await self.fan_out(target, lambda c: c.power_on() if on else c.power_off())
+
+    async def fan_out(self,
+                      target,
+                      action: Callable[[LEDController], Awaitable[bool]]) -> Dict[str, DeviceResult]:
+        """
+        Параллельное выполнение операции на всех устройствах цели
+
+        Returns:
+            Результат с задержкой для каждого адреса
+        """
+        addresses = self.resolve(target)
+        results = await asyncio.gather(*(self._run(address, action) for address in addresses))
+        return {result.address: result for result in results}
+
+    async def _run(self,
+                   address: str,
+                   action: Callable[[LEDController], Awaitable[bool]]) -> DeviceResult:
+        controller = self.controllers.get(address)
+        if controller is None:
+            return DeviceResult(address, False, 0.0, "устройство не в пуле")
+
+        started = time.perf_counter()
+        try:
+            success = await asyncio.wait_for(action(controller), self.command_timeout)
+            error = None if success else "запись не прошла"
+        except asyncio.TimeoutError:
+            success, error = False, "таймаут"
+        except Exception as e:
+            success, error = False, str(e)
+        return DeviceResult(address, success, time.perf_counter() - started, error)
@@ -3,210 +3,661 @@
 Добавляйте свои протоколы или модифицируйте существующие
 """
 
-from typing import Dict, Callable
+import functools
+import json
+import os
+import re
 import struct
+from collections.abc import Mapping
+from typing import Dict, Callable, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+
+class ProtocolProfile(NamedTuple):
+    """Возможности прошивки: с какой скоростью и как в нее можно писать"""
+    max_write_rate: float       # команд в секунду, которые лента успевает обработать
+    write_with_response: bool   # писать с подтверждением (write request) или без
+    max_payload: int            # максимальный размер одной записи в байтах
+    # Яркость применяется масштабированием RGB на стороне клиента одним кадром цвета
+    # (для прошивок, у которых команда яркости затирает цвет или ее нет)
+    fused_brightness: bool = False
+
+
+def fused_brightness_error(name: str) -> str:
+    """Сообщение, когда совмещенной яркости не к чему применяться: цвет неизвестен"""
+    return f"{name} задает яркость вместе с цветом: сначала задайте цвет"
 
 
 class LEDProtocol:
-    """Базовый класс для протоколов LED лент"""
+    """
+    Базовый класс для протоколов LED лент
+    
+    Наследник задает кадры (color_frame и brightness_frame - StructFrame,
+    power_on_frame и power_off_frame - bytes) в __init__ - тогда кодирование в
+    буфер и пакетное кодирование работают автоматически. Обычно протокол
+    описывается данными (ProtocolSpec -> SpecProtocol); можно и просто
+    переопределить методы *_command, как раньше.
+    """
+    
+    # Профиль по умолчанию - консервативный для дешевых BLE контроллеров
+    profile = ProtocolProfile(max_write_rate=20.0, write_with_response=False, max_payload=20)
+    
+    color_frame: Optional["StructFrame"] = None
+    brightness_frame: Optional["StructFrame"] = None
+    power_on_frame: Optional[bytes] = None
+    power_off_frame: Optional[bytes] = None
     
     def __init__(self, name: str):
         self.name = name
     
-    def color_command(self, r: int, g: int, b: int) -> bytearray:
+    def color_command(self, r: int, g: int, b: int) -> bytes:
         """Генерация команды для установки цвета"""
-        raise NotImplementedError
+        if self.color_frame is None:
+            raise NotImplementedError
+        return self.color_frame.pack(r, g, b)
     
-    def brightness_command(self, brightness: int) -> bytearray:
+    def brightness_command(self, brightness: int) -> bytes:
         """Генерация команды для установки яркости"""
-        raise NotImplementedError
+        if self.brightness_frame is None:
+            raise NotImplementedError
+        return self.brightness_frame.pack(self.scale_brightness(brightness))
     
-    def power_on_command(self) -> bytearray:
+    def power_on_command(self) -> bytes:
         """Команда включения"""
-        raise NotImplementedError
+        if self.power_on_frame is None:
+            raise NotImplementedError
+        return self.power_on_frame
     
-    def power_off_command(self) -> bytearray:
+    def power_off_command(self) -> bytes:
         """Команда выключения"""
-        raise NotImplementedError
+        if self.power_off_frame is None:
+            raise NotImplementedError
+        return self.power_off_frame
+    
+    def scale_brightness(self, brightness: int) -> int:
+        """Перевод яркости 0-100 в значение для кадра"""
+        return brightness
+    
+    def decode(self, data) -> Optional[Tuple[str, Tuple[int, ...]]]:
+        """
+        Разбор записанной команды (для симулятора и проверок)
+        
+        Returns:
+            ("color", (R, G, B)), ("brightness", (значение,)), ("power", (1,)) / ("power", (0,))
+            или None для нераспознанного кадра. Яркость возвращается в единицах кадра;
+            если формат кадра яркости совпадает с форматом цвета, кадр разбирается как цвет.
+        """
+        data = bytes(data)
+        if self.power_on_frame is not None and data == self.power_on_frame:
+            return ("power", (1,))
+        if self.power_off_frame is not None and data == self.power_off_frame:
+            return ("power", (0,))
+        for kind, frame in (("color", self.color_frame), ("brightness", self.brightness_frame)):
+            if frame is not None:
+                values = frame.decode(data)
+                if values is not None:
+                    return (kind, values)
+        return None
+    
+    def encode_color_into(self, buf, offset: int, r: int, g: int, b: int) -> int:
+        """Записать команду цвета в буфер (bytearray или memoryview); возвращает число байт"""
+        if self.color_frame is None:
+            data = self.color_command(r, g, b)
+            buf[offset:offset + len(data)] = data
+            return len(data)
+        return self.color_frame.pack_into(buf, offset, r, g, b)
+    
+    def encode_brightness_into(self, buf, offset: int, brightness: int) -> int:
+        """Записать команду яркости в буфер; возвращает число байт"""
+        if self.brightness_frame is None:
+            data = self.brightness_command(brightness)
+            buf[offset:offset + len(data)] = data
+            return len(data)
+        return self.brightness_frame.pack_into(buf, offset, self.scale_brightness(brightness))
+    
+    def encode_colors(self, colors: Sequence[Tuple[int, int, int]]) -> bytearray:
+        """Пакетное кодирование последовательности цветов в один непрерывный буфер"""
+        if self.color_frame is None:
+            return bytearray().join(self.color_command(r, g, b) for r, g, b in colors)
+        buf = bytearray(self.color_frame.size * len(colors))
+        self.encode_colors_into(buf, colors)
+        return buf
+    
+    def encode_colors_into(self, buf, colors: Iterable[Tuple[int, int, int]], offset: int = 0) -> int:
+        """
+        Пакетное кодирование цветов в буфер подряд, кадр за кадром
+        
+        Returns:
+            Число записанных байт
+        """
+        frame = self.color_frame
+        if frame is None:
+            start = offset
+            for r, g, b in colors:
+                offset += self.encode_color_into(buf, offset, r, g, b)
+            return offset - start
+        
+        # Кадр за кадром прямо в буфер одним pack_into, без промежуточных объектов
+        pack_into = frame.pack_into
+        start = offset
+        for r, g, b in colors:
+            offset += pack_into(buf, offset, r, g, b)
+        return offset - start
 
 
-class GenericProtocol(LEDProtocol):
-    """
-    Универсальный протокол для большинства китайских LED лент
-    Совместим с: ELK-BLEDOM, Magic Home, Happy Lighting, и др.
-    """
-    
-    def __init__(self):
-        super().__init__("Generic/Universal")
-    
-    def color_command(self, r: int, g: int, b: int) -> bytearray:
-        """Формат: [0x56, R, G, B, 0x00, 0xF0, 0xAA]"""
-        return bytearray([0x56, r, g, b, 0x00, 0xF0, 0xAA])
-    
-    def brightness_command(self, brightness: int) -> bytearray:
-        """Формат: [0x56, brightness, 0x00, 0x00, 0x00, 0xF0, 0xAA]"""
-        return bytearray([0x56, brightness, 0x00, 0x00, 0x00, 0xF0, 0xAA])
-    
-    def power_on_command(self) -> bytearray:
-        """Команда включения"""
-        return bytearray([0xCC, 0x23, 0x33])
-    
-    def power_off_command(self) -> bytearray:
-        """Команда выключения"""
-        return bytearray([0xCC, 0x24, 0x33])
+# --- Декларативные описания протоколов ---
+
+class FieldSpec(NamedTuple):
+    """Переменное поле кадра"""
+    name: str
+    format: str = "B"              # формат struct одного значения: B, H, I...
+    scale: float = 1.0             # множитель значения перед упаковкой
+    max: Optional[int] = None      # ограничение сверху после масштабирования
 
 
-class MagicHomeProtocol(LEDProtocol):
+class FrameSpec(NamedTuple):
     """
-    Протокол для Magic Home LED контроллеров
-    Совместим с: Magic Home, Magic Hue, Flux LED
+    Описание кадра
+
+    layout - элементы кадра по порядку: число - неизменный байт, FieldSpec - поле,
+    "checksum" - байт контрольной суммы. Поле может встречаться несколько раз -
+    значение пишется во все места. Кадр дополняется байтом padding до size;
+    контрольная сумма, не размещенная в layout, занимает последний байт.
     """
-    
-    def __init__(self):
-        super().__init__("Magic Home")
-    
-    def color_command(self, r: int, g: int, b: int) -> bytearray:
-        """Формат: [0x31, R, G, B, 0x00, 0xF0, 0x0F, checksum]"""
-        data = [0x31, r, g, b, 0x00, 0xF0, 0x0F]
-        checksum = sum(data) & 0xFF
-        return bytearray(data + [checksum])
-    
-    def brightness_command(self, brightness: int) -> bytearray:
-        """Установка яркости через изменение белого канала"""
-        return bytearray([0x31, 0x00, 0x00, 0x00, brightness, 0x0F, 0x0F])
-    
-    def power_on_command(self) -> bytearray:
-        """Команда включения"""
-        return bytearray([0x71, 0x23, 0x0F])
-    
-    def power_off_command(self) -> bytearray:
-        """Команда выключения"""
-        return bytearray([0x71, 0x24, 0x0F])
+    layout: Tuple[Union[int, str, FieldSpec], ...]
+    size: Optional[int] = None
+    padding: int = 0
+    checksum: Optional[str] = None   # "sum8" - сумма байт по модулю 256, "xor8" - XOR байт
+    checksum_from: int = 0           # с какого байта считается контрольная сумма
+    byteorder: str = ">"             # порядок байт многобайтовых полей
+
+
+class ProtocolSpec(NamedTuple):
+    """Описание протокола: профиль прошивки и кадры команд"""
+    name: str
+    profile: ProtocolProfile
+    color: Optional[FrameSpec] = None
+    brightness: Optional[FrameSpec] = None
+    power_on: Optional[FrameSpec] = None
+    power_off: Optional[FrameSpec] = None
+    description: str = ""
+
 
+CHECKSUMS = ("sum8", "xor8")
+_INTEGER_FORMATS = "bBhHiIlLqQ"
 
-class GoveeProtocol(LEDProtocol):
+
+class StructFrame:
     """
-    Протокол для Govee LED лент
-    Совместим с: Govee H6127, H6159, и другие BLE модели
+    Кадр, скомпилированный из FrameSpec
+
+    При создании описание проверяется и превращается в один struct.Struct
+    на весь кадр: подряд идущие неизменные байты - одно поле "Ns", переменные
+    поля - свои форматы. Функция упаковки генерируется под кадр один раз
+    (как в collections.namedtuple): кадр собирается одним вызовом pack_into,
+    а контрольная сумма однобайтовых полей досчитывается от заранее
+    посчитанной суммы неизменных байт.
+
+    pack(*values) возвращает готовую команду, pack_into(buf, offset, *values)
+    пишет кадр целиком в буфер (bytearray или memoryview) и возвращает его длину.
+
+    Args:
+        spec: Описание кадра
+        names: Имена полей в порядке аргументов pack (например, ("r", "g", "b"));
+            None - в порядке первого появления в layout
     """
-    
-    def __init__(self):
-        super().__init__("Govee")
-    
-    def color_command(self, r: int, g: int, b: int) -> bytearray:
-        """Формат Govee: [0x33, 0x05, 0x02, R, G, B, 0x00, ...checksum]"""
-        data = [0x33, 0x05, 0x02, r, g, b, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]
-        checksum = sum(data) & 0xFF
-        return bytearray(data + [checksum])
-    
-    def brightness_command(self, brightness: int) -> bytearray:
-        """Установка яркости"""
-        data = [0x33, 0x04, brightness, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]
-        checksum = sum(data) & 0xFF
-        return bytearray(data + [checksum])
-    
-    def power_on_command(self) -> bytearray:
-        """Команда включения"""
-        return bytearray([0x33, 0x01, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x35])
-    
-    def power_off_command(self) -> bytearray:
-        """Команда выключения"""
-        return bytearray([0x33, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x34])
 
+    def __init__(self, spec: FrameSpec, names: Optional[Sequence[str]] = None):
+        self.spec = spec
+        if spec.byteorder not in "<>":
+            raise ValueError(f"Порядок байт должен быть '<' или '>': {spec.byteorder!r}")
+        if spec.checksum is not None and spec.checksum not in CHECKSUMS:
+            raise ValueError(f"Неизвестная контрольная сумма {spec.checksum!r} (есть: {', '.join(CHECKSUMS)})")
+        if not 0 <= spec.padding <= 255:
+            raise ValueError(f"Байт заполнения вне диапазона 0-255: {spec.padding}")
+
+        self.fields: List[FieldSpec] = []
+        positions: List[List[int]] = []
+        items: List[tuple] = []  # ("const", байт) | ("field", индекс, ширина) | ("checksum",)
+        checksum_at = None
+        offset = 0
+        for item in spec.layout:
+            if isinstance(item, int):
+                if not 0 <= item <= 255:
+                    raise ValueError(f"Байт вне диапазона 0-255 на смещении {offset}: {item}")
+                items.append(("const", item))
+                offset += 1
+            elif item == "checksum":
+                if spec.checksum is None or checksum_at is not None:
+                    raise ValueError("Место контрольной суммы задано без алгоритма или дважды")
+                checksum_at = offset
+                items.append(("checksum",))
+                offset += 1
+            else:
+                field = item if isinstance(item, FieldSpec) else FieldSpec(item)
+                if len(field.format) != 1 or field.format not in _INTEGER_FORMATS:
+                    raise ValueError(f"Поле {field.name}: неподдерживаемый формат {field.format!r}")
+                index = next((i for i, known in enumerate(self.fields) if known.name == field.name), None)
+                if index is None:
+                    index = len(self.fields)
+                    self.fields.append(field)
+                    positions.append([])
+                elif self.fields[index] != field:
+                    raise ValueError(f"Поле {field.name} описано по-разному")
+                width = struct.calcsize(spec.byteorder + field.format)
+                positions[index].append(offset)
+                items.append(("field", index, width))
+                offset += width
+
+        if names is not None:
+            # Аргументы связываются по именам: GRB-раскладка ["g", "r", "b"] не меняет каналы местами
+            given = [field.name for field in self.fields]
+            if sorted(given) != sorted(names):
+                raise ValueError(f"Ожидаются поля {', '.join(names) or 'нет'}, заданы {', '.join(given) or 'нет'}")
+            order = [given.index(name) for name in names]
+            remap = {old: new for new, old in enumerate(order)}
+            self.fields = [self.fields[old] for old in order]
+            positions = [positions[old] for old in order]
+            items = [("field", remap[item[1]], item[2]) if item[0] == "field" else item for item in items]
+
+        # Контрольная сумма без места в layout - последний байт кадра
+        trailing_checksum = spec.checksum is not None and checksum_at is None
+        size = spec.size if spec.size is not None else offset + trailing_checksum
+        end = size - 1 if trailing_checksum else size
+        if offset > end:
+            raise ValueError(f"Поля не помещаются в кадр: {offset} байт при размере {size}")
+        items.extend(("const", spec.padding) for _ in range(end - offset))
+        if trailing_checksum:
+            checksum_at = end
+            items.append(("checksum",))
+        if checksum_at is not None and not 0 <= spec.checksum_from < checksum_at:
+            raise ValueError(f"Контрольная сумма с байта {spec.checksum_from} до {checksum_at}: пустой диапазон")
+
+        self.size = size
+        self.checksum = spec.checksum
+        self.checksum_at = checksum_at
+        self.slots: Tuple[Tuple[int, ...], ...] = tuple(tuple(p) for p in positions)
+        self._compile(items)
+
+    def _compile(self, items: List[tuple]):
+        spec = self.spec
+        template = bytearray()
+        struct_format = [spec.byteorder]
+        args = []
+        namespace = {}
+        run = bytearray()
+
+        def flush_run():
+            if run:
+                name = f"C{len(namespace)}"
+                namespace[name] = bytes(run)
+                struct_format.append(f"{len(run)}s")
+                args.append(name)
+                run.clear()
+
+        for item in items:
+            if item[0] == "const":
+                run.append(item[1])
+                template.append(item[1])
+                continue
+            flush_run()
+            if item[0] == "field":
+                struct_format.append(self.fields[item[1]].format)
+                args.append(f"v{item[1]}")
+                template.extend(bytes(item[2]))
+            else:
+                struct_format.append("B")
+                args.append("cs")
+                template.append(0)
+        flush_run()
+
+        self.template = bytes(template)
+        self.struct = struct.Struct("".join(struct_format))
+        # Кадр с однобайтовыми полями и суммой от начала кодируется и векторно (led_frames)
+        single_byte = all(field.format == "B" and field.scale == 1.0 and field.max is None
+                          for field in self.fields)
+        self.vectorizable = single_byte and self.checksum in (None, "sum8") and spec.checksum_from == 0
+        # Неизменные байты и поля в порядке struct - для разбора
+        self._layout = [("const", namespace[arg]) if arg.startswith("C") else
+                        ("field", int(arg[1:])) if arg.startswith("v") else ("checksum",)
+                        for arg in args]
+
+        params = "".join(f", v{i}" for i in range(len(self.fields)))
+        lines = []
+        for i, field in enumerate(self.fields):
+            if field.scale != 1.0:
+                lines.append(f"    v{i} = int(v{i} * {field.scale!r})")
+            if field.max is not None:
+                lines.append(f"    v{i} = min(v{i}, {field.max!r})")
 
-class YeelightProtocol(LEDProtocol):
+        fast_checksum = self.checksum is not None and all(field.format == "B" for field in self.fields)
+        if fast_checksum:
+            start, stop = spec.checksum_from, self.checksum_at
+            base = self._checksum(b for i, b in enumerate(self.template) if start <= i < stop)
+            terms = []
+            for i, slot in enumerate(self.slots):
+                weight = sum(start <= position < stop for position in slot)
+                if self.checksum == "sum8" and weight:
+                    terms.append(f" + v{i}" if weight == 1 else f" + v{i} * {weight}")
+                elif self.checksum == "xor8" and weight % 2:
+                    terms.append(f" ^ v{i}")
+            lines.append(f"    cs = ({base}{''.join(terms)}) & 255")
+        elif self.checksum is not None:
+            lines.append("    cs = 0")
+        lines.append(f"    _pack_into(buf, offset, {', '.join(args)})")
+        if self.checksum is not None and not fast_checksum:
+            lines.append("    _finish(buf, offset)")
+        body = "\n".join(lines)
+        source = f"def pack_into(buf, offset{params}):\n{body}\n    return {self.size}\n"
+        if self.checksum is None or fast_checksum:
+            # Отдельный кадр - один вызов Struct.pack, его bytes и есть команда
+            packed = "\n".join(lines[:-1] + [f"    return _pack({', '.join(args)})"])
+            source += f"def pack({params[2:]}):\n{packed}\n"
+        else:
+            source += (f"def pack({params[2:]}):\n    buf = bytearray({self.size})\n"
+                       f"    pack_into(buf, 0{params})\n    return bytes(buf)\n")
+
+        namespace.update(_pack=self.struct.pack, _pack_into=self.struct.pack_into, _finish=self._finish_checksum)
+        exec(source, namespace)
+        self.pack_into: Callable[..., int] = namespace["pack_into"]
+        self.pack: Callable[..., bytes] = namespace["pack"]
+
+    def _checksum(self, data: Iterable[int]) -> int:
+        total = 0
+        if self.checksum == "sum8":
+            for value in data:
+                total += value
+        else:
+            for value in data:
+                total ^= value
+        return total & 0xFF
+
+    def _finish_checksum(self, buf, offset: int):
+        """Контрольная сумма по уже упакованным байтам (многобайтовые поля)"""
+        start = offset + self.spec.checksum_from
+        buf[offset + self.checksum_at] = self._checksum(buf[start:offset + self.checksum_at])
+
+    def decode(self, data) -> Optional[Tuple[int, ...]]:
+        """
+        Разбор кадра
+
+        Returns:
+            Значения полей в единицах кадра или None, если кадр не соответствует
+            описанию (длина, неизменные байты, контрольная сумма)
+        """
+        if len(data) != self.size:
+            return None
+        unpacked = self.struct.unpack_from(data)
+        values: List[Optional[int]] = [None] * len(self.fields)
+        for (kind, *payload), value in zip(self._layout, unpacked):
+            if kind == "const":
+                if value != payload[0]:
+                    return None
+            elif kind == "field":
+                index = payload[0]
+                if values[index] is not None and values[index] != value:
+                    return None
+                values[index] = value
+        if self.checksum is not None:
+            start = self.spec.checksum_from
+            if data[self.checksum_at] != self._checksum(bytes(data[start:self.checksum_at])):
+                return None
+        return tuple(values)
+
+
+def _frame_spec_from_dict(data: dict) -> FrameSpec:
     """
-    Протокол для Yeelight LED устройств
-    Совместим с: Yeelight LED Strip, Yeelight Bulb (BLE версии)
+    FrameSpec из словаря (JSON)
+
+    Элементы layout: число или строка "0x.." - неизменный байт, "checksum" - место
+    контрольной суммы, другая строка - поле формата "B", словарь - поле
+    {"field": имя, "format": "H", "scale": 0.64, "max": 64}.
     """
-    
-    def __init__(self):
-        super().__init__("Yeelight")
-    
-    def color_command(self, r: int, g: int, b: int) -> bytearray:
-        """Yeelight использует 32-bit RGB значение"""
-        rgb_value = (r << 16) + (g << 8) + b
-        return bytearray([0x43, 0x01, 0x02] + list(struct.pack('>I', rgb_value)))
-    
-    def brightness_command(self, brightness: int) -> bytearray:
-        """Яркость в процентах"""
-        return bytearray([0x43, 0x02, brightness])
-    
-    def power_on_command(self) -> bytearray:
-        """Команда включения"""
-        return bytearray([0x43, 0x40, 0x01])
-    
-    def power_off_command(self) -> bytearray:
-        """Команда выключения"""
-        return bytearray([0x43, 0x40, 0x02])
+    layout = []
+    for item in data["layout"]:
+        if isinstance(item, str) and item.lower().startswith("0x"):
+            layout.append(int(item, 16))
+        elif isinstance(item, dict):
+            layout.append(FieldSpec(item["field"], item.get("format", "B"),
+                                    float(item.get("scale", 1.0)), item.get("max")))
+        else:
+            layout.append(item)
+    return FrameSpec(tuple(layout), data.get("size"), data.get("padding", 0), data.get("checksum"),
+                     data.get("checksum_from", 0), data.get("byteorder", ">"))
 
 
-class TrLifeProtocol(LEDProtocol):
+def protocol_spec_from_dict(data: dict) -> ProtocolSpec:
     """
-    Протокол для Triones/Tr-Life LED контроллеров
-    Совместим с: Triones, Happy Lighting, iDual
+    ProtocolSpec из словаря (формат файла протоколов)
+
+        {"name": "ELK-BLEDOM",
+         "profile": {"max_write_rate": 15, "write_with_response": false, "max_payload": 20},
+         "frames": {"color": {"layout": ["0x7E", "0x07", "0x05", "0x03", "r", "g", "b", "0x10", "0xEF"]},
+                    "brightness": {...}, "power_on": {...}, "power_off": {...}}}
     """
+    frames = data.get("frames", {})
+    unknown = set(frames) - {"color", "brightness", "power_on", "power_off"}
+    if unknown:
+        raise ValueError(f"Неизвестные кадры: {', '.join(sorted(unknown))}")
+    return ProtocolSpec(
+        name=data["name"],
+        profile=ProtocolProfile(**data["profile"]),
+        description=data.get("description", ""),
+        **{kind: _frame_spec_from_dict(frame) for kind, frame in frames.items()},
+    )
+
+
+class SpecProtocol(LEDProtocol):
+    """Протокол, собранный из ProtocolSpec; кадры компилируются при создании"""
+
+    # Поля каждого кадра: значения передаются в pack по этим именам
+    _FIELDS = {"color": ("r", "g", "b"), "brightness": ("brightness",), "power_on": (), "power_off": ()}
+
+    def __init__(self, spec: ProtocolSpec):
+        super().__init__(spec.name)
+        self.spec = spec
+        self.profile = spec.profile
+        frames = {}
+        for kind, names in self._FIELDS.items():
+            frame_spec = getattr(spec, kind)
+            if frame_spec is None:
+                continue
+            try:
+                frame = frames[kind] = StructFrame(frame_spec, names)
+            except (ValueError, struct.error) as e:
+                raise ValueError(f"{spec.name}, кадр {kind}: {e}") from None
+            if frame.size > spec.profile.max_payload:
+                raise ValueError(f"{spec.name}, кадр {kind}: {frame.size} байт больше max_payload")
+        self.color_frame = frames.get("color")
+        self.brightness_frame = frames.get("brightness")
+        self.power_on_frame = frames["power_on"].pack() if "power_on" in frames else None
+        self.power_off_frame = frames["power_off"].pack() if "power_off" in frames else None
+        # Команда - сразу функция упаковки кадра, без промежуточного вызова метода
+        # (если наследник не переопределил метод); масштаб яркости задан в описании поля
+        cls = type(self)
+        if self.color_frame is not None and cls.color_command is SpecProtocol.color_command:
+            self.color_command = self.color_frame.pack
+        if self.brightness_frame is not None and cls.brightness_command is SpecProtocol.brightness_command:
+            self.brightness_command = self.brightness_frame.pack
+
+    def color_command(self, r: int, g: int, b: int) -> bytes:
+        if self.color_frame is None:
+            raise NotImplementedError
+        return self.color_frame.pack(r, g, b)
+
+    def brightness_command(self, brightness: int) -> bytes:
+        if self.brightness_frame is None:
+            raise NotImplementedError
+        return self.brightness_frame.pack(brightness)
+
+    def power_on_command(self) -> bytes:
+        if self.power_on_frame is None:
+            raise NotImplementedError
+        return self.power_on_frame
+
+    def power_off_command(self) -> bytes:
+        if self.power_off_frame is None:
+            raise NotImplementedError
+        return self.power_off_frame
     
-    def __init__(self):
-        super().__init__("Triones/TrLife")
-    
-    def color_command(self, r: int, g: int, b: int) -> bytearray:
-        """Формат: [0x56, R, G, B, 0x00, 0xF0, 0xAA]"""
-        return bytearray([0x56, r, g, b, 0x00, 0xF0, 0xAA])
-    
-    def brightness_command(self, brightness: int) -> bytearray:
-        """Яркость через модификацию цвета"""
-        return bytearray([0x56, brightness, brightness, brightness, 0x00, 0xF0, 0xAA])
-    
-    def power_on_command(self) -> bytearray:
-        """Команда включения"""
-        return bytearray([0xCC, 0x23, 0x33])
-    
-    def power_off_command(self) -> bytearray:
-        """Команда выключения"""
-        return bytearray([0xCC, 0x24, 0x33])
+
+def _simple_frame(*layout, **options) -> dict:
+    return dict(layout=list(layout), **options)
+
+
+# Встроенные протоколы: ключ реестра -> описание (тот же формат, что в файле протоколов)
+BUILTIN_SPECS: Dict[str, dict] = {
+    "Generic": {
+        "name": "Generic/Universal",
+        "description": "Большинство китайских лент: ELK-BLEDOM, Magic Home, Happy Lighting и др.",
+        "profile": {"max_write_rate": 20.0, "write_with_response": False, "max_payload": 20,
+                    "fused_brightness": True},
+        "frames": {
+            "color": _simple_frame(0x56, "r", "g", "b", 0x00, 0xF0, 0xAA),
+            "brightness": _simple_frame(0x56, "brightness", 0x00, 0x00, 0x00, 0xF0, 0xAA),
+            "power_on": _simple_frame(0xCC, 0x23, 0x33),
+            "power_off": _simple_frame(0xCC, 0x24, 0x33),
+        },
+    },
+    "ELK-BLEDOM": {
+        "name": "ELK-BLEDOM",
+        "description": "ELK-BLEDOM, Lotus Lantern, Duoco Strip",
+        "profile": {"max_write_rate": 15.0, "write_with_response": False, "max_payload": 20},
+        "frames": {
+            "color": _simple_frame(0x7E, 0x07, 0x05, 0x03, "r", "g", "b", 0x10, 0xEF),
+            # Яркость 0-100 переводится в диапазон контроллера 0-64
+            "brightness": _simple_frame(0x7E, 0x04, 0x01, {"field": "brightness", "scale": 0.64, "max": 64},
+                                        0xFF, 0xFF, 0xFF, 0x00, 0xEF),
+            "power_on": _simple_frame(0x7E, 0x04, 0x04, 0x01, 0xFF, 0xFF, 0xFF, 0x00, 0xEF),
+            "power_off": _simple_frame(0x7E, 0x04, 0x04, 0x00, 0xFF, 0xFF, 0xFF, 0x00, 0xEF),
+        },
+    },
+    "Magic Home": {
+        "name": "Magic Home",
+        "description": "Magic Home, Magic Hue, Flux LED",
+        "profile": {"max_write_rate": 20.0, "write_with_response": False, "max_payload": 20,
+                    "fused_brightness": True},
+        "frames": {
+            "color": _simple_frame(0x31, "r", "g", "b", 0x00, 0xF0, 0x0F, checksum="sum8"),
+            # Яркость через белый канал
+            "brightness": _simple_frame(0x31, 0x00, 0x00, 0x00, "brightness", 0x0F, 0x0F),
+            "power_on": _simple_frame(0x71, 0x23, 0x0F),
+            "power_off": _simple_frame(0x71, 0x24, 0x0F),
+        },
+    },
+    "Govee": {
+        "name": "Govee",
+        "description": "Govee H6127, H6159 и другие BLE модели; кадры по 20 байт",
+        "profile": {"max_write_rate": 10.0, "write_with_response": True, "max_payload": 20},
+        "frames": {
+            "color": _simple_frame(0x33, 0x05, 0x02, "r", "g", "b", size=20, checksum="sum8"),
+            "brightness": _simple_frame(0x33, 0x04, "brightness", size=20, checksum="sum8"),
+            "power_on": _simple_frame(0x33, 0x01, 0x01, size=20, checksum="sum8"),
+            "power_off": _simple_frame(0x33, 0x01, 0x00, size=20, checksum="sum8"),
+        },
+    },
+    "Yeelight": {
+        "name": "Yeelight",
+        "description": "Yeelight LED Strip, Yeelight Bulb (BLE версии)",
+        "profile": {"max_write_rate": 10.0, "write_with_response": True, "max_payload": 20},
+        "frames": {
+            "color": _simple_frame(0x43, 0x01, 0x02, 0x00, "r", "g", "b"),
+            # Яркость в процентах
+            "brightness": _simple_frame(0x43, 0x02, "brightness"),
+            "power_on": _simple_frame(0x43, 0x40, 0x01),
+            "power_off": _simple_frame(0x43, 0x40, 0x02),
+        },
+    },
+    "Triones": {
+        "name": "Triones/TrLife",
+        "description": "Triones, Happy Lighting, iDual",
+        "profile": {"max_write_rate": 20.0, "write_with_response": False, "max_payload": 20,
+                    "fused_brightness": True},
+        "frames": {
+            "color": _simple_frame(0x56, "r", "g", "b", 0x00, 0xF0, 0xAA),
+            # Яркость через модификацию цвета: одно значение во все три канала
+            "brightness": _simple_frame(0x56, "brightness", "brightness", "brightness", 0x00, 0xF0, 0xAA),
+            "power_on": _simple_frame(0xCC, 0x23, 0x33),
+            "power_off": _simple_frame(0xCC, 0x24, 0x33),
+        },
+    },
+    "Zengge": {
+        "name": "Zengge",
+        "description": "Zengge, LEDnet WF",
+        "profile": {"max_write_rate": 15.0, "write_with_response": False, "max_payload": 20},
+        "frames": {
+            "color": _simple_frame(0x7E, 0x00, 0x05, 0x03, "r", "g", "b", 0x00, 0xEF),
+            "brightness": _simple_frame(0x7E, 0x00, 0x01, "brightness", 0x00, 0x00, 0x00, 0x00, 0xEF),
+            "power_on": _simple_frame(0x7E, 0x04, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0xEF),
+            "power_off": _simple_frame(0x7E, 0x04, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0xEF),
+        },
+    },
+}
 
 
-class ZenggeProtocol(LEDProtocol):
+def protocol_from_dict(data: dict) -> SpecProtocol:
+    """Протокол из описания в формате файла протоколов"""
+    return SpecProtocol(protocol_spec_from_dict(data))
+
+
+class ProtocolRegistry(Mapping):
     """
-    Протокол для Zengge LED устройств
-    Совместим с: Zengge, LEDnet WF
+    Реестр протоколов с ленивым созданием
+    
+    Шаблоны кадров строятся при первом обращении к протоколу, поэтому
+    импорт модуля ничего не кодирует - однократная команда из CLI
+    создает только тот протокол, который ей нужен.
     """
     
-    def __init__(self):
-        super().__init__("Zengge")
+    def __init__(self, factories: Dict[str, Callable[[], LEDProtocol]]):
+        self._factories = dict(factories)
+        self._instances: Dict[str, LEDProtocol] = {}
     
-    def color_command(self, r: int, g: int, b: int) -> bytearray:
-        """Формат с контрольной суммой"""
-        return bytearray([0x7E, 0x00, 0x05, 0x03, r, g, b, 0x00, 0xEF])
+    def __getitem__(self, name: str) -> LEDProtocol:
+        protocol = self._instances.get(name)
+        if protocol is None:
+            protocol = self._instances[name] = self._factories[name]()
+        return protocol
     
-    def brightness_command(self, brightness: int) -> bytearray:
-        """Установка яркости"""
-        return bytearray([0x7E, 0x00, 0x01, brightness, 0x00, 0x00, 0x00, 0x00, 0xEF])
+    def __contains__(self, name) -> bool:
+        return name in self._factories
     
-    def power_on_command(self) -> bytearray:
-        """Команда включения"""
-        return bytearray([0x7E, 0x04, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0xEF])
+    def __iter__(self):
+        return iter(self._factories)
     
-    def power_off_command(self) -> bytearray:
-        """Команда выключения"""
-        return bytearray([0x7E, 0x04, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0xEF])
+    def __len__(self) -> int:
+        return len(self._factories)
+    
+    def key_of(self, protocol: LEDProtocol) -> str:
+        """Имя протокола в реестре (может отличаться от protocol.name)"""
+        for name, instance in self._instances.items():
+            if instance is protocol:
+                return name
+        return protocol.name
+    
+    def register(self, name: str, factory: Callable[[], LEDProtocol]):
+        """Добавить или заменить протокол"""
+        self._factories[name] = factory
+        self._instances.pop(name, None)
 
 
 # Реестр протоколов
-PROTOCOLS: Dict[str, LEDProtocol] = {
-    "Generic": GenericProtocol(),
-    "Magic Home": MagicHomeProtocol(),
-    "Govee": GoveeProtocol(),
-    "Yeelight": YeelightProtocol(),
-    "Triones": TrLifeProtocol(),
-    "Zengge": ZenggeProtocol(),
-}
+PROTOCOLS = ProtocolRegistry({key: functools.partial(protocol_from_dict, spec)
+                              for key, spec in BUILTIN_SPECS.items()})
+
+# Совместимость: прежние классы протоколов. Вызов создает встроенный протокол
+# (SpecProtocol), как раньше GenericProtocol() и т.п.; isinstance с ними не работает -
+# проверяйте PROTOCOLS.key_of(protocol) или protocol.name.
+GenericProtocol = functools.partial(protocol_from_dict, BUILTIN_SPECS["Generic"])
+MagicHomeProtocol = functools.partial(protocol_from_dict, BUILTIN_SPECS["Magic Home"])
+GoveeProtocol = functools.partial(protocol_from_dict, BUILTIN_SPECS["Govee"])
+YeelightProtocol = functools.partial(protocol_from_dict, BUILTIN_SPECS["Yeelight"])
+TrLifeProtocol = functools.partial(protocol_from_dict, BUILTIN_SPECS["Triones"])
+ZenggeProtocol = functools.partial(protocol_from_dict, BUILTIN_SPECS["Zengge"])
 
 
 def get_protocol(name: str) -> LEDProtocol:
     """Получить протокол по имени"""
-    return PROTOCOLS.get(name, GenericProtocol())
+    return PROTOCOLS[name] if name in PROTOCOLS else PROTOCOLS["Generic"]
 
 
 def list_protocols() -> list:
@@ -214,45 +665,264 @@ def list_protocols() -> list:
     return list(PROTOCOLS.keys())
 
 
-# Функции для определения протокола по имени устройства
-def detect_protocol_by_name(device_name: str) -> LEDProtocol:
+# --- Определение протокола по рекламному пакету ---
+
+class Fingerprint(NamedTuple):
+    """Признаки протокола в рекламном пакете"""
+    protocol: str                              # имя в PROTOCOLS
+    names: Tuple[str, ...] = ()                # подстроки имени (без учета регистра)
+    service_uuids: Tuple[str, ...] = ()        # UUID сервисов: 16-битные ("fff0") или полные
+    manufacturer_ids: Tuple[int, ...] = ()     # Company ID из manufacturer data
+    ouis: Tuple[str, ...] = ()                 # начало адреса ("BE:FF:20")
+    weight: float = 1.0                        # множитель веса совпадений правила
+
+
+# Порядок важен только при равном счете: выше - приоритетнее
+FINGERPRINTS = [
+    Fingerprint("Govee", names=("govee", "h6", "igovi", "ihoment"),
+                service_uuids=("00010203-0405-0607-0809-0a0b0c0d1910",),
+                manufacturer_ids=(0xEC88,)),
+    Fingerprint("Magic Home", names=("magic", "flux", "hue"), service_uuids=("ffe5",)),
+    Fingerprint("Yeelight", names=("yeelight", "yee")),
+    Fingerprint("Triones", names=("triones", "happy", "idual"), service_uuids=("ffd5", "ffd0")),
+    Fingerprint("Zengge", names=("zengge", "lednet")),
+    Fingerprint("ELK-BLEDOM", names=("elk", "bledom"), service_uuids=("fff0",), ouis=("BE:FF:20",)),
+    # Общие слова в именах дешевых лент ("LEDBLE-...") - слабый признак, любой другой его перевешивает.
+    # Такие ленты всегда получали кадры 0x7E, поэтому это ELK-BLEDOM, а не Generic
+    Fingerprint("ELK-BLEDOM", names=("ble", "led"), weight=0.5),
+]
+
+
+def normalize_uuid(uuid: str) -> str:
+    """Полная форма UUID: 16- и 32-битные дополняются базовым UUID Bluetooth"""
+    uuid = uuid.lower()
+    if len(uuid) == 4:
+        return f"0000{uuid}-0000-1000-8000-00805f9b34fb"
+    if len(uuid) == 8:
+        return f"{uuid}-0000-1000-8000-00805f9b34fb"
+    return uuid
+
+
+class ProtocolMatcher:
     """
-    Автоматическое определение протокола по имени устройства
+    Индексированный поиск протокола по рекламному пакету без подключения
+    
+    Правила компилируются один раз: подстроки имен - в одно регулярное выражение,
+    UUID сервисов, Company ID и OUI - в словари. Каждый признак добавляет протоколу
+    очки (SCORES * weight правила), побеждает наибольший счет, так что UUID сервиса
+    перевешивает случайное "led" в имени. Результат classify() кэшируется по адресу,
+    пока устройство рекламирует то же самое.
     
     Args:
-        device_name: Имя Bluetooth устройства
+        fingerprints: Правила (по умолчанию FINGERPRINTS)
+        cache_size: Сколько адресов помнить
+    """
+    
+    SCORES = {"service": 8.0, "manufacturer": 4.0, "oui": 2.0, "name": 1.0}
+    
+    def __init__(self, fingerprints: Optional[Iterable[Fingerprint]] = None, cache_size: int = 4096):
+        self.fingerprints = list(FINGERPRINTS if fingerprints is None else fingerprints)
+        self.cache_size = cache_size
+        self._cache: Dict[str, Tuple[tuple, Optional[str]]] = {}
+        self._compile()
+    
+    def _compile(self):
+        self._names: Dict[str, list] = {}
+        self._services: Dict[str, list] = {}
+        self._manufacturers: Dict[int, list] = {}
+        self._ouis: Dict[str, list] = {}
+        self._order: Dict[str, int] = {}
+        for index, rule in enumerate(self.fingerprints):
+            self._order.setdefault(rule.protocol, index)
+            for name in rule.names:
+                self._names.setdefault(name.lower(), []).append((rule.protocol, self.SCORES["name"] * rule.weight))
+            for uuid in rule.service_uuids:
+                self._services.setdefault(normalize_uuid(uuid), []).append(
+                    (rule.protocol, self.SCORES["service"] * rule.weight))
+            for company in rule.manufacturer_ids:
+                self._manufacturers.setdefault(company, []).append(
+                    (rule.protocol, self.SCORES["manufacturer"] * rule.weight))
+            for oui in rule.ouis:
+                self._ouis.setdefault(oui.upper()[:8], []).append((rule.protocol, self.SCORES["oui"] * rule.weight))
+        # Длинные подстроки раньше коротких: "bledom" не съедается "ble"
+        keywords = sorted(self._names, key=len, reverse=True)
+        self._name_regex = re.compile("|".join(map(re.escape, keywords))) if keywords else None
+        self._cache.clear()
+    
+    def add(self, fingerprint: Fingerprint):
+        """Добавить правило (например, для протокола, зарегистрированного через PROTOCOLS.register)"""
+        self.fingerprints.append(fingerprint)
+        self._compile()
+    
+    def match(self, name: str = "", address: str = "", service_uuids: Iterable[str] = (),
+              manufacturer_ids: Iterable[int] = ()) -> Optional[str]:
+        """
+        Протокол по признакам рекламного пакета
+        
+        Returns:
+            Имя протокола в PROTOCOLS или None, если ни один признак не совпал
+        """
+        scores: Dict[str, float] = {}
+        
+        def add(hits):
+            for protocol, score in hits:
+                scores[protocol] = scores.get(protocol, 0.0) + score
+        
+        if name and self._name_regex is not None:
+            for keyword in {m.group() for m in self._name_regex.finditer(name.lower())}:
+                add(self._names[keyword])
+        for uuid in service_uuids:
+            add(self._services.get(normalize_uuid(uuid), ()))
+        for company in manufacturer_ids:
+            add(self._manufacturers.get(company, ()))
+        if address:
+            add(self._ouis.get(address[:8].upper(), ()))
+        
+        if not scores:
+            return None
+        return max(scores, key=lambda protocol: (scores[protocol], -self._order[protocol]))
+    
+    def classify(self, address: str, name: str = "", service_uuids: Sequence[str] = (),
+                 manufacturer_data: Optional[Dict[int, bytes]] = None) -> Optional[str]:
+        """match() с кэшем по адресу: повторный рекламный пакет - один поиск в словаре"""
+        manufacturer_ids = tuple(manufacturer_data or ())
+        signature = (name, tuple(service_uuids), manufacturer_ids)
+        cached = self._cache.get(address)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        
+        protocol = self.match(name, address, service_uuids, manufacturer_ids)
+        if len(self._cache) >= self.cache_size:
+            # Самый старый адрес (dict хранит порядок вставки)
+            del self._cache[next(iter(self._cache))]
+        self._cache[address] = (signature, protocol)
+        return protocol
+    
+    def cached(self, address: str) -> Optional[str]:
+        """Протокол, определенный для адреса при сканировании (None - не определен)"""
+        cached = self._cache.get(address)
+        return cached[1] if cached is not None else None
+
+
+PROTOCOL_MATCHER = ProtocolMatcher()
+
+
+def detect_protocol(device_name: str = "", address: str = "", service_uuids: Sequence[str] = (),
+                    manufacturer_data: Optional[Dict[int, bytes]] = None,
+                    default: Optional[LEDProtocol] = None) -> LEDProtocol:
+    """
+    Определение протокола по рекламному пакету (имя, UUID сервисов, manufacturer data, OUI)
     
     Returns:
-        Подходящий протокол или Generic по умолчанию
+        Подходящий протокол, default или Generic по умолчанию
     """
-    device_name = device_name.lower()
+    if address:
+        name = PROTOCOL_MATCHER.classify(address, device_name, service_uuids, manufacturer_data)
+    else:
+        name = PROTOCOL_MATCHER.match(device_name, service_uuids=service_uuids,
+                                      manufacturer_ids=tuple(manufacturer_data or ()))
+    if name in PROTOCOLS:
+        return PROTOCOLS[name]
+    return default if default is not None else PROTOCOLS["Generic"]
+
+
+def detect_protocol_by_name(device_name: str, default: Optional[LEDProtocol] = None) -> LEDProtocol:
+    """
+    Автоматическое определение протокола по имени устройства
     
-    # Govee
-    if any(keyword in device_name for keyword in ['govee', 'h6', 'igovi']):
-        return PROTOCOLS["Govee"]
+    Args:
+        device_name: Имя Bluetooth устройства
+        default: Протокол для нераспознанных имен
     
-    # Magic Home
-    if any(keyword in device_name for keyword in ['magic', 'flux', 'hue']):
-        return PROTOCOLS["Magic Home"]
+    Returns:
+        Подходящий протокол, default или Generic по умолчанию
+    """
+    return detect_protocol(device_name, default=default)
+
+
+# --- Протоколы из файла ---
+
+PROTOCOLS_PATH = os.path.join(os.path.expanduser("~"), ".led_controller", "protocols.json")
+
+
+def _number(value) -> int:
+    return int(value, 0) if isinstance(value, str) else int(value)
+
+
+def _fingerprint_from_dict(key: str, data: dict) -> Fingerprint:
+    if not isinstance(data, dict):
+        raise ValueError("fingerprint должен быть объектом")
+    return Fingerprint(
+        key,
+        names=tuple(str(name) for name in data.get("names", ())),
+        service_uuids=tuple(str(uuid) for uuid in data.get("service_uuids", ())),
+        manufacturer_ids=tuple(_number(company) for company in data.get("manufacturer_ids", ())),
+        ouis=tuple(str(oui) for oui in data.get("ouis", ())),
+    )
+
+
+def load_protocols(path: str) -> List[str]:
+    """
+    Добавить протоколы из JSON-файла в PROTOCOLS
     
-    # Yeelight
-    if any(keyword in device_name for keyword in ['yeelight', 'yee']):
-        return PROTOCOLS["Yeelight"]
+    Файл - список описаний в формате BUILTIN_SPECS (или {"protocols": [...]}).
+    Необязательные ключи: "key" - имя в реестре (по умолчанию name) и
+    "fingerprint" - признаки для определения по рекламному пакету
+    ({"names": [...], "service_uuids": [...], "manufacturer_ids": [...], "ouis": [...]}).
+    Описания компилируются и проверяются все до регистрации: ошибка в файле видна
+    при загрузке, и реестр при этом не меняется.
     
-    # Triones
-    if any(keyword in device_name for keyword in ['triones', 'happy', 'idual']):
-        return PROTOCOLS["Triones"]
+    Returns:
+        Ключи добавленных протоколов
     
-    # Zengge
-    if any(keyword in device_name for keyword in ['zengge', 'lednet']):
-        return PROTOCOLS["Zengge"]
+    Raises:
+        OSError: Файл не читается
+        ValueError: Файл не JSON или описание некорректно
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        specs = json.load(f)
+    if isinstance(specs, dict):
+        specs = specs.get("protocols")
+    if not isinstance(specs, list):
+        raise ValueError("ожидается список описаний протоколов")
+    
+    parsed = []
+    for number, data in enumerate(specs, 1):
+        try:
+            if not isinstance(data, dict):
+                raise ValueError(f"ожидается объект, задано {data!r}")
+            protocol = protocol_from_dict(data)
+            key = str(data.get("key", protocol.name))
+            fingerprint = data.get("fingerprint")
+            parsed.append((key, protocol, _fingerprint_from_dict(key, fingerprint) if fingerprint else None))
+        except Exception as e:
+            raise ValueError(f"протокол #{number}: {e}") from e
+    
+    for key, protocol, fingerprint in parsed:
+        PROTOCOLS.register(key, lambda protocol=protocol: protocol)
+        if fingerprint is not None:
+            PROTOCOL_MATCHER.add(fingerprint)
+    return [key for key, _, _ in parsed]
+
+
+def load_user_protocols(path: str = PROTOCOLS_PATH) -> List[str]:
+    """
+    Свои протоколы и варианты прошивок из PROTOCOLS_PATH
     
-    # ELK-BLEDOM и другие популярные китайские ленты
-    if any(keyword in device_name for keyword in ['elk', 'bledom', 'ble', 'led']):
-        return PROTOCOLS["Generic"]
+    Вызывается точками входа (GUI, CLI, сервис), а не при импорте: импорт модуля
+    не читает домашнюю папку. Ошибка в файле не мешает запуску - печатается
+    сообщение, встроенные протоколы работают.
     
-    # По умолчанию
-    return GenericProtocol()
+    Returns:
+        Ключи добавленных протоколов
+    """
+    if not os.path.exists(path):
+        return []
+    try:
+        return load_protocols(path)
+    except Exception as e:
+        print(f"Не удалось загрузить протоколы из {path}: {e}")
+        return []
 
 
 # Примеры использования:
@@ -263,6 +933,8 @@ color_data = protocol.color_command(255, 0, 0)  # Красный цвет
 
 # Автоматическое определение
 protocol = detect_protocol_by_name("ELK-BLEDOM")
+protocol = detect_protocol("LEDBLE-1234", "BE:FF:20:00:11:22", ["0000fff0-0000-1000-8000-00805f9b34fb"])
+print(protocol.profile.max_write_rate)  # Сколько команд в секунду выдерживает лента
 color_data = protocol.color_command(0, 255, 0)  # Зеленый цвет
 
 # Список всех протоколов
@@ -0,0 +1,260 @@
+"""
+Очередь исходящих команд для LED ленты
+Схлопывает однотипные команды (цвет, яркость, питание): на ленту уходит
+только последнее значение каждого вида,
+а FlowController подбирает темп записей под возможности конкретной ленты
+"""
+
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+class _PendingCommand:
+    """Ожидающая отправки команда и все, кто ждет ее результата"""
+
+    __slots__ = ("data", "waiters", "submitted_at")
+
+    def __init__(self, data: bytearray, waiter: asyncio.Future, submitted_at: float):
+        self.data = data
+        self.waiters: List[asyncio.Future] = [waiter]
+        self.submitted_at = submitted_at
+
+
+class CommandQueue:
+    """
+    Очередь команд одного устройства по принципу latest-wins
+
+    Команды одного вида (kind) не накапливаются: новая команда заменяет
+    ожидающую, а ожидающие ее вызовы получат результат новой записи.
+    Одновременно выполняется не больше max_in_flight записей, в очереди
+    хранится не больше max_pending видов команд - самая старая вытесняется.
+    Записи разносятся во времени не чаще max_rate в секунду: пока очередь
+    ждет своего окна, новые значения продолжают схлопываться.
+    На время обрыва связи очередь ставится на паузу: команды продолжают
+    схлопываться и уходят после resume().
+    """
+
+    def __init__(self,
+                 writer: Callable[[bytearray], Awaitable[bool]],
+                 max_in_flight: int = 1,
+                 max_pending: int = 8,
+                 max_rate: Optional[float] = None):
+        self._writer = writer
+        self.max_in_flight = max_in_flight
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[str, _PendingCommand]" = OrderedDict()
+        self._in_flight = 0
+        self._paused = False
+        self.min_interval = 0.0
+        self._next_write_at = 0.0
+        self.set_rate(max_rate)
+        # Гистограмма времени ожидания в очереди (см. led_metrics.DeviceMetrics.attach_queue)
+        self.wait_histogram = None
+
+        # Счетчики
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    @property
+    def depth(self) -> int:
+        """Количество ожидающих команд"""
+        return len(self._pending)
+
+    @property
+    def in_flight(self) -> int:
+        """Количество выполняющихся записей"""
+        return self._in_flight
+
+    @property
+    def paused(self) -> bool:
+        """Очередь копит команды, но не отправляет их"""
+        return self._paused
+
+    def submit(self, kind: str, data: bytearray) -> asyncio.Future:
+        """
+        Поставить команду в очередь
+
+        Возвращает future с результатом записи (True/False).
+        Должен вызываться из потока event loop'а.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+
+        pending = self._pending.get(kind)
+        if pending is not None:
+            # Заменяем ожидающую команду новым значением
+            pending.data = data
+            pending.waiters.append(waiter)
+            self.coalesced += 1
+        else:
+            if len(self._pending) >= self.max_pending:
+                _, oldest = self._pending.popitem(last=False)
+                self._resolve(oldest, False)
+                self.dropped += 1
+            self._pending[kind] = _PendingCommand(data, waiter, loop.time())
+
+        self._kick(loop)
+        return waiter
+
+    def ready_in(self) -> float:
+        """Через сколько секунд откроется окно темпа для следующей записи (из потока event loop'а)"""
+        return max(0.0, self._next_write_at - asyncio.get_running_loop().time())
+
+    def pause(self):
+        """Остановить отправку; уже выполняющаяся запись завершается"""
+        self._paused = True
+
+    def resume(self):
+        """Продолжить отправку накопленных команд (из потока event loop'а)"""
+        self._paused = False
+        if self._pending:
+            self._kick(asyncio.get_running_loop())
+
+    def _kick(self, loop: asyncio.AbstractEventLoop):
+        """Запустить отправку, если есть свободный слот"""
+        if not self._paused and self._in_flight < self.max_in_flight:
+            self._in_flight += 1
+            loop.create_task(self._drain())
+
+    def set_rate(self, max_rate: Optional[float]):
+        """Ограничить частоту записей (None или 0 - без ограничения)"""
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+
+    def clear(self):
+        """Сбросить все ожидающие команды (например, при отключении)"""
+        while self._pending:
+            _, pending = self._pending.popitem(last=False)
+            self._resolve(pending, False)
+            self.dropped += 1
+
+    def stats(self) -> dict:
+        """Счетчики очереди"""
+        return {
+            "depth": self.depth,
+            "in_flight": self._in_flight,
+            "rate": round(1.0 / self.min_interval, 2) if self.min_interval else None,
+            "paused": self._paused,
+            "sent": self.sent,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
+
+    async def _drain(self):
+        """Отправка команд, пока очередь не опустеет"""
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending and not self._paused:
+                delay = self._next_write_at - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+
+                _, pending = self._pending.popitem(last=False)
+                now = loop.time()
+                self._next_write_at = now + self.min_interval
+                if self.wait_histogram is not None:
+                    self.wait_histogram.record(now - pending.submitted_at)
+                try:
+                    success = await self._writer(pending.data)
+                except Exception as e:
+                    print(f"Ошибка отправки команды: {e}")
+                    success = False
+
+                if success:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+                self._resolve(pending, success)
+        finally:
+            self._in_flight -= 1
+
+    @staticmethod
+    def _resolve(pending: _PendingCommand, result: bool):
+        for waiter in pending.waiters:
+            if not waiter.done():
+                waiter.set_result(result)
+
+
+class FlowController:
+    """
+    Адаптивный темп записей для одного устройства (AIMD)
+
+    Записи без подтверждения не дают обратной связи: дешевые контроллеры
+    молча теряют кадры, когда их буфер переполнен. Поэтому каждая
+    probe_every-я запись отправляется с подтверждением, и по времени ответа
+    (RTT) видно, успевает ли лента разбирать буфер. Пока RTT близок к
+    минимальному, темп растет на increase кадров/с; если RTT вырос больше
+    чем в rtt_factor раз или подтверждения нет - темп умножается на decrease.
+    """
+
+    def __init__(self,
+                 initial_rate: float,
+                 min_rate: float = 2.0,
+                 max_rate: float = 60.0,
+                 probe_every: int = 10,
+                 increase: float = 2.0,
+                 decrease: float = 0.7,
+                 rtt_factor: float = 2.0,
+                 rtt_margin: float = 0.005):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = max(min_rate, min(max_rate, initial_rate))
+        self.probe_every = probe_every
+        self.increase = increase
+        self.decrease = decrease
+        self.rtt_factor = rtt_factor
+        # Абсолютный запас к порогу: на быстром канале доли миллисекунды - не перегрузка
+        self.rtt_margin = rtt_margin
+        self.base_rtt: Optional[float] = None
+        self.last_rtt: Optional[float] = None
+        # Первая запись подтверждается: буфер ленты еще пуст, и ее RTT - честный базовый
+        self._writes = probe_every - 1
+
+        # Счетчики
+        self.probes = 0
+        self.increases = 0
+        self.decreases = 0
+
+    def should_probe(self) -> bool:
+        """Отправить ли очередную запись с подтверждением"""
+        self._writes += 1
+        return self._writes % self.probe_every == 0
+
+    def on_probe(self, rtt: Optional[float]) -> float:
+        """
+        Результат подтвержденной записи
+
+        Args:
+            rtt: Время до подтверждения в секундах; None - подтверждения нет
+
+        Returns:
+            Новый темп, записей в секунду
+        """
+        self.probes += 1
+        self.last_rtt = rtt
+        if rtt is not None:
+            # Базовый RTT медленно "забывается", чтобы пережить смену условий в эфире
+            self.base_rtt = rtt if self.base_rtt is None else min(rtt, self.base_rtt * 1.01)
+
+        if rtt is None or rtt > self.base_rtt * self.rtt_factor + self.rtt_margin:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.decreases += 1
+        else:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            self.increases += 1
+        return self.rate
+
+    def stats(self) -> Dict[str, float]:
+        """Текущий темп и счетчики"""
+        return {
+            "rate": round(self.rate, 2),
+            "base_rtt_ms": round(self.base_rtt * 1000, 3) if self.base_rtt is not None else None,
+            "last_rtt_ms": round(self.last_rtt * 1000, 3) if self.last_rtt is not None else None,
+            "probes": self.probes,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
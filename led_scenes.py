@@ -0,0 +1,190 @@
+"""
+Сцены: синхронное изменение группы лент к заданному моменту
+
+Записи на разные ленты уходят по отдельным соединениям с разной
+задержкой, поэтому "одновременная" команда группе видна как волна.
+SceneScheduler отправляет команду каждой ленте заранее - на величину
+измеренной задержки ее канала (p50 из метрик), так что все ленты
+переключаются в пределах нескольких миллисекунд от целевого момента.
+
+    scenes = SceneScheduler(pool)
+    await scenes.set_color("kitchen", 255, 0, 0, at=time.time() + 1)
+    scenes.start_effect(engine, "kitchen", EFFECTS["rainbow"], period=4)
+"""
+
+import asyncio
+import functools
+import time
+from typing import Awaitable, Callable, Dict, Iterable, NamedTuple, Optional, Union
+
+from led_controller import LEDController
+from led_pool import DevicePool
+
+
+class SceneResult(NamedTuple):
+    """Результат сцены для одного устройства"""
+    address: str
+    success: bool
+    lead: float  # на сколько секунд раньше целевого момента ушла команда
+    error: Optional[str] = None
+
+
+Action = Callable[[LEDController], Awaitable]
+
+
+class SceneScheduler:
+    """
+    Планировщик групповых изменений с компенсацией задержки
+
+    Args:
+        pool: Пул подключений
+        default_latency: Задержка для устройств, по которым еще нет измерений, секунды
+        percentile: Какой перцентиль задержки записи брать за оценку (0..1)
+        margin: Запас к самой большой задержке, если момент не задан, секунды
+    """
+
+    def __init__(self, pool: DevicePool, default_latency: float = 0.02,
+                 percentile: float = 0.5, margin: float = 0.05):
+        self.pool = pool
+        self.default_latency = default_latency
+        self.percentile = percentile
+        self.margin = margin
+
+    def latency(self, controller: LEDController) -> float:
+        """Оценка задержки от записи до применения кадра лентой, секунды"""
+        histogram = controller.metrics.write_latency
+        if not histogram.count:
+            return self.default_latency
+        latency = histogram.percentile(self.percentile)
+        if controller.protocol.profile.write_with_response:
+            # Запись с подтверждением длится туда и обратно, кадр применяется на полпути
+            latency /= 2
+        return latency
+
+    def effect_lead(self, controller: LEDController) -> float:
+        """Поправка для кадров эффекта: задержка канала плюс типичное ожидание в очереди"""
+        return self.latency(controller) + controller.metrics.queue_wait.percentile(self.percentile)
+
+    def _loop_time(self, at: Optional[float], leads: Iterable[float]) -> float:
+        """Целевой момент по loop.time(); at - по time.time()"""
+        loop = asyncio.get_running_loop()
+        if at is None:
+            return loop.time() + max(leads, default=0.0) + self.margin
+        return loop.time() + (at - time.time())
+
+    # --- Однократные изменения ---
+
+    async def apply(self, actions: Dict[str, Action], at: Optional[float] = None) -> Dict[str, SceneResult]:
+        """
+        Выполнить действия так, чтобы ленты применили их одновременно
+
+        Args:
+            actions: Адрес -> действие над контроллером (например, lambda c: c.send_color(...))
+            at: Целевой момент по time.time(); None - как можно раньше для всей группы
+
+        Returns:
+            Результат для каждого адреса
+        """
+        loop = asyncio.get_running_loop()
+        results: Dict[str, SceneResult] = {}
+        scheduled = []
+
+        leads = {}
+        for address in actions:
+            controller = self.pool.controllers.get(address)
+            if controller is None:
+                results[address] = SceneResult(address, False, 0.0, "устройство не в пуле")
+                continue
+            # Окно темпа очереди тоже задерживает запись
+            leads[address] = self.latency(controller) + controller.queue.ready_in()
+
+        target = self._loop_time(at, leads.values())
+        for address, lead in leads.items():
+            done = loop.create_future()
+            loop.call_at(target - lead, self._dispatch, self.pool.controllers[address],
+                         actions[address], done)
+            scheduled.append((address, lead, done))
+
+        # Как в DevicePool: зависшая лента (очередь на паузе, запись без ответа) не держит остальные
+        for address, lead, done in scheduled:
+            try:
+                success = bool(await asyncio.wait_for(done, (target - loop.time()) + self.pool.command_timeout))
+                error = None if success else "запись не прошла"
+            except asyncio.TimeoutError:
+                success, error = False, "таймаут"
+            except Exception as e:
+                success, error = False, str(e)
+            results[address] = SceneResult(address, success, lead, error)
+        return results
+
+    @staticmethod
+    def _dispatch(controller: LEDController, action: Action, done: asyncio.Future):
+        if done.done():
+            return
+        task = asyncio.ensure_future(action(controller))
+        # Таймаут отменяет done - отменяем и саму запись
+        done.add_done_callback(lambda d: task.cancel() if d.cancelled() else None)
+
+        def on_done(f):
+            if done.done():
+                return
+            if f.cancelled():
+                done.set_result(False)
+            elif f.exception() is not None:
+                done.set_exception(f.exception())
+            else:
+                done.set_result(f.result())
+
+        task.add_done_callback(on_done)
+
+    def _same_action(self, target, action: Action) -> Dict[str, Action]:
+        return {address: action for address in self.pool.resolve(target)}
+
+    async def set_color(self, target, r: int, g: int, b: int,
+                        at: Optional[float] = None) -> Dict[str, SceneResult]:
+        """Одновременная смена цвета группы"""
+        return await self.apply(self._same_action(target, lambda c: c.post_color(r, g, b)), at)
+
+    async def set_colors(self, colors: Dict[str, tuple], at: Optional[float] = None) -> Dict[str, SceneResult]:
+        """Сцена с разными цветами: адрес -> (r, g, b)"""
+        return await self.apply({address: (lambda c, color=color: c.post_color(*color))
+                                 for address, color in colors.items()}, at)
+
+    async def set_brightness(self, target, brightness: int,
+                             at: Optional[float] = None) -> Dict[str, SceneResult]:
+        """Одновременная смена яркости группы"""
+        return await self.apply(self._same_action(target, lambda c: c.set_brightness(brightness)), at)
+
+    async def power(self, target, on: bool, at: Optional[float] = None) -> Dict[str, SceneResult]:
+        """Одновременное включение/выключение группы"""
+        return await self.apply(self._same_action(target, lambda c: c.power_on() if on else c.power_off()), at)
+
+    # --- Эффекты ---
+
+    def start_effect(self, engine, target: Union[str, Iterable[str], None],
+                     factory: Callable, at: Optional[float] = None, **params) -> Dict[str, float]:
+        """
+        Запустить эффект на группе с общим началом
+
+        Каждая лента получает свой генератор; кадры для нее считаются вперед на
+        задержку ее канала и очереди (оценка обновляется по ходу эффекта),
+        поэтому все ленты показывают один момент эффекта.
+        Должен вызываться из потока event loop'а.
+
+        Args:
+            engine: EffectEngine из led_effects
+            factory: Функция эффекта, например EFFECTS["rainbow"]
+            at: Момент начала по time.time(); None - как можно раньше для всей группы
+            params: Параметры эффекта
+
+        Returns:
+            Адрес -> поправка на задержку в момент запуска, секунды
+        """
+        controllers = {address: self.pool.controllers[address]
+                       for address in self.pool.resolve(target) if address in self.pool.controllers}
+        leads = {address: self.effect_lead(controller) for address, controller in controllers.items()}
+        started_at = self._loop_time(at, leads.values())
+        for controller in controllers.values():
+            engine.start(controller, factory(**params), started_at=started_at,
+                         lead=functools.partial(self.effect_lead, controller))
+        return leads
@@ -0,0 +1,394 @@
+"""
+Световые шоу: компактный бинарный формат, запись и воспроизведение
+
+Формат файла (little-endian, все части выровнены на 8 байт):
+
+    заголовок (32 байта)   magic "LEDS", версия, размер записи, число устройств,
+                           число кадров, смещение кадров
+    таблица устройств      max_devices записей по 96 байт: адрес, протокол, имя
+    кадры                  записи фиксированного размера, по времени:
+                           Q время от начала (мкс), H номер устройства,
+                           B вид команды, B длина, далее готовый кадр протокола
+
+Кадры хранятся уже закодированными, поэтому плеер не кодирует и не разбирает
+ничего на ходу: файл отображается в память (mmap), поля читаются через
+memoryview.cast по смещениям, кадр передается в очередь срезом memoryview
+без копирования. Память не растет с длиной шоу - страницы файла подгружает ОС.
+
+    python led_show.py info show.leds
+    python led_show.py play show.leds --speed 1.0
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from led_protocols import PROTOCOLS, load_user_protocols
+
+
+MAGIC = b"LEDS"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHHIQQ4x")    # magic, версия, размер записи, устройств, кадров, смещение кадров
+DEVICE = struct.Struct("<24s24s48s")     # адрес, протокол, имя
+RECORD = struct.Struct("<QHBB")          # время (мкс), устройство, вид, длина; далее кадр
+
+# Виды команд: очередь контроллера схлопывает кадры только внутри одного вида
+KINDS = ("color", "brightness", "power", "raw")
+_KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+# Самый длинный кадр среди встроенных протоколов - 20 байт (Govee)
+DEFAULT_PAYLOAD_SIZE = 20
+
+
+def _align8(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def _text(raw: bytes) -> str:
+    return raw.rstrip(b"\0").decode("utf-8", "replace")
+
+
+class ShowDevice(NamedTuple):
+    """Устройство из таблицы шоу"""
+    address: str
+    protocol: str
+    name: str
+
+
+class ShowRecorder:
+    """
+    Запись шоу в файл
+
+    Кадры пишутся потоком в буферизованный файл, в памяти держится только
+    таблица устройств. Живую сессию записывает attach(controller): каждая
+    успешная запись контроллера попадает в шоу с отметкой времени.
+
+    Args:
+        path: Файл шоу
+        max_devices: Сколько мест зарезервировать в таблице устройств
+        payload_size: Максимальная длина кадра протокола, байт
+    """
+
+    def __init__(self, path: str, max_devices: int = 64, payload_size: int = DEFAULT_PAYLOAD_SIZE):
+        if payload_size > 255:
+            raise ValueError("payload_size не больше 255 байт")
+        self.path = path
+        self.max_devices = max_devices
+        self.record_size = _align8(RECORD.size + payload_size)
+        self.payload_size = self.record_size - RECORD.size
+        self.data_offset = _align8(HEADER.size + max_devices * DEVICE.size)
+        self.devices: List[ShowDevice] = []
+        self._indices: Dict[str, int] = {}
+        self.frame_count = 0
+        # Кадры живой сессии, которые не удалось записать (нет места в таблице, длинный кадр)
+        self.skipped = 0
+        self._last_timestamp = 0
+        self._record = bytearray(self.record_size)
+        self._started: Optional[float] = None
+        self._attached = []
+
+        self._file = open(path, "wb")
+        self._file.write(bytes(self.data_offset))
+
+    def device_index(self, address: str, protocol: str = "", name: str = "") -> int:
+        """Номер устройства в таблице (добавляется при первом обращении)"""
+        address = address.upper()
+        index = self._indices.get(address)
+        if index is None:
+            if len(self.devices) >= self.max_devices:
+                raise ValueError(f"В таблице шоу нет места для {address} (max_devices={self.max_devices})")
+            index = self._indices[address] = len(self.devices)
+            self.devices.append(ShowDevice(address, protocol, name))
+        return index
+
+    def add_frame(self, address: str, timestamp: float, data, kind: str = "raw",
+                  protocol: str = "", name: str = ""):
+        """
+        Добавить кадр
+
+        Args:
+            address: Адрес устройства
+            timestamp: Секунды от начала шоу (не меньше, чем у предыдущего кадра)
+            data: Готовый кадр протокола
+            kind: "color", "brightness", "power" или "raw"
+        """
+        if len(data) > self.payload_size:
+            raise ValueError(f"Кадр {len(data)} байт длиннее места в записи ({self.payload_size})")
+        micros = int(round(timestamp * 1_000_000))
+        if micros < self._last_timestamp:
+            raise ValueError("Кадры шоу должны идти по времени")
+        self._last_timestamp = micros
+
+        record = self._record
+        RECORD.pack_into(record, 0, micros, self.device_index(address, protocol, name),
+                         _KIND_CODES.get(kind, _KIND_CODES["raw"]), len(data))
+        record[RECORD.size:RECORD.size + len(data)] = data
+        # Хвост записи от прошлого, более длинного кадра обнуляем
+        record[RECORD.size + len(data):] = bytes(self.payload_size - len(data))
+        self._file.write(record)
+        self.frame_count += 1
+
+    # --- Запись живой сессии ---
+
+    def attach(self, controller):
+        """Записывать все успешные записи контроллера"""
+        if self._started is None:
+            self._started = time.perf_counter()
+        controller.write_listeners.append(self._on_write)
+        self._attached.append(controller)
+
+    def detach(self, controller):
+        """Перестать записывать контроллер"""
+        if self._on_write in controller.write_listeners:
+            controller.write_listeners.remove(self._on_write)
+        if controller in self._attached:
+            self._attached.remove(controller)
+
+    def _on_write(self, controller, data):
+        # Вызывается из пути отправки контроллера: кадр, который нельзя записать, пропускается
+        decoded = controller.protocol.decode(data)
+        try:
+            self.add_frame(controller.device_address, time.perf_counter() - self._started, data,
+                           decoded[0] if decoded else "raw", PROTOCOLS.key_of(controller.protocol),
+                           controller.device_name)
+        except ValueError as e:
+            if not self.skipped:
+                print(f"Шоу {self.path}: кадр пропущен ({e})")
+            self.skipped += 1
+
+    # --- Завершение ---
+
+    def close(self):
+        """Дописать таблицу устройств и заголовок"""
+        if self._file.closed:
+            return
+        for controller in list(self._attached):
+            self.detach(controller)
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, self.record_size, len(self.devices),
+                                     self.frame_count, self.data_offset))
+        for device in self.devices:
+            # struct обрезает слишком длинные строки по размеру поля
+            self._file.write(DEVICE.pack(device.address.encode("utf-8"), device.protocol.encode("utf-8"),
+                                         device.name.encode("utf-8")))
+        self._file.close()
+        if self.skipped:
+            print(f"Шоу {self.path}: пропущено кадров - {self.skipped}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ShowPlayer:
+    """
+    Воспроизведение шоу из файла через mmap
+
+    Заголовок и таблица устройств разбираются один раз при открытии;
+    кадры читаются прямо из отображенного файла.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, record_size, device_count, frame_count, data_offset = \
+                HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path}: не файл шоу или неподдерживаемая версия")
+            if record_size % 8 or data_offset + frame_count * record_size > len(self._mmap):
+                raise ValueError(f"{path}: файл шоу поврежден")
+        except (struct.error, ValueError):
+            self.close()
+            raise
+
+        self.record_size = record_size
+        self.frame_count = frame_count
+        self.devices = [ShowDevice(*(_text(raw) for raw in DEVICE.unpack_from(self._mmap, HEADER.size + i * DEVICE.size)))
+                        for i in range(device_count)]
+
+        self._records = memoryview(self._mmap)[data_offset:data_offset + frame_count * record_size]
+        # Поля записей по индексам: время - каждое record_size/8-е слово Q,
+        # устройство - record_size/2 * i + 4 в массиве H, вид и длина - байты 10 и 11
+        self._times = self._records.cast("Q")
+        self._shorts = self._records.cast("H")
+        self._time_stride = record_size // 8
+        self._short_stride = record_size // 2
+
+    @property
+    def duration(self) -> float:
+        """Длительность шоу в секундах"""
+        return self.timestamp(self.frame_count - 1) if self.frame_count else 0.0
+
+    def timestamp(self, index: int) -> float:
+        """Время кадра в секундах от начала"""
+        return self._times[index * self._time_stride] / 1_000_000
+
+    def frame(self, index: int):
+        """Кадр: (время в секундах, номер устройства, вид, кадр протокола как memoryview)"""
+        offset = index * self.record_size
+        length = self._records[offset + 11]
+        return (self._times[index * self._time_stride] / 1_000_000,
+                self._shorts[index * self._short_stride + 4],
+                KINDS[self._records[offset + 10]],
+                self._records[offset + RECORD.size:offset + RECORD.size + length])
+
+    def seek(self, seconds: float) -> int:
+        """Номер первого кадра не раньше seconds (двоичный поиск)"""
+        target = int(seconds * 1_000_000)
+        low, high = 0, self.frame_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._times[middle * self._time_stride] < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    async def play(self, controllers: Dict[str, object], start: float = 0.0, speed: float = 1.0,
+                   repeat: bool = False):
+        """
+        Воспроизвести шоу на контроллерах
+
+        Кадры ставятся в очереди контроллеров (с их темпом и схлопыванием):
+        если лента не успевает, до нее доходят последние кадры каждого вида.
+
+        Args:
+            controllers: Адрес -> LEDController; устройства без контроллера пропускаются
+            start: С какой секунды шоу начать
+            speed: Скорость воспроизведения
+            repeat: Повторять по кругу
+        """
+        queues = [controllers[device.address].queue if device.address in controllers else None
+                  for device in self.devices]
+        loop = asyncio.get_running_loop()
+        records = self._records
+        times = self._times
+        shorts = self._shorts
+        time_stride, short_stride, record_size = self._time_stride, self._short_stride, self.record_size
+        start_micros = int(start * 1_000_000)
+
+        while True:
+            index = self.seek(start)
+            origin = loop.time()
+            scale = 1.0 / (speed * 1_000_000)
+            while index < self.frame_count:
+                due = origin + (times[index * time_stride] - start_micros) * scale
+                delay = due - loop.time()
+                if delay > 0.001:
+                    await asyncio.sleep(delay)
+
+                queue = queues[shorts[index * short_stride + 4]]
+                if queue is not None:
+                    offset = index * record_size
+                    payload = offset + RECORD.size
+                    queue.submit(KINDS[records[offset + 10]], records[payload:payload + records[offset + 11]])
+                index += 1
+            if not repeat:
+                return
+            start, start_micros = 0.0, 0
+
+    def close(self):
+        """Закрыть файл"""
+        for view in ("_times", "_shorts", "_records"):
+            if hasattr(self, view):
+                getattr(self, view).release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Срезы кадров еще живут у контроллеров (последний кадр, очередь) -
+            # отображение освободится вместе с ними
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- Командная строка ---
+
+def show_info(path: str):
+    with ShowPlayer(path) as player:
+        print(f"{path}: {player.frame_count} кадров, {player.duration:.1f} с, "
+              f"запись {player.record_size} байт, {os.path.getsize(path)} байт на диске")
+        for index, device in enumerate(player.devices):
+            known = "" if device.protocol in PROTOCOLS else " (неизвестный протокол)"
+            print(f"  [{index}] {device.address}  {device.name or '-'}  {device.protocol or '-'}{known}")
+
+
+async def play_file(path: str, speed: float, start: float, repeat: bool, simulate: bool):
+    from led_pool import DevicePool
+
+    with ShowPlayer(path) as player:
+        transport = cache = None
+        if simulate:
+            from led_cache import DeviceCache
+            from led_transport import SimulatedDevice, SimulatedTransport
+            transport = SimulatedTransport([SimulatedDevice(device.address, name=device.name,
+                                                            protocol=device.protocol or "ELK-BLEDOM")
+                                            for device in player.devices])
+            # Симулированные устройства не должны попадать в настоящий кэш
+            cache = DeviceCache(os.path.join(tempfile.mkdtemp(prefix="led_show_"), "devices.json"))
+        pool = DevicePool(cache=cache, transport=transport)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = await pool.connect_many([(device.name, device.address) for device in player.devices])
+        for address, result in results.items():
+            print(f"{address}: {'подключено' if result.success else result.error}")
+
+        controllers = {address: pool.controllers[address] for address in pool.connected()}
+        for device in player.devices:
+            controller = controllers.get(device.address)
+            if controller is not None and device.protocol in PROTOCOLS:
+                # Кадры записаны этим протоколом - темп и режим записи берем из него же
+                controller.set_protocol(PROTOCOLS[device.protocol])
+        try:
+            await player.play(controllers, start=start, speed=speed, repeat=repeat)
+            # Дождаться отправки последних кадров
+            await asyncio.sleep(0.5)
+        finally:
+            await pool.disconnect_all()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LED Controller - световые шоу")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info = commands.add_parser("info", help="Описание файла шоу")
+    info.add_argument("path")
+    play = commands.add_parser("play", help="Воспроизвести шоу")
+    play.add_argument("path")
+    play.add_argument("--speed", type=float, default=1.0, help="Скорость воспроизведения")
+    play.add_argument("--start", type=float, default=0.0, help="С какой секунды начать")
+    play.add_argument("--repeat", action="store_true", help="Повторять по кругу")
+    play.add_argument("--simulate", action="store_true", help="Играть на симуляторе вместо лент")
+    args = parser.parse_args(argv)
+    load_user_protocols()
+
+    try:
+        if args.command == "info":
+            show_info(args.path)
+        else:
+            asyncio.run(play_file(args.path, args.speed, args.start, args.repeat, args.simulate))
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,808 @@
+"""
+Источники цвета из содержимого: изображения, видео, звук
+
+Анализ (уменьшение кадра и k-means, FFT на NumPy) слишком тяжел для потока
+event loop'а, который пишет в ленты, поэтому он идет в пуле процессов:
+
+- каждый источник - задача в ProcessPoolExecutor; воркер читает файл,
+  считает цвета и кладет кадры (время в медиа, цвета) в кольцевой буфер в
+  разделяемой памяти (FrameRing) - без pickle и каналов на каждый кадр;
+- на стороне loop'а ColorSource только читает кольцо: color_at(t) забирает
+  наступившие кадры и никогда не ждет - если анализ отстает, повторяется
+  последний цвет;
+- кольцо ограничено: опередивший воспроизведение воркер ждет, пока кадры
+  прочитают, поэтому память не растет с длиной файла. Пока источник играет,
+  он занимает один процесс пула.
+
+Источник играет через EffectEngine как обычный эффект:
+
+    sources = SourcePool()
+    source = sources.open("movie.mp4", colors=3)
+    await source.ready()
+    engine.start(controller, source.effect(channel=0))
+    ...
+    sources.close()   # обязательно: процессы и разделяемая память
+
+Форматы: WAV (модуль wave); изображения .npy и .ppm/.pgm без зависимостей,
+остальные - через Pillow; видео - через OpenCV; последовательность
+изображений - папка или шаблон glob ("frames/*.png").
+
+    python led_sources.py song.wav --fps 20 --frames 40
+"""
+
+import argparse
+import asyncio
+import atexit
+import glob
+import importlib
+import importlib.util
+import inspect
+import math
+import multiprocessing
+import os
+import re
+import struct
+import sys
+import time
+import wave
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from led_effects import BLACK, Color, Effect, effect
+
+# Кадр анализа: время от начала медиа (секунды) и цвета, массив (цветов, 3) uint8
+Frame = Tuple[float, np.ndarray]
+
+
+def _align8(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        # Памятью владеет создатель кольца: воркер не должен удалять ее при выходе
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+# --- Кольцевой буфер в разделяемой памяти ---
+
+class FrameRing:
+    """
+    Кольцо кадров в разделяемой памяти: один писатель, один читатель
+
+    Заголовок - счетчики записанных и прочитанных кадров, емкость, число
+    цветов в кадре и флаги "стоп" (ставит читатель), "конец" и "начат"
+    (ставит писатель). Каждая сторона меняет только свой счетчик, поэтому блокировки
+    не нужны: кадр записывается целиком до того, как счетчик его покажет.
+
+    Args:
+        capacity: Сколько кадров помещается в кольцо
+        width: Сколько цветов в кадре
+        name: Имя существующего кольца (подключиться) или None (создать)
+    """
+
+    HEADER = struct.Struct("<QQIHBBB5x")   # записано, прочитано, емкость, цветов, стоп, конец, начат
+    _STOP = 22
+    _DONE = 23
+    _STARTED = 24
+    _TIME = struct.Struct("<d")
+
+    def __init__(self, capacity: int = 256, width: int = 1, name: Optional[str] = None):
+        if name is None:
+            if capacity < 1 or not 1 <= width <= 255:
+                raise ValueError("Емкость кольца от 1 кадра, цветов в кадре от 1 до 255")
+            size = self.HEADER.size + capacity * _align8(8 + 3 * width)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.HEADER.pack_into(self.shm.buf, 0, 0, 0, capacity, width, 0, 0, 0)
+            self.owner = True
+        else:
+            self.shm = _attach(name)
+            capacity, width = self.HEADER.unpack_from(self.shm.buf, 0)[2:4]
+            self.owner = False
+
+        self.name = self.shm.name
+        self.capacity = capacity
+        self.width = width
+        self._slot = struct.Struct(f"<d{3 * width}s")   # время, цвета подряд (R, G, B, R, ...)
+        self.slot_size = _align8(self._slot.size)
+        self._counters = self.shm.buf[:16].cast("Q")
+
+    def _offset(self, index: int) -> int:
+        return self.HEADER.size + (index % self.capacity) * self.slot_size
+
+    @property
+    def pending(self) -> int:
+        """Записанные, но еще не прочитанные кадры"""
+        return self._counters[0] - self._counters[1]
+
+    @property
+    def stopped(self) -> bool:
+        return bool(self.shm.buf[self._STOP])
+
+    @property
+    def done(self) -> bool:
+        return bool(self.shm.buf[self._DONE])
+
+    @property
+    def started(self) -> bool:
+        """Писатель подключился к кольцу"""
+        return bool(self.shm.buf[self._STARTED])
+
+    # --- Писатель ---
+
+    def start(self):
+        """Писатель взялся за кольцо"""
+        self.shm.buf[self._STARTED] = 1
+
+    def put(self, timestamp: float, colors: bytes) -> bool:
+        """Записать кадр; False - кольцо заполнено"""
+        written = self._counters[0]
+        if written - self._counters[1] >= self.capacity:
+            return False
+        self._slot.pack_into(self.shm.buf, self._offset(written), timestamp, colors)
+        self._counters[0] = written + 1
+        return True
+
+    def push(self, timestamp: float, colors: bytes, poll: float = 0.005) -> bool:
+        """Записать кадр, дождавшись места; False - читатель попросил остановиться"""
+        while not self.stopped:
+            if self.put(timestamp, colors):
+                return True
+            time.sleep(poll)
+        return False
+
+    def finish(self):
+        """Кадров больше не будет"""
+        self.shm.buf[self._DONE] = 1
+
+    # --- Читатель ---
+
+    def pop(self) -> Optional[Tuple[float, bytes]]:
+        """Следующий кадр (время, цвета) или None"""
+        read = self._counters[1]
+        if read == self._counters[0]:
+            return None
+        frame = self._slot.unpack_from(self.shm.buf, self._offset(read))
+        self._counters[1] = read + 1
+        return frame
+
+    def take_until(self, timestamp: float) -> Optional[Tuple[int, bytes]]:
+        """
+        Прочитать все кадры не позже timestamp
+
+        Returns:
+            (сколько кадров прочитано, цвета последнего) или None, если таких нет
+        """
+        read, written = self._counters[1], self._counters[0]
+        start = read
+        while read < written and self._TIME.unpack_from(self.shm.buf, self._offset(read))[0] <= timestamp:
+            read += 1
+        if read == start:
+            return None
+        colors = self._slot.unpack_from(self.shm.buf, self._offset(read - 1))[1]
+        self._counters[1] = read
+        return read - start, colors
+
+    def stop(self):
+        """Попросить писателя остановиться"""
+        self.shm.buf[self._STOP] = 1
+
+    def close(self):
+        """Отключиться от кольца (создатель также удаляет его)"""
+        if self._counters is None:
+            return
+        self._counters.release()
+        self._counters = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+# --- Загрузка изображений ---
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".ppm", ".pgm", ".pnm", ".npy")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v")
+AUDIO_EXTENSIONS = (".wav",)
+
+# Форматы, которые читаются без Pillow
+_BUILTIN_IMAGES = (".ppm", ".pgm", ".pnm", ".npy")
+
+# Пакеты для необязательных форматов: модуль -> имя в pip
+_PACKAGES = {"PIL.Image": "pillow", "cv2": "opencv-python"}
+
+_NETPBM_TOKEN = re.compile(rb"(?:\s|#[^\n]*\n)*(\S+)")
+
+
+def _optional(module: str):
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise ValueError(f"Для этого формата нужен пакет {_PACKAGES[module]} "
+                         f"(pip install {_PACKAGES[module]})") from None
+
+
+def _rgb(image: np.ndarray) -> np.ndarray:
+    """Привести изображение к форме (высота, ширина, 3) uint8"""
+    image = np.asarray(image)
+    if image.ndim == 2:
+        image = image[..., None]
+    if image.ndim != 3:
+        raise ValueError(f"Ожидалось изображение, получен массив формы {image.shape}")
+    if image.shape[2] == 1:
+        image = np.repeat(image, 3, axis=2)
+    image = image[..., :3]
+    if image.dtype.kind == "f":
+        # Вещественные значения 0..1 или 0..255
+        image = image * 255 if image.max(initial=0.0) <= 1.0 else image
+        return np.clip(np.rint(image), 0, 255).astype(np.uint8)
+    if image.dtype != np.uint8:
+        return np.clip(image, 0, 255).astype(np.uint8)
+    return image
+
+
+def _read_netpbm(path: str) -> np.ndarray:
+    """Двоичные PPM (P6) и PGM (P5)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    tokens, position = [], 0
+    while len(tokens) < 4:
+        match = _NETPBM_TOKEN.match(data, position)
+        if match is None:
+            raise ValueError(f"{path}: некорректный заголовок PNM")
+        tokens.append(match.group(1))
+        position = match.end()
+    magic, width, height, maximum = tokens[0], int(tokens[1]), int(tokens[2]), int(tokens[3])
+    if magic not in (b"P5", b"P6") or not 0 < maximum < 65536:
+        raise ValueError(f"{path}: поддерживаются только двоичные PPM (P6) и PGM (P5)")
+
+    channels = 3 if magic == b"P6" else 1
+    dtype = np.uint8 if maximum < 256 else np.dtype(">u2")
+    # После максимума ровно один пробельный символ, дальше - пиксели
+    pixels = np.frombuffer(data, dtype, count=width * height * channels, offset=position + 1)
+    pixels = pixels.reshape(height, width, channels)
+    if maximum != 255:
+        pixels = (pixels.astype(np.uint32) * 255 // maximum).astype(np.uint8)
+    return pixels
+
+
+def load_image(path: str) -> np.ndarray:
+    """Изображение как массив (высота, ширина, 3) uint8"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        return _rgb(np.load(path))
+    if extension in (".ppm", ".pgm", ".pnm"):
+        return _rgb(_read_netpbm(path))
+    image_module = _optional("PIL.Image")
+    with image_module.open(path) as image:
+        return _rgb(np.asarray(image.convert("RGB")))
+
+
+def _sequence_files(path: str) -> List[str]:
+    if os.path.isdir(path):
+        files = [os.path.join(path, name) for name in os.listdir(path)]
+    else:
+        files = glob.glob(path)
+    return sorted(f for f in files if f.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(f))
+
+
+# --- Анализ изображений ---
+
+def downsample(image: np.ndarray, max_pixels: int = 4096) -> np.ndarray:
+    """Прореживание изображения с шагом по сетке: не больше max_pixels точек, форма (N, 3) float32"""
+    height, width = image.shape[:2]
+    step = max(1, math.ceil(math.sqrt(height * width / max_pixels)))
+    return image[::step, ::step, :3].reshape(-1, 3).astype(np.float32)
+
+
+def kmeans(pixels: np.ndarray, k: int, iterations: int = 8,
+           init: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Кластеризация цветов k-means
+
+    Args:
+        pixels: Массив (N, 3)
+        k: Число кластеров
+        iterations: Максимум итераций
+        init: Начальные центры (k, 3), например с прошлого кадра видео -
+            тогда кластеры сохраняют порядок и сходятся за пару итераций
+
+    Returns:
+        (центры (k, 3) float32, размеры кластеров); без init центры
+        упорядочены по убыванию размера - первый цвет доминирующий
+    """
+    pixels = np.asarray(pixels, dtype=np.float32).reshape(-1, 3)
+    if init is None:
+        # Начальные центры - квантили по яркости: детерминированно и без пустых кластеров
+        order = np.argsort(pixels.sum(axis=1), kind="stable")
+        picks = ((np.arange(k) + 0.5) * len(pixels) / k).astype(np.intp)
+        centers = pixels[order[picks]]
+    else:
+        centers = np.array(init, dtype=np.float32).reshape(k, 3)
+
+    counts = np.zeros(k, dtype=np.intp)
+    for _ in range(iterations):
+        # |p - c|^2 = |p|^2 - 2 p.c + |c|^2, а |p|^2 одинаково для всех центров
+        distances = (centers * centers).sum(axis=1) - 2 * pixels @ centers.T
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.stack([np.bincount(labels, weights=pixels[:, channel], minlength=k)
+                         for channel in range(3)], axis=1)
+        filled = counts > 0
+        moved = centers.copy()
+        moved[filled] = sums[filled] / counts[filled, None]
+        shift = np.abs(moved - centers).max()
+        centers = moved
+        if shift < 0.5:
+            break
+
+    if init is None:
+        order = np.argsort(-counts, kind="stable")
+        centers, counts = centers[order], counts[order]
+    return centers, counts
+
+
+def _palettes(frames: Iterable[Tuple[float, np.ndarray]], colors: int, sample: int,
+              iterations: int, smoothing: float) -> Iterator[Frame]:
+    """Доминирующие цвета последовательности кадров со сглаживанием по времени"""
+    centers = smoothed = None
+    for timestamp, image in frames:
+        centers, _ = kmeans(downsample(image, sample), colors, iterations, init=centers)
+        smoothed = centers if smoothed is None else smoothed + (centers - smoothed) * (1.0 - smoothing)
+        yield timestamp, np.clip(np.rint(smoothed), 0, 255).astype(np.uint8)
+
+
+def analyze_image(path: str, fps: float = 30.0, colors: int = 1, sample: int = 4096,
+                  iterations: int = 12) -> Iterator[Frame]:
+    """Доминирующие цвета одного изображения (один кадр)"""
+    yield from _palettes([(0.0, load_image(path))], colors, sample, iterations, 0.0)
+
+
+def analyze_sequence(path: str, fps: float = 30.0, colors: int = 1, sample: int = 4096,
+                     iterations: int = 8, smoothing: float = 0.3) -> Iterator[Frame]:
+    """Последовательность изображений (папка или шаблон glob) по кадру на 1 / fps секунды"""
+    files = _sequence_files(path)
+    if not files:
+        raise ValueError(f"{path}: нет изображений")
+    frames = ((index / fps, load_image(file)) for index, file in enumerate(files))
+    yield from _palettes(frames, colors, sample, iterations, smoothing)
+
+
+def analyze_video(path: str, fps: float = 30.0, colors: int = 1, sample: int = 4096,
+                  iterations: int = 8, smoothing: float = 0.3) -> Iterator[Frame]:
+    """Кадры видео с частотой не выше fps; лишние кадры пропускаются без декодирования"""
+    cv2 = _optional("cv2")
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"{path}: не удалось открыть видео")
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or fps
+
+    def frames():
+        index, due = 0, 0.0
+        try:
+            while capture.grab():
+                timestamp = index / source_fps
+                index += 1
+                if timestamp < due:
+                    continue
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                while due <= timestamp:
+                    due += 1.0 / fps
+                yield timestamp, frame[..., ::-1]   # OpenCV отдает BGR
+        finally:
+            capture.release()
+
+    yield from _palettes(frames(), colors, sample, iterations, smoothing)
+
+
+# --- Анализ звука ---
+
+# Полосы частот, Гц: низкие -> R, средние -> G, высокие -> B
+AUDIO_BANDS = ((20.0, 250.0), (250.0, 2000.0), (2000.0, 8000.0))
+
+
+def _pcm(raw: bytes, sample_width: int, channels: int) -> np.ndarray:
+    """Отсчеты WAV как моно float32 в диапазоне -1..1"""
+    if sample_width == 1:
+        samples = (np.frombuffer(raw, np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(raw, "<i2").astype(np.float32) / 32768
+    elif sample_width == 3:
+        b = np.frombuffer(raw, np.uint8).reshape(-1, 3).astype(np.int32)
+        value = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        samples = (np.where(value >= 1 << 23, value - (1 << 24), value) / 8388608).astype(np.float32)
+    elif sample_width == 4:
+        samples = np.frombuffer(raw, "<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Неподдерживаемая разрядность WAV: {sample_width * 8} бит")
+    return samples.reshape(-1, channels).mean(axis=1)
+
+
+def analyze_wav(path: str, fps: float = 30.0, colors: int = 1, beat_threshold: float = 1.5,
+                release: float = 0.2, floor: float = 0.15, gain_decay: float = 0.995) -> Iterator[Frame]:
+    """
+    Цвет по спектру и ударам звука
+
+    Оттенок - соотношение энергии полос AUDIO_BANDS, каждая относительно
+    своего недавнего пика (автоусиление). Яркость вспыхивает на ударе -
+    энергия низких выше средней за последнюю секунду в beat_threshold раз -
+    и за release секунд спадает до уровня громкости, но не ниже floor.
+    """
+    with wave.open(path, "rb") as wav:
+        channels, sample_width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        hop = max(1, round(rate / fps))
+        # Окно FFT - степень двойки около шага: короче - хуже разрешение по низким частотам,
+        # длиннее - удары запаздывают
+        size = 1 << max(10, (hop - 1).bit_length())
+        window = np.hanning(size).astype(np.float32)
+        frequencies = np.fft.rfftfreq(size, 1.0 / rate)
+        bands = np.full(len(frequencies), len(AUDIO_BANDS), dtype=np.intp)
+        for index, (low, high) in enumerate(AUDIO_BANDS):
+            bands[(frequencies >= low) & (frequencies < high)] = index
+
+        buffer = np.zeros(size, dtype=np.float32)
+        peaks = np.full(len(AUDIO_BANDS) + 1, 1e-9)
+        average = None
+        envelope = 0.0
+        fall = math.exp(-1.0 / (release * fps))
+        position = 0
+
+        while True:
+            raw = wav.readframes(hop)
+            if not raw:
+                break
+            samples = _pcm(raw, sample_width, channels)
+            if len(samples) >= size:
+                buffer[:] = samples[-size:]
+            else:
+                buffer[:-len(samples)] = buffer[len(samples):]
+                buffer[-len(samples):] = samples
+            position += len(samples)
+
+            spectrum = np.abs(np.fft.rfft(buffer * window))
+            # Энергия полос одним проходом; в последнем элементе (частоты вне полос) - общая громкость
+            energy = np.bincount(bands, weights=spectrum, minlength=len(AUDIO_BANDS) + 1)
+            energy[-1] = energy[:-1].sum()
+            peaks = np.maximum(energy, peaks * gain_decay)
+            levels = energy / peaks
+
+            bass = energy[0]
+            average = bass if average is None else average + (bass - average) / max(fps, 1.0)
+            envelope = 1.0 if bass > beat_threshold * average > 0 else envelope * fall
+            brightness = floor + (1.0 - floor) * max(envelope, float(levels[-1]))
+
+            hue = levels[:-1] / max(float(levels[:-1].max()), 1e-9)
+            color = np.clip(np.rint(hue * brightness * 255), 0, 255).astype(np.uint8)
+            yield position / rate, color[None, :]
+
+
+# Анализаторы по виду источника: функция(path, fps, colors, **параметры) -> кадры
+ANALYZERS: Dict[str, Callable[..., Iterator[Frame]]] = {
+    "image": analyze_image,
+    "sequence": analyze_sequence,
+    "video": analyze_video,
+    "audio": analyze_wav,
+}
+
+
+def source_kind(path: str) -> str:
+    """Вид источника по пути"""
+    if os.path.isdir(path) or any(char in path for char in "*?["):
+        return "sequence"
+    extension = os.path.splitext(path)[1].lower()
+    if extension in AUDIO_EXTENSIONS:
+        return "audio"
+    if extension in VIDEO_EXTENSIONS:
+        return "video"
+    if extension in IMAGE_EXTENSIONS:
+        return "image"
+    raise ValueError(f"{path}: неизвестный тип файла")
+
+
+def _check_dependencies(kind: str, path: str):
+    # Проверяем заранее: иначе ошибка всплыла бы только в процессе анализа
+    if kind == "video":
+        modules = ["cv2"]
+    elif kind == "image":
+        modules = [] if path.lower().endswith(_BUILTIN_IMAGES) else ["PIL.Image"]
+    elif kind == "sequence":
+        modules = [] if all(f.lower().endswith(_BUILTIN_IMAGES) for f in _sequence_files(path)) else ["PIL.Image"]
+    else:
+        modules = []
+    for module in modules:
+        if importlib.util.find_spec(module.split(".")[0]) is None:
+            _optional(module)
+
+
+def _run_analysis(kind: str, path: str, ring_name: str, fps: float, colors: int, repeat: bool,
+                  options: dict) -> int:
+    """Тело задачи в процессе пула; возвращает число записанных кадров"""
+    ring = FrameRing(name=ring_name)
+    ring.start()
+    written = 0
+    try:
+        offset = 0.0
+        while True:
+            last = None
+            for timestamp, palette in ANALYZERS[kind](path, fps=fps, colors=colors, **options):
+                last = timestamp
+                if not ring.push(offset + timestamp, palette.tobytes()):
+                    return written
+                written += 1
+            if not repeat or last is None or kind == "image":
+                return written
+            offset += last + 1.0 / fps
+    finally:
+        ring.finish()
+        ring.close()
+
+
+# --- Сторона event loop'а ---
+
+@effect
+def content(source: "ColorSource", channel: int = 0) -> Effect:
+    """Цвета источника по времени эффекта; эффект кончается вместе с источником"""
+    source.acquire()
+    try:
+        t = yield
+        shown = 0
+        while True:
+            color = source.color_at(t, channel)
+            # Кадры на всех каналах читает первый же эффект: заканчиваем, только показав последний
+            if source.finished and shown == source.frames_read:
+                return
+            shown = source.frames_read
+            t = yield color if color is not None else BLACK
+    finally:
+        source.release()
+
+
+class ColorSource:
+    """
+    Источник цвета на стороне event loop'а
+
+    Читает кольцо, не дожидаясь воркера; время кадров - секунды от начала
+    медиа. Закрывается, когда его отпустил последний эффект.
+    """
+
+    def __init__(self, path: str, kind: str, ring: FrameRing, future: Future):
+        self.path = path
+        self.kind = kind
+        self.ring = ring
+        self.future = future
+        self.width = ring.width
+        self.colors: Optional[List[Color]] = None
+        self.frames_read = 0
+        self.frames_skipped = 0
+        self.error: Optional[BaseException] = None
+        self.closed = False
+        self._users = 0
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future: Future):
+        # Вызывается в служебном потоке пула
+        if future.cancelled() or self.closed or future.exception() is None:
+            return
+        self.error = future.exception()
+        print(f"Ошибка анализа {self.path}: {self.error}")
+
+    @property
+    def finished(self) -> bool:
+        """Анализ закончен и все кадры прочитаны"""
+        return self.closed or ((self.ring.done or self.future.done()) and not self.ring.pending)
+
+    def color_at(self, t: float, channel: int = 0) -> Optional[Color]:
+        """
+        Цвет на момент t секунд медиа
+
+        Забирает все наступившие кадры; если новых нет, повторяет последний.
+
+        Returns:
+            (R, G, B) или None, если кадров еще не было
+        """
+        if not self.closed:
+            taken = self.ring.take_until(t)
+            if taken is not None:
+                count, raw = taken
+                self.frames_read += count
+                self.frames_skipped += count - 1
+                self.colors = [tuple(raw[i:i + 3]) for i in range(0, len(raw), 3)]
+        if self.colors is None:
+            return None
+        return self.colors[channel % self.width]
+
+    @property
+    def waiting(self) -> bool:
+        """Задача стоит в очереди: все процессы пула заняты другими источниками"""
+        return not self.closed and not self.future.done() and not self.ring.started
+
+    async def ready(self, timeout: float = 10.0, poll: float = 0.01) -> bool:
+        """Дождаться первого кадра, не блокируя loop; False - кадров не будет"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not self.closed and not self.ring.pending:
+            if self.finished:
+                return False
+            if loop.time() >= deadline:
+                if self.waiting:
+                    print(f"{self.path}: ждет свободный процесс анализа - все заняты другими источниками "
+                          f"(закройте ненужные или увеличьте max_workers)")
+                return False
+            await asyncio.sleep(poll)
+        return not self.closed
+
+    def effect(self, channel: int = 0) -> Effect:
+        """Эффект для EffectEngine: цвет channel из кадров источника"""
+        return content(self, channel)
+
+    def acquire(self):
+        self._users += 1
+
+    def release(self):
+        self._users -= 1
+        if self._users <= 0:
+            self.close()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "path": self.path,
+            "kind": self.kind,
+            "colors": self.width,
+            "frames_read": self.frames_read,
+            "frames_skipped": self.frames_skipped,
+            "pending": 0 if self.closed else self.ring.pending,
+            "finished": self.finished,
+            "waiting": self.waiting,
+            "error": str(self.error) if self.error else None,
+        }
+
+    def close(self):
+        """Остановить анализ и освободить кольцо"""
+        if self.closed:
+            return
+        self.closed = True
+        self.future.cancel()
+        self.ring.stop()
+        self.ring.close()
+
+
+class SourcePool:
+    """
+    Пул процессов анализа
+
+    Процессы запускаются при первом источнике (spawn - одинаково на всех
+    платформах и без fork многопоточного процесса) и живут до close().
+    Пул закрывается явно (close() или with): при выходе интерпретатор ждет
+    процессы раньше обработчиков atexit, а воркер, опередивший воспроизведение,
+    ждет читателя.
+
+    Args:
+        max_workers: Число процессов; по умолчанию - по числу ядер
+        ring_size: Емкость кольца каждого источника, кадров
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, ring_size: int = 256):
+        self.max_workers = max_workers
+        self.ring_size = ring_size
+        self.sources: List[ColorSource] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def open(self, path: str, kind: Optional[str] = None, fps: float = 30.0, colors: int = 1,
+             repeat: bool = False, **options) -> ColorSource:
+        """
+        Запустить анализ файла
+
+        Args:
+            path: Файл, папка с изображениями или шаблон glob
+            kind: "image", "sequence", "video" или "audio"; None - по пути
+            fps: Частота кадров анализа
+            colors: Сколько доминирующих цветов в кадре (звук - всегда один)
+            repeat: Повторять по кругу
+            options: Параметры анализатора (см. ANALYZERS)
+
+        Returns:
+            ColorSource
+        """
+        kind = kind or source_kind(path)
+        analyzer = ANALYZERS.get(kind)
+        if analyzer is None:
+            raise ValueError(f"Неизвестный вид источника: {kind}; есть: {', '.join(ANALYZERS)}")
+        if kind != "sequence" and not os.path.isfile(path):
+            raise ValueError(f"{path}: файл не найден")
+        if fps <= 0 or not 1 <= colors <= 255:
+            raise ValueError("fps должен быть больше 0, colors - от 1 до 255")
+        # Неизвестные параметры - TypeError здесь, а не в процессе пула
+        inspect.signature(analyzer).bind(path, fps=fps, colors=colors, **options)
+        _check_dependencies(kind, path)
+
+        ring = FrameRing(self.ring_size, 1 if kind == "audio" else colors)
+        try:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+                _POOLS.add(self)
+            future = self._executor.submit(_run_analysis, kind, path, ring.name, fps, colors, repeat, options)
+        except Exception:
+            ring.close()
+            raise
+
+        source = ColorSource(path, kind, ring, future)
+        self.sources = [s for s in self.sources if not s.closed] + [source]
+        return source
+
+    def close(self):
+        """Остановить все источники и процессы"""
+        for source in self.sources:
+            source.close()
+        self.sources = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        _POOLS.discard(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Незакрытые пулы: разделяемая память колец освобождается хотя бы при выходе
+_POOLS: Set[SourcePool] = set()
+
+
+def _close_pools():
+    for pool in list(_POOLS):
+        pool.close()
+
+
+atexit.register(_close_pools)
+
+
+# --- Командная строка ---
+
+def preview(path: str, kind: Optional[str], fps: float, colors: int, frames: int):
+    """Напечатать первые кадры анализа"""
+    with SourcePool(max_workers=1) as pool:
+        source = pool.open(path, kind=kind, fps=fps, colors=colors)
+        shown = 0
+        while shown < frames and not source.finished:
+            frame = source.ring.pop()
+            if frame is None:
+                time.sleep(0.01)
+                continue
+            timestamp, raw = frame
+            print(f"{timestamp:8.3f} с  " + "  ".join(f"#{raw[i]:02X}{raw[i + 1]:02X}{raw[i + 2]:02X}"
+                                                     for i in range(0, len(raw), 3)))
+            shown += 1
+        if source.error is None and source.future.done() and source.future.exception() is not None:
+            print(f"Ошибка анализа {path}: {source.future.exception()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LED Controller - цвета из изображений, видео и звука")
+    parser.add_argument("path", help="Файл, папка с изображениями или шаблон glob")
+    parser.add_argument("--kind", choices=list(ANALYZERS), help="Вид источника (по умолчанию - по пути)")
+    parser.add_argument("--fps", type=float, default=30.0, help="Частота кадров анализа")
+    parser.add_argument("--colors", type=int, default=1, help="Сколько доминирующих цветов в кадре")
+    parser.add_argument("--frames", type=int, default=30, help="Сколько кадров показать")
+    args = parser.parse_args(argv)
+    try:
+        preview(args.path, args.kind, args.fps, args.colors, args.frames)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
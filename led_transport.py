@@ -0,0 +1,333 @@
+"""
+Транспорт Bluetooth для LEDController
+BleakTransport - настоящие устройства через bleak (по умолчанию).
+SimulatedTransport - устройства в памяти процесса: поиск, сервисы,
+подключение, задержки записи, потеря пакетов, ограничение пропускной
+способности и разбор записанных кадров по протоколу. Нужен для проверок
+и измерений производительности без железа.
+"""
+
+import asyncio
+import random
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from led_protocols import LEDProtocol, get_protocol
+
+
+class BleakTransport:
+    """Настоящий Bluetooth через bleak"""
+
+    def create_scanner(self, detection_callback: Callable):
+        """Сканер с вызовом detection_callback(device, advertisement_data)"""
+        from bleak import BleakScanner
+        return BleakScanner(detection_callback=detection_callback)
+
+    def create_client(self, address: str, disconnected_callback: Optional[Callable] = None):
+        """Клиент для подключения к устройству"""
+        from bleak import BleakClient
+        return BleakClient(address, disconnected_callback=disconnected_callback)
+
+
+# --- Симулятор ---
+
+ELK_SERVICE_UUID = "0000fff0-0000-1000-8000-00805f9b34fb"
+ELK_WRITE_UUID = "0000fff3-0000-1000-8000-00805f9b34fb"
+ELK_NOTIFY_UUID = "0000fff4-0000-1000-8000-00805f9b34fb"
+
+
+class SimulatedError(Exception):
+    """Ошибка записи или подключения в симуляторе"""
+
+
+class SimulatedCharacteristic:
+    """Характеристика GATT (повторяет нужную часть BleakGATTCharacteristic)"""
+
+    def __init__(self, uuid: str, properties: Sequence[str]):
+        self.uuid = uuid
+        self.properties = list(properties)
+
+
+class SimulatedService:
+    """Сервис GATT (повторяет нужную часть BleakGATTService)"""
+
+    def __init__(self, uuid: str, characteristics: Sequence[SimulatedCharacteristic]):
+        self.uuid = uuid
+        self.characteristics = list(characteristics)
+
+
+class SimulatedAdvertisement:
+    """Данные рекламного пакета (повторяет нужную часть AdvertisementData)"""
+
+    def __init__(self, local_name: Optional[str], rssi: int,
+                 service_uuids: Sequence[str] = (), manufacturer_data: Optional[Dict[int, bytes]] = None):
+        self.local_name = local_name
+        self.rssi = rssi
+        self.service_uuids = list(service_uuids)
+        self.manufacturer_data = manufacturer_data or {}
+
+
+class SimulatedDevice:
+    """
+    LED лента в памяти
+
+    Args:
+        address: Адрес устройства
+        name: Имя в рекламном пакете
+        protocol: Имя протокола из led_protocols, по которому разбираются записи
+        rssi: Уровень сигнала
+        advertise_delay: Через сколько секунд после начала сканирования устройство будет найдено
+        connect_latency: Длительность подключения и поиска сервисов
+        write_latency: Задержка одной записи
+        packet_loss: Доля потерянных записей (0..1)
+        throughput: Пропускная способность канала, байт/с (None - без ограничения)
+        services: Сервисы GATT; по умолчанию раскладка ELK-BLEDOM
+        buffer_size: Сколько кадров помещается в буфер контроллера ленты (None - без ограничения)
+        process_rate: Сколько кадров в секунду контроллер разбирает из буфера (None - мгновенно);
+            запись без подтверждения в полный буфер теряется, с подтверждением - ждет места
+        idle_timeout: Через сколько секунд без обмена устройство рвет связь (None - никогда)
+        seed: Зерно генератора потерь для воспроизводимости
+    """
+
+    def __init__(self,
+                 address: str,
+                 name: str = "ELK-BLEDOM",
+                 protocol: str = "ELK-BLEDOM",
+                 rssi: int = -60,
+                 advertise_delay: float = 0.05,
+                 connect_latency: float = 0.05,
+                 write_latency: float = 0.005,
+                 packet_loss: float = 0.0,
+                 throughput: Optional[float] = None,
+                 services: Optional[Sequence[SimulatedService]] = None,
+                 service_uuids: Sequence[str] = (),
+                 manufacturer_data: Optional[Dict[int, bytes]] = None,
+                 buffer_size: Optional[int] = None,
+                 process_rate: Optional[float] = None,
+                 idle_timeout: Optional[float] = None,
+                 seed: Optional[int] = None):
+        self.address = address
+        self.name = name
+        self.protocol: LEDProtocol = get_protocol(protocol)
+        self.rssi = rssi
+        self.advertise_delay = advertise_delay
+        self.connect_latency = connect_latency
+        self.write_latency = write_latency
+        self.packet_loss = packet_loss
+        self.throughput = throughput
+        self.services = list(services) if services is not None else [
+            SimulatedService(ELK_SERVICE_UUID, [
+                SimulatedCharacteristic(ELK_WRITE_UUID, ["write-without-response", "write"]),
+                SimulatedCharacteristic(ELK_NOTIFY_UUID, ["notify", "read"]),
+            ])
+        ]
+        self.service_uuids = list(service_uuids) or [service.uuid for service in self.services]
+        self.manufacturer_data = manufacturer_data or {}
+        self.buffer_size = buffer_size
+        self.process_rate = process_rate
+        # Время окончания обработки каждого кадра в буфере контроллера
+        self._buffer: Deque[float] = deque()
+        self.idle_timeout = idle_timeout
+        # False - устройство вне зоны: подключения не проходят
+        self.available = True
+        self._idle_handle: Optional[asyncio.TimerHandle] = None
+        self._random = random.Random(seed)
+        self._link_free_at = 0.0
+        self._clients: List["SimulatedClient"] = []
+
+        # Состояние ленты, восстановленное из записанных кадров
+        self.color: Optional[Tuple[int, int, int]] = None
+        self.brightness: Optional[int] = None
+        self.power: Optional[bool] = None
+
+        # Что было записано
+        self.frames: List[Tuple[float, str, Tuple[int, ...]]] = []
+        self.errors: List[bytes] = []
+        self.writes = 0
+        self.lost = 0
+        self.overflows = 0
+        self.bytes_written = 0
+
+    def writable_uuids(self) -> List[str]:
+        """Характеристики, в которые можно писать"""
+        return [char.uuid for service in self.services for char in service.characteristics
+                if "write" in char.properties or "write-without-response" in char.properties]
+
+    def advertisement(self) -> SimulatedAdvertisement:
+        """Рекламный пакет устройства"""
+        return SimulatedAdvertisement(self.name, self.rssi, self.service_uuids, self.manufacturer_data)
+
+    def drop_link(self):
+        """Разорвать соединение со стороны устройства"""
+        for client in list(self._clients):
+            client._on_link_lost()
+
+    def touch(self):
+        """Отметить обмен по каналу: отсчет idle_timeout начинается заново"""
+        if self.idle_timeout is None:
+            return
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+        self._idle_handle = asyncio.get_running_loop().call_later(self.idle_timeout, self.drop_link)
+
+    async def transmit(self, data: bytes, response: bool) -> bool:
+        """
+        Передача одной записи по каналу
+
+        Returns:
+            True, если запись дошла до устройства
+        """
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        airtime = len(data) / self.throughput if self.throughput else 0.0
+        start = max(now, self._link_free_at)
+        self._link_free_at = start + airtime
+        # Кадр доходит до ленты через write_latency, подтверждение - еще через столько же
+        delay = self._link_free_at - now + self.write_latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        self.writes += 1
+        self.touch()
+        if self.packet_loss and self._random.random() < self.packet_loss:
+            self.lost += 1
+            return False
+
+        if self.process_rate:
+            done_at = self._buffer_slot(loop.time())
+            while done_at is None and response:
+                # Подтвержденная запись ждет места в буфере - отсюда рост RTT под нагрузкой
+                await asyncio.sleep(self._buffer[0] - loop.time())
+                done_at = self._buffer_slot(loop.time())
+            if done_at is None:
+                self.overflows += 1
+                return False
+            if response:
+                await asyncio.sleep(max(0.0, done_at - loop.time()))
+
+        self.bytes_written += len(data)
+        self.receive(data)
+        if response:
+            await asyncio.sleep(self.write_latency)
+        return True
+
+    def _buffer_slot(self, now: float) -> Optional[float]:
+        """Поставить кадр в буфер контроллера; время окончания его обработки или None, если места нет"""
+        while self._buffer and self._buffer[0] <= now:
+            self._buffer.popleft()
+        if self.buffer_size is not None and len(self._buffer) >= self.buffer_size:
+            return None
+        done_at = max(now, self._buffer[-1] if self._buffer else now) + 1.0 / self.process_rate
+        self._buffer.append(done_at)
+        return done_at
+
+    def receive(self, data: bytes):
+        """Разбор кадра по протоколу и обновление состояния ленты"""
+        decoded = self.protocol.decode(data)
+        if decoded is None:
+            self.errors.append(bytes(data))
+            return
+
+        kind, values = decoded
+        self.frames.append((asyncio.get_running_loop().time(), kind, values))
+        if kind == "color":
+            self.color = values
+        elif kind == "brightness":
+            self.brightness = values[0]
+        elif kind == "power":
+            self.power = bool(values[0])
+
+
+class SimulatedClient:
+    """Клиент симулятора с интерфейсом BleakClient"""
+
+    def __init__(self, device: Optional[SimulatedDevice], address: str,
+                 disconnected_callback: Optional[Callable] = None):
+        self._device = device
+        self.address = address
+        self._disconnected_callback = disconnected_callback
+        self.is_connected = False
+        self.services: List[SimulatedService] = []
+
+    async def connect(self, **kwargs) -> bool:
+        if self._device is None or not self._device.available:
+            await asyncio.sleep(0.01)
+            raise SimulatedError(f"Устройство {self.address} не найдено")
+        await asyncio.sleep(self._device.connect_latency)
+        self.services = self._device.services
+        self.is_connected = True
+        self._device._clients.append(self)
+        self._device.touch()
+        return True
+
+    async def disconnect(self) -> bool:
+        if self.is_connected:
+            self.is_connected = False
+            self._device._clients.remove(self)
+        return True
+
+    async def write_gatt_char(self, char_specifier, data, response: bool = False):
+        if not self.is_connected:
+            raise SimulatedError("Нет подключения")
+        uuid = getattr(char_specifier, "uuid", char_specifier)
+        if uuid not in self._device.writable_uuids():
+            raise SimulatedError(f"Характеристика {uuid} не поддерживает запись")
+
+        delivered = await self._device.transmit(bytes(data), response)
+        if not delivered and response:
+            raise SimulatedError("Нет подтверждения записи")
+
+    async def read_gatt_char(self, char_specifier) -> bytearray:
+        if not self.is_connected:
+            raise SimulatedError("Нет подключения")
+        await asyncio.sleep(self._device.write_latency * 2)
+        self._device.touch()
+        return bytearray()
+
+    def _on_link_lost(self):
+        self.is_connected = False
+        self._device._clients.remove(self)
+        if self._disconnected_callback:
+            self._disconnected_callback(self)
+
+
+class SimulatedScanner:
+    """Сканер симулятора с интерфейсом BleakScanner"""
+
+    def __init__(self, transport: "SimulatedTransport", detection_callback: Callable):
+        self._transport = transport
+        self._detection_callback = detection_callback
+        self._handles: List[asyncio.TimerHandle] = []
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        for device in self._transport.devices.values():
+            self._handles.append(loop.call_later(device.advertise_delay, self._advertise, device))
+
+    async def stop(self):
+        for handle in self._handles:
+            handle.cancel()
+        self._handles.clear()
+
+    def _advertise(self, device: SimulatedDevice):
+        self._detection_callback(device, device.advertisement())
+
+
+class SimulatedTransport:
+    """Транспорт с устройствами в памяти процесса"""
+
+    def __init__(self, devices: Sequence[SimulatedDevice] = ()):
+        self.devices: Dict[str, SimulatedDevice] = {}
+        for device in devices:
+            self.add_device(device)
+
+    def add_device(self, device: SimulatedDevice) -> SimulatedDevice:
+        """Добавить устройство"""
+        self.devices[device.address.upper()] = device
+        return device
+
+    def create_scanner(self, detection_callback: Callable) -> SimulatedScanner:
+        return SimulatedScanner(self, detection_callback)
+
+    def create_client(self, address: str, disconnected_callback: Optional[Callable] = None) -> SimulatedClient:
+        return SimulatedClient(self.devices.get(address.upper()), address, disconnected_callback)